@@ -13,20 +13,30 @@
 # limitations under the License.
 from collections import namedtuple
 
-from ayx_python_sdk.core import PluginV2
-from ayx_python_sdk.providers.amp_provider.amp_provider_v2 import AMPProviderV2
+try:
+    from ayx_python_sdk.core import PluginV2
+    from ayx_python_sdk.providers.amp_provider.amp_provider_v2 import AMPProviderV2
+except ImportError:
+    #QVDConverter is also used outside Alteryx, e.g. by qvdtool, where the SDK is not installed
+    PluginV2 = object
+    AMPProviderV2 = None
 
 from pyarrow import Table
 
 
 import xml.etree.ElementTree as ET
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum, auto
 from io import BytesIO
+import hashlib
+import os
+import re
 import struct
 from datetime import date, datetime
 import sys
 
+from ayx_plugins.qvd_diagnostics import QVDMemoryTracker, QVDProfiler
+
 
 class QVDInputTool(PluginV2):
 
@@ -36,6 +46,45 @@ class QVDInputTool(PluginV2):
         self.config_value = 0.42
         self.provider.io.info("QVD Input Tool initialized.")
 
+    def GetBooleanConfig(self, name, default=False):
+        """Read a checkbox value from the tool configuration, which may arrive as a bool or a string."""
+        value = self.provider.tool_config.get(name, default)
+        if isinstance(value, str):
+            return value.strip().lower() == "true"
+        return bool(value)
+
+    def GetIntegerConfig(self, name, default):
+        """Read a positive number from the tool configuration, falling back to the default when unset or invalid."""
+        try:
+            value = int(str(self.provider.tool_config.get(name, default)).strip())
+        except ValueError:
+            return default
+        return value if value > 0 else default
+
+    def GetListConfig(self, name):
+        """Read a list with one entry per line from the tool configuration, ignoring blank lines."""
+        value = self.provider.tool_config.get(name) or ""
+        return [line.strip() for line in str(value).splitlines() if line.strip()]
+
+    def GetQVDFileNames(self, QVDFile):
+        """Expand the QVDFile setting, a path, a glob pattern or a list of either separated by newlines or ';', into sorted file names."""
+        import glob
+
+        fileNames = []
+        for pattern in re.split(r"[;\n]", QVDFile):
+            pattern = pattern.strip()
+            if not pattern:
+                continue
+            #an existing file is taken literally, so paths such as C:\Data\[2024] Sales\x.qvd need no escaping
+            if glob.has_magic(pattern) and not os.path.isfile(pattern):
+                fileNames.extend(sorted(glob.glob(pattern)))
+            else:
+                fileNames.append(pattern)
+
+        if not fileNames:
+            raise ValueError("No QVD file matches " + QVDFile)
+        return list(dict.fromkeys(fileNames))
+
     def on_incoming_connection_complete(self, anchor: namedtuple) -> None:
         """
         Call when an incoming connection is done sending data including when no data is sent on an optional input anchor.
@@ -82,17 +131,272 @@ class QVDInputTool(PluginV2):
         import pyarrow as pa
         
         QVDFile = self.provider.tool_config["QVDFile"]
+        dictionaryEncode = self.GetBooleanConfig("DictionaryEncode")
+        chunkSize = self.GetIntegerConfig("ChunkSize", QVDConverter.recordChunkSize)
         
         self.provider.io.info("QVDInputTool starts reading from " + QVDFile)
+
+        profileFile = (self.provider.tool_config.get("ProfileFile") or "").strip()
+        self.profiler = QVDProfiler(self.GetBooleanConfig("Profile") or bool(profileFile))
+        memoryBudgetMB = self.GetIntegerConfig("MemoryBudgetMB", None)
+        self.memoryTracker = QVDMemoryTracker(memoryBudgetMB * 1024 * 1024 if memoryBudgetMB else None)
+        
+        symbolCache = None
+        if self.provider.tool_config.get("SymbolCacheDirectory"):
+            symbolCache = QVDSymbolCache(self.provider.tool_config["SymbolCacheDirectory"],
+                                         self.GetIntegerConfig("SymbolCacheSizeMB", 1024) * 1024 * 1024)
+
+        fileNames = self.GetQVDFileNames(QVDFile)
+        sourceFileColumn = (self.provider.tool_config.get("SourceFileColumn") or "").strip()
+        if self.provider.environment.update_only:
+            self.PublishSchema(fileNames, sourceFileColumn, dictionaryEncode)
+            return
+
+        groupByFieldNames, aggregates = self.GetAggregation()
+        if aggregates and (len(fileNames) > 1 or sourceFileColumn):
+            raise ValueError("Aggregation is only supported when reading a single QVD file")
+
+        distinctRows = self.GetBooleanConfig("DistinctRows")
+        if distinctRows and aggregates:
+            raise ValueError("Distinct records and aggregation cannot be combined")
+        if distinctRows and (len(fileNames) > 1 or sourceFileColumn):
+            raise ValueError("Distinct records are only supported when reading a single QVD file")
+
+        if len(fileNames) > 1 or sourceFileColumn:
+            self.ReadMultipleQVD(fileNames, sourceFileColumn, symbolCache, chunkSize, dictionaryEncode)
+            self.ReportProfile(profileFile)
+            return
+
+        QVDFile = fileNames[0]
+        fieldNames = QVDAggregator.GetFieldNames(groupByFieldNames, aggregates) if aggregates else self.GetListConfig("SelectedFields")
+        qvdConverter = QVDConverter(QVDFile, self.GetMemoryMap(fileNames), fieldNames,
+                                    self.provider.tool_config.get("RecordFilter"), self.GetIntegerConfig("Workers", 1),
+                                    'process' if self.GetBooleanConfig("UseProcesses") else 'thread', symbolCache, self.profiler,
+                                    self.memoryTracker, **self.GetTypeOptions())
+
+        if symbolCache is not None:
+            self.provider.io.info("Symbol cache: " + str(qvdConverter.symbolCacheHits) + " hits, " + str(qvdConverter.symbolCacheMisses) + " misses")
+
+        self.WriteFieldProfile([qvdConverter], chunkSize)
+        if self.GetBooleanConfig("FieldsOnly"):
+            schema = self.GetOutputSchema(qvdConverter, groupByFieldNames, aggregates, dictionaryEncode)
+            self.provider.write_to_anchor("Output", schema.empty_table())
+            self.provider.io.info("QVDInputTool profiled the fields of " + QVDFile)
+            self.ReportProfile(profileFile)
+            qvdConverter.Close()
+            return
         
-        qvdConverter = QVDConverter(QVDFile)
+        rowNumbers = self.GetListConfig("RowNumbers")
+        recordLimit = self.GetIntegerConfig("RecordLimit", None)
+        startRow = self.GetIntegerConfig("StartRow", 0)
+        endRow = self.GetIntegerConfig("EndRow", None)
+
+        watermarkStore = self.GetWatermarkStore()
+        if watermarkStore is not None:
+            startRow = watermarkStore.GetStartRow(qvdConverter)
+            endRow = rowNumbers = recordLimit = None
+            self.provider.io.info("Incremental read from row " + str(startRow))
+
+        pipelined = self.GetBooleanConfig("Pipelined")
+        chunkSize = self.GetBudgetChunkSize(qvdConverter.GetBudgetChunkSize(chunkSize, dictionaryEncode, pipelined and not aggregates), chunkSize)
         
-        self.provider.write_to_anchor("Output", qvdConverter.ReadAllRecords(self.provider.io))
+        if aggregates:
+            if rowNumbers or recordLimit:
+                self.provider.io.warn("Row numbers and record limits are ignored when aggregating")
+
+            with self.profiler.Phase("Aggregate", (endRow or qvdConverter.qvdTableHeader.NoOfRecords) - startRow):
+                result = QVDAggregator(qvdConverter, groupByFieldNames, aggregates).Aggregate(self.provider.io, chunkSize, startRow, endRow)
+            self.provider.write_to_anchor("Output", result)
+            self.provider.io.info("Aggregated into " + str(result.num_rows) + " groups")
+        elif distinctRows:
+            if rowNumbers:
+                self.provider.io.warn("Row numbers are ignored when reading distinct records")
+
+            noOfRecords = 0
+            phaseToken = self.profiler.Begin("ReadDistinctRecords")
+            for batch in qvdConverter.ReadDistinctRecordBatches(self.provider.io, chunkSize, dictionaryEncode, startRow, endRow, recordLimit,
+                                                                self.GetDistinctCountField()):
+                with self.profiler.Phase("Emit", batch.num_rows):
+                    self.provider.write_to_anchor("Output", pa.Table.from_batches([batch]))
+                noOfRecords += batch.num_rows
+            self.profiler.End(phaseToken, noOfRecords)
+        else:
+            noOfRecords = 0
+            phaseToken = self.profiler.Begin("ReadAllRecords")
+            for batch in qvdConverter.ReadRecordBatches(self.provider.io, chunkSize, dictionaryEncode, startRow, endRow,
+                                                        [int(row) for line in rowNumbers for row in line.split(",") if row.strip()] if rowNumbers else None,
+                                                        recordLimit, pipelined):
+                with self.profiler.Phase("Emit", batch.num_rows):
+                    self.provider.write_to_anchor("Output", pa.Table.from_batches([batch]))
+                noOfRecords += batch.num_rows
+            self.profiler.End(phaseToken, noOfRecords)
+
+        if watermarkStore is not None:
+            watermarkStore.Store(qvdConverter)
         
         self.provider.io.info("QVDInputTool finished reading from " + QVDFile)
+        self.ReportProfile(profileFile)
         
+        qvdConverter.Close()
         qvdConverter = None
 
+    def GetAggregation(self):
+        """Read the group-by fields and aggregates to compute in the tool, counting records when only group-by fields are set."""
+        groupByFieldNames = self.GetListConfig("GroupByFields")
+        aggregates = self.GetListConfig("Aggregates")
+        if groupByFieldNames and not aggregates:
+            aggregates = ["count"]
+        return groupByFieldNames, aggregates
+
+    def GetTypeOptions(self):
+        """Read how field types are chosen: compact types, the types set for single fields (one FieldName=type per line) and typed dates."""
+        return {"compactTypes": self.GetBooleanConfig("CompactTypes"), "fieldTypes": QVDConverter.ParseFieldTypes(self.GetListConfig("FieldTypes")),
+                "typedDates": self.GetBooleanConfig("TypedDates"), "dateText": self.GetBooleanConfig("DateText")}
+
+    def GetDistinctCountField(self):
+        """Read the name of the column counting the records of every distinct record, or None for no count column."""
+        return (self.provider.tool_config.get("DistinctCountField") or "").strip() or None
+
+    def GetOutputSchema(self, qvdConverter, groupByFieldNames, aggregates, dictionaryEncode):
+        """Get the schema of the Output anchor for a single QVD file: the aggregates, the distinct records or the selected fields."""
+        import pyarrow as pa
+
+        if aggregates:
+            return QVDAggregator(qvdConverter, groupByFieldNames, aggregates).GetArrowSchema()
+
+        schema = qvdConverter.GetArrowSchema(dictionaryEncode)
+        if self.GetBooleanConfig("DistinctRows") and self.GetDistinctCountField():
+            schema = schema.append(pa.field(self.GetDistinctCountField(), pa.int64()))
+        return schema
+
+    def PublishSchema(self, fileNames, sourceFileColumn, dictionaryEncode):
+        """Publish the output schema in update-only mode, from the field headers and symbol types without reading any record."""
+        groupByFieldNames, aggregates = self.GetAggregation()
+        if aggregates or (self.GetBooleanConfig("DistinctRows") and len(fileNames) == 1 and not sourceFileColumn):
+            fieldNames = QVDAggregator.GetFieldNames(groupByFieldNames, aggregates) if aggregates else self.GetListConfig("SelectedFields")
+            qvdConverter = QVDConverter(fileNames[0], True, fieldNames, schemaOnly=True, **self.GetTypeOptions())
+            schema = self.GetOutputSchema(qvdConverter, groupByFieldNames, aggregates, dictionaryEncode)
+            qvdConverter.Close()
+        elif len(fileNames) > 1 or sourceFileColumn:
+            qvdReader = QVDMultiFileReader(fileNames, True, self.GetListConfig("SelectedFields"), None, self.GetIntegerConfig("Workers", 1),
+                                           None, sourceFileColumn or None, schemaOnly=True, **self.GetTypeOptions())
+            schema = qvdReader.GetArrowSchema(dictionaryEncode)
+            qvdReader.Close()
+        else:
+            qvdConverter = QVDConverter(fileNames[0], True, self.GetListConfig("SelectedFields"), schemaOnly=True, **self.GetTypeOptions())
+            schema = qvdConverter.GetArrowSchema(dictionaryEncode)
+            qvdConverter.Close()
+
+        self.provider.push_outgoing_metadata("Output", schema)
+        self.provider.push_outgoing_metadata("Fields", QVDConverter.GetFieldProfileSchema())
+        self.provider.push_outgoing_metadata("Values", QVDConverter.GetDistinctValueSchema())
+
+    def IsAnchorConnected(self, name):
+        """Tell whether an output anchor has a connection, assuming it has when the provider does not report connections."""
+        anchor = (getattr(self.provider, "outgoing_anchors", None) or {}).get(name)
+        return anchor is None or getattr(anchor, "num_connections", 1) > 0
+
+    def WriteFieldProfile(self, qvdConverters, chunkSize):
+        """Write one profile row per field to the Fields anchor and, when enabled, the distinct values to the Values anchor, if connected."""
+        import pyarrow as pa
+
+        with self.profiler.Phase("ProfileFields"):
+            if self.IsAnchorConnected("Fields"):
+                profile = pa.Table.from_batches([qvdConverter.GetFieldProfile() for qvdConverter in qvdConverters])
+                self.provider.write_to_anchor("Fields", profile)
+
+            if self.GetBooleanConfig("DistinctValues") and self.IsAnchorConnected("Values"):
+                for qvdConverter in qvdConverters:
+                    for batch in qvdConverter.GetDistinctValueBatches(chunkSize):
+                        self.provider.write_to_anchor("Values", pa.Table.from_batches([batch]))
+
+    def GetMemoryMap(self, fileNames):
+        """Read the MemoryMap setting, mapping the files anyway when reading them into memory would take most of the memory budget."""
+        memoryMap = self.GetBooleanConfig("MemoryMap", True)
+        maxBytes = self.memoryTracker.maxBytes
+        if not memoryMap and maxBytes is not None and sum(os.path.getsize(fileName) for fileName in fileNames) > maxBytes // 2:
+            self.provider.io.info("QVD files are memory-mapped instead of read into memory to stay within the memory budget")
+            return True
+        return memoryMap
+
+    def GetBudgetChunkSize(self, budgetChunkSize, chunkSize):
+        """Report when the memory budget makes the record chunks smaller than configured."""
+        if budgetChunkSize < chunkSize:
+            self.provider.io.info("Records are read in chunks of " + str(budgetChunkSize) + " to stay within the memory budget")
+        return budgetChunkSize
+
+    def ReportProfile(self, profileFile):
+        """Log the phase timings and peak memory, and write the timings as a Chrome trace when a profile file is set."""
+        if self.profiler.enabled or self.memoryTracker.maxBytes is not None:
+            self.memoryTracker.Report(self.provider.io)
+
+        if not self.profiler.enabled:
+            return
+
+        self.profiler.Report(self.provider.io)
+        if profileFile:
+            self.profiler.WriteTrace(profileFile)
+            self.provider.io.info("Phase timings written to " + profileFile)
+
+    def GetWatermarkStore(self):
+        """Create the state store for incremental reads, or None when incremental reads are off."""
+        stateDirectory = (self.provider.tool_config.get("IncrementalStateDirectory") or "").strip()
+        if not stateDirectory:
+            return None
+
+        if self.GetListConfig("RowNumbers") or self.GetIntegerConfig("StartRow", 0) or self.GetIntegerConfig("EndRow", None) or \
+                self.GetIntegerConfig("RecordLimit", None):
+            self.provider.io.warn("Row numbers, row ranges and record limits are ignored in incremental mode")
+
+        return QVDWatermarkStore(stateDirectory)
+
+    def ReadMultipleQVD(self, fileNames, sourceFileColumn, symbolCache, chunkSize, dictionaryEncode):
+        """Read several QVD files into one output, optionally tagging each record with its source file."""
+        import pyarrow as pa
+
+        self.provider.io.info("QVDInputTool starts reading " + str(len(fileNames)) + " QVD files")
+
+        if self.GetListConfig("RowNumbers") or self.GetIntegerConfig("StartRow", 0) or self.GetIntegerConfig("EndRow", None):
+            self.provider.io.warn("Row numbers and row ranges are ignored when reading several QVD files")
+
+        qvdReader = QVDMultiFileReader(fileNames, self.GetMemoryMap(fileNames), self.GetListConfig("SelectedFields"),
+                                       self.provider.tool_config.get("RecordFilter"), self.GetIntegerConfig("Workers", 1),
+                                       symbolCache, sourceFileColumn or None, self.profiler, self.memoryTracker,
+                                       **self.GetTypeOptions())
+        chunkSize = self.GetBudgetChunkSize(qvdReader.GetBudgetChunkSize(chunkSize, dictionaryEncode), chunkSize)
+
+        self.WriteFieldProfile(qvdReader.qvdConverters, chunkSize)
+        if self.GetBooleanConfig("FieldsOnly"):
+            self.provider.write_to_anchor("Output", qvdReader.GetArrowSchema(dictionaryEncode).empty_table())
+            self.provider.io.info("QVDInputTool profiled the fields of " + str(len(fileNames)) + " QVD files")
+            qvdReader.Close()
+            return
+
+        recordLimit = self.GetIntegerConfig("RecordLimit", None)
+        startRows = None
+
+        watermarkStore = self.GetWatermarkStore()
+        if watermarkStore is not None:
+            startRows = [watermarkStore.GetStartRow(qvdConverter) for qvdConverter in qvdReader.qvdConverters]
+            recordLimit = None
+            self.provider.io.info("Incremental read of " + str(sum(startRow > 0 for startRow in startRows)) + " appended QVD files")
+
+        noOfRecords = 0
+        phaseToken = self.profiler.Begin("ReadAllRecords")
+        for batch in qvdReader.ReadRecordBatches(self.provider.io, chunkSize, dictionaryEncode, recordLimit, startRows):
+            with self.profiler.Phase("Emit", batch.num_rows):
+                self.provider.write_to_anchor("Output", pa.Table.from_batches([batch]))
+            noOfRecords += batch.num_rows
+        self.profiler.End(phaseToken, noOfRecords)
+
+        if watermarkStore is not None:
+            for qvdConverter in qvdReader.qvdConverters:
+                watermarkStore.Store(qvdConverter)
+
+        self.provider.io.info("QVDInputTool finished reading " + str(len(fileNames)) + " QVD files")
+
+        qvdReader.Close()
+
 
 
 
@@ -165,6 +469,7 @@ class QvdTableHeader:
     Length: int =0
     Comment: str=""
     Lineage: Lineage = None
+    _HeaderHash: str=""
 
 
 @dataclass
@@ -182,78 +487,456 @@ class QvdFieldHeader:
     _SymbolVal : [] = None
     _SymbolBytes: [] = None
     _SymbolType : int=0
+    #number part of dual symbols, NaN for text symbols
+    _SymbolNum : [] = None
+    #text of typed date and timestamp symbols
+    _SymbolText : [] = None
   
 
 class QVDXMLParser:
+    qvdTableHeaderIntegers = ['QvBuildNo', 'SourceFileSize', 'RecordByteSize', 'NoOfRecords', 'Offset', 'Length']
+    qvdTableHeaderStrings = ['CreatorDoc', 'CreateUtcTime', 'SourceCreateUtcTime', 'SourceFileUtcTime',
+                             'StaleUtcTime', 'TableName', 'Compression', 'Comment']
+    qvdFieldHeaderIntegers = ['BitOffset', 'BitWidth', 'Bias', 'NoOfSymbols', 'Offset', 'Length']
+    qvdFieldHeaderStrings = ['FieldName', 'Comment']
 
-    def GetQvdTableHeader(self, XMLContent):    
-        root = ET.fromstring(XMLContent)    
+    #This is to read only the XML header from the start of a QVD file.
+    #The file is streamed in blocks through an incremental parser up to the NULL
+    #separator, so only the header bytes are read whatever the size of the file.
+    #Returns the header and the position of the NULL separator.
+    def ReadQvdTableHeader(self, file, blockSize=65536):
+        parser = ET.XMLPullParser(events=('start', 'end'))
         qvdTableHeader = QvdTableHeader()
-        
-        qvdTableHeader.QvBuildNo=int(root.find("QvBuildNo").text)
-        qvdTableHeader.CreatorDoc=root.find("CreatorDoc").text
-        qvdTableHeader.CreateUtcTime=root.find("CreateUtcTime").text
-        qvdTableHeader.SourceCreateUtcTime=root.find("SourceCreateUtcTime").text
-        qvdTableHeader.SourceFileUtcTime=root.find("SourceFileUtcTime").text
-        qvdTableHeader.StaleUtcTime=root.find("StaleUtcTime").text
-        qvdTableHeader.TableName=root.find("TableName").text
-        qvdTableHeader.SourceFileSize=int(root.find("SourceFileSize").text)
-        qvdTableHeader.Compression=root.find("Compression").text
-        qvdTableHeader.RecordByteSize=int(root.find("RecordByteSize").text)
-        qvdTableHeader.NoOfRecords=int(root.find("NoOfRecords").text)
-        qvdTableHeader.Offset=int(root.find("Offset").text)
-        qvdTableHeader.Length=int(root.find("Length").text)
-        qvdTableHeader.Comment=root.find("Comment").text
-        
-        if root.find("Lineage") is not None:
-            qvdTableHeader.Lineage = Lineage()
-            
-            if root.find("Lineage").find('LineageInfo') is not None:
-                qvdTableHeader.Lineage.LineageInfo = LineageInfo()
-                              
-                if root.find("Lineage").find('LineageInfo').find("Discriminator") is not None:
-                    qvdTableHeader.Lineage.LineageInfo.Discriminator = root.find("Lineage").find('LineageInfo').find('Discriminator').text
-
-                if root.find("Lineage").find('LineageInfo').find('Statement') is not None:
-                    qvdTableHeader.Lineage.LineageInfo.Statement  =root.find("Lineage").find('LineageInfo').find("Statement").text
-
-
-        qvdTableHeader.Fields = Fields()
-        qvdTableHeader.Fields.QvdFieldHeader = []
-        fields = root.find("Fields")
-        for qvdTableFieldHeader in fields.iter("QvdFieldHeader"):
-            qvdFieldHeader  = QvdFieldHeader()
-            qvdTableHeader.Fields.QvdFieldHeader.append(qvdFieldHeader)
-            
-            
-            qvdFieldHeader.FieldName = qvdTableFieldHeader.find("FieldName").text
-            qvdFieldHeader.BitOffset = int(qvdTableFieldHeader.find("BitOffset").text)
-            qvdFieldHeader.BitWidth = int(qvdTableFieldHeader.find("BitWidth").text)
-            qvdFieldHeader.Bias = int(qvdTableFieldHeader.find("Bias").text)
-            qvdFieldHeader.NoOfSymbols = int(qvdTableFieldHeader.find("NoOfSymbols").text)
-            qvdFieldHeader.Offset = int(qvdTableFieldHeader.find("Offset").text)
-            qvdFieldHeader.Length = int(qvdTableFieldHeader.find("Length").text)
-            qvdFieldHeader.Comment = qvdTableFieldHeader.find("Comment").text
-
-            numberFormat = NumberFormat()
-            qvdFieldHeader.NumberFormat = NumberFormat
-            numberFormat.Type = FieldType(qvdTableFieldHeader.find("NumberFormat").find("Type").text)
-            numberFormat.nDec = int(qvdTableFieldHeader.find("NumberFormat").find("nDec").text)
-            numberFormat.UseThou = int(qvdTableFieldHeader.find("NumberFormat").find("UseThou").text)
-            numberFormat.Fmt = qvdTableFieldHeader.find("NumberFormat").find("Fmt").text
-            numberFormat.Dec = qvdTableFieldHeader.find("NumberFormat").find("Dec").text
-            numberFormat.Thou = qvdTableFieldHeader.find("NumberFormat").find("Thou").text
-  
-            tags = Tags()
-            tags.String = []
-            qvdFieldHeader.Tags = tags
-            tagsXML = qvdTableFieldHeader.find("Tags")
-            for t in tagsXML.iter("String"):
-                tags.String.append(Value(t.text))   
-
-        return qvdTableHeader
+        depth = 0
+        xmlEndPosition = -1
+        readPos = 0
+        headerHash = hashlib.sha1()
+
+        while xmlEndPosition < 0:
+            block = file.read(blockSize)
+            if not block:
+                raise ValueError("No NULL separator after the XML header, this is not a QVD file")
+
+            nullPosition = block.find(b'\x00')
+            if nullPosition >= 0:
+                xmlEndPosition = readPos + nullPosition
+                block = block[:nullPosition]
+
+            readPos += len(block)
+            headerHash.update(block)
+            parser.feed(block)
+            qvdTableHeader, depth = self.ParseEvents(parser, qvdTableHeader, depth)
+
+        parser.close()
+        qvdTableHeader, depth = self.ParseEvents(parser, qvdTableHeader, depth)
+        qvdTableHeader._HeaderHash = headerHash.hexdigest()
+
+        return qvdTableHeader, xmlEndPosition
+
+    #This is to build the header from the parser events in a single pass.
+    #Each direct child of QvdTableHeader is handled once when it is complete and then cleared.
+    def ParseEvents(self, parser, qvdTableHeader, depth):
+        for event, element in parser.read_events():
+            if event == 'start':
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth != 1:
+                continue
+
+            if element.tag in self.qvdTableHeaderIntegers:
+                setattr(qvdTableHeader, element.tag, int(element.text))
+            elif element.tag in self.qvdTableHeaderStrings:
+                setattr(qvdTableHeader, element.tag, element.text)
+            elif element.tag == 'Lineage':
+                qvdTableHeader.Lineage = self.GetLineage(element)
+            elif element.tag == 'Fields':
+                qvdTableHeader.Fields = Fields()
+                qvdTableHeader.Fields.QvdFieldHeader = [self.GetQvdFieldHeader(qvdTableFieldHeader) for qvdTableFieldHeader in element]
+
+            element.clear()
+
+        return qvdTableHeader, depth
+
+    def GetLineage(self, lineageXML):
+        lineage = Lineage()
+
+        for lineageInfoXML in lineageXML:
+            if lineageInfoXML.tag == 'LineageInfo':
+                lineage.LineageInfo = LineageInfo()
+
+                for child in lineageInfoXML:
+                    if child.tag in ('Discriminator', 'Statement'):
+                        setattr(lineage.LineageInfo, child.tag, child.text)
+
+        return lineage
+
+    def GetQvdFieldHeader(self, qvdTableFieldHeader):
+        qvdFieldHeader = QvdFieldHeader()
+
+        for child in qvdTableFieldHeader:
+            if child.tag in self.qvdFieldHeaderIntegers:
+                setattr(qvdFieldHeader, child.tag, int(child.text))
+            elif child.tag in self.qvdFieldHeaderStrings:
+                setattr(qvdFieldHeader, child.tag, child.text)
+            elif child.tag == 'NumberFormat':
+                numberFormat = NumberFormat()
+                qvdFieldHeader.NumberFormat = numberFormat
+
+                for formatChild in child:
+                    if formatChild.tag == 'Type':
+                        numberFormat.Type = FieldType(formatChild.text)
+                    elif formatChild.tag in ('nDec', 'UseThou'):
+                        setattr(numberFormat, formatChild.tag, int(formatChild.text))
+                    elif formatChild.tag in ('Fmt', 'Dec', 'Thou'):
+                        setattr(numberFormat, formatChild.tag, formatChild.text)
+            elif child.tag == 'Tags':
+                tags = Tags()
+                tags.String = [Value(t.text) for t in child.iter("String")]
+                qvdFieldHeader.Tags = tags
+
+        return qvdFieldHeader
    
 
+@dataclass
+class FilterCondition:
+    FieldName: str=""
+    Operator: str=""
+    Values: [] = None
+    _FieldIndex: int=-1
+    _SymbolMask: [] = None
+    _NullMatch: bool=False
+
+@dataclass
+class FilterGroup:
+    Operator: str=""
+    Conditions: [] = None
+
+
+class QVDFilterParser:
+    """
+    Parse a record filter such as [Region] = 'EMEA' AND ([Amount] > 1000 OR [Code] IN (1, 2)).
+
+    Conditions compare a [Field] with =, <>, !=, <, <=, >, >=, IN (...), NOT IN (...),
+    IS NULL or IS NOT NULL, and are combined with AND, OR and parentheses.
+    """
+
+    tokenPattern = re.compile(r"""\s*(?:\[(?P<field>[^\]]*)\]|'(?P<string>(?:[^']|'')*)'|(?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)|(?P<op><=|>=|<>|!=|=|<|>)|(?P<punct>[(),])|(?P<word>[A-Za-z_]+))""")
+
+    def Parse(self, expression):
+        self.tokens = self.Tokenize(expression)
+        self.position = 0
+
+        filterNode = self.ParseOr()
+        if self.position < len(self.tokens):
+            raise ValueError("Unexpected '" + str(self.tokens[self.position][1]) + "' in filter: " + expression)
+
+        return filterNode
+
+    def Tokenize(self, expression):
+        tokens = []
+        position = 0
+        expression = expression.rstrip()
+
+        while position < len(expression):
+            match = self.tokenPattern.match(expression, position)
+            if match is None or match.end() == position:
+                raise ValueError("Cannot parse filter at '" + expression[position:].lstrip() + "'")
+
+            kind = match.lastgroup
+            text = match.group(kind)
+            if kind == "string":
+                tokens.append((kind, text.replace("''", "'")))
+            elif kind == "number":
+                tokens.append((kind, float(text) if any(c in text for c in ".eE") else int(text)))
+            elif kind == "word":
+                tokens.append((kind, text.upper()))
+            else:
+                tokens.append((kind, text))
+            position = match.end()
+
+        return tokens
+
+    def Peek(self, kind=None, text=None):
+        if self.position >= len(self.tokens):
+            return False
+        tokenKind, tokenText = self.tokens[self.position]
+        return (kind is None or tokenKind == kind) and (text is None or tokenText == text)
+
+    def Expect(self, kind, text=None):
+        if not self.Peek(kind, text):
+            found = self.tokens[self.position][1] if self.position < len(self.tokens) else "end of filter"
+            raise ValueError("Expected " + (text or kind) + " but found '" + str(found) + "' in filter")
+        self.position += 1
+        return self.tokens[self.position - 1][1]
+
+    def ParseOr(self):
+        conditions = [self.ParseAnd()]
+        while self.Peek("word", "OR"):
+            self.position += 1
+            conditions.append(self.ParseAnd())
+        return conditions[0] if len(conditions) == 1 else FilterGroup("OR", conditions)
+
+    def ParseAnd(self):
+        conditions = [self.ParseCondition()]
+        while self.Peek("word", "AND"):
+            self.position += 1
+            conditions.append(self.ParseCondition())
+        return conditions[0] if len(conditions) == 1 else FilterGroup("AND", conditions)
+
+    def ParseCondition(self):
+        if self.Peek("punct", "("):
+            self.position += 1
+            filterNode = self.ParseOr()
+            self.Expect("punct", ")")
+            return filterNode
+
+        fieldName = self.Expect("field")
+
+        if self.Peek("word", "IS"):
+            self.position += 1
+            if self.Peek("word", "NOT"):
+                self.position += 1
+                self.Expect("word", "NULL")
+                return FilterCondition(fieldName, "IS NOT NULL", [])
+            self.Expect("word", "NULL")
+            return FilterCondition(fieldName, "IS NULL", [])
+
+        if self.Peek("word", "NOT") or self.Peek("word", "IN"):
+            operator = "IN"
+            if self.Peek("word", "NOT"):
+                self.position += 1
+                operator = "NOT IN"
+            self.Expect("word", "IN")
+            self.Expect("punct", "(")
+            values = [self.ParseValue()]
+            while self.Peek("punct", ","):
+                self.position += 1
+                values.append(self.ParseValue())
+            self.Expect("punct", ")")
+            return FilterCondition(fieldName, operator, values)
+
+        operator = self.Expect("op")
+        return FilterCondition(fieldName, "!=" if operator == "<>" else operator, [self.ParseValue()])
+
+    def ParseValue(self):
+        if self.Peek("string"):
+            return self.Expect("string")
+        return self.Expect("number")
+
+    def GetFieldNames(self, filterNode):
+        if isinstance(filterNode, FilterGroup):
+            return [fieldName for condition in filterNode.Conditions for fieldName in self.GetFieldNames(condition)]
+        return [filterNode.FieldName]
+
+
+class QVDSymbolCache:
+    """
+    On-disk cache of decoded symbol tables.
+
+    Every QVD file gets a directory named after a hash of its path, size, modification
+    time and XML header, holding one Arrow IPC file per field. Cached symbol tables are
+    memory-mapped when loaded. When the cache grows beyond maxBytes the least recently
+    used files are evicted.
+    """
+
+    def __init__(self, cacheDirectory, maxBytes=1024 * 1024 * 1024):
+        self.cacheDirectory = cacheDirectory
+        self.maxBytes = maxBytes
+        os.makedirs(cacheDirectory, exist_ok=True)
+
+    def GetKey(self, fileName, qvdTableHeader):
+        fileStat = os.stat(fileName)
+        keySource = "|".join([os.path.abspath(fileName), str(fileStat.st_size), str(fileStat.st_mtime_ns), qvdTableHeader._HeaderHash])
+        return hashlib.sha1(keySource.encode('utf-8')).hexdigest()
+
+    def GetPath(self, cacheKey, fieldIndex):
+        return os.path.join(self.cacheDirectory, cacheKey, str(fieldIndex) + ".arrow")
+
+    #This is to load a field's symbol table into its header, returns False on a cache miss.
+    def Load(self, cacheKey, fieldIndex, qvdFieldHeader):
+        import pyarrow as pa
+
+        path = self.GetPath(cacheKey, fieldIndex)
+        if not os.path.exists(path):
+            return False
+
+        try:
+            symbolTable = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        except (OSError, pa.ArrowInvalid):
+            return False
+
+        symbolType = int(symbolTable.schema.metadata[b'SymbolType'])
+        #dual symbols are cached with their number part
+        if symbolTable.num_rows != qvdFieldHeader.NoOfSymbols or (symbolType in (5, 6) and 'Number' not in symbolTable.column_names):
+            return False
+
+        qvdFieldHeader._SymbolType = symbolType
+        qvdFieldHeader._SymbolVal = symbolTable.column(0).combine_chunks()
+        qvdFieldHeader._SymbolNum = symbolTable.column('Number').to_numpy() if symbolType in (5, 6) else None
+
+        #mark as recently used, another process may have evicted the file since it was mapped
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def Store(self, cacheKey, fieldIndex, qvdFieldHeader):
+        import pyarrow as pa
+
+        path = self.GetPath(cacheKey, fieldIndex)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        symbolTable = pa.table([qvdFieldHeader._SymbolVal], names=['Symbol'])
+        if qvdFieldHeader._SymbolNum is not None:
+            symbolTable = symbolTable.append_column('Number', pa.array(qvdFieldHeader._SymbolNum))
+        symbolTable = symbolTable.replace_schema_metadata({'SymbolType': str(qvdFieldHeader._SymbolType)})
+
+        #write to a temporary file first so a concurrent reader never sees a partial file
+        temporaryPath = path + "." + str(os.getpid()) + ".tmp"
+        with pa.OSFile(temporaryPath, 'wb') as sink:
+            with pa.ipc.new_file(sink, symbolTable.schema) as writer:
+                writer.write_table(symbolTable)
+        os.replace(temporaryPath, path)
+
+    #This is to remove the least recently used cache files until the cache fits in maxBytes.
+    #Files of the QVD currently being read are kept. Files and directories removed by another
+    #process while the cache is being listed are skipped.
+    def Evict(self, currentKey=None):
+        cacheFiles = []
+        totalBytes = 0
+        for cacheKey in os.listdir(self.cacheDirectory):
+            keyDirectory = os.path.join(self.cacheDirectory, cacheKey)
+            if not os.path.isdir(keyDirectory):
+                continue
+
+            try:
+                fileNames = os.listdir(keyDirectory)
+            except FileNotFoundError:
+                continue
+
+            for fileName in fileNames:
+                try:
+                    fileStat = os.stat(os.path.join(keyDirectory, fileName))
+                except FileNotFoundError:
+                    continue
+                totalBytes += fileStat.st_size
+                if cacheKey != currentKey:
+                    cacheFiles.append((fileStat.st_mtime, fileStat.st_size, os.path.join(keyDirectory, fileName)))
+
+        for mtime, size, path in sorted(cacheFiles):
+            if totalBytes <= self.maxBytes:
+                break
+
+            try:
+                os.remove(path)
+                totalBytes -= size
+            except OSError:
+                pass
+
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+
+
+class QVDWatermarkStore:
+    """
+    State files for incremental reads of append-only QVD files.
+
+    Every QVD file gets a small JSON file named after a hash of its path, holding the
+    number of records read last time and a fingerprint of the file at that point: the
+    record layout, the symbol tables as they were then, and the first and last record.
+    A file that has only been appended to still matches the fingerprint, since new rows
+    and new symbols are added at the end, so only the rows past the watermark are read.
+    Any other change means the file was rewritten and it is read in full.
+    """
+
+    def __init__(self, stateDirectory):
+        self.stateDirectory = stateDirectory
+        os.makedirs(stateDirectory, exist_ok=True)
+
+    def GetPath(self, fileName):
+        return os.path.join(self.stateDirectory, hashlib.sha1(os.path.abspath(fileName).encode('utf-8')).hexdigest() + ".json")
+
+    def GetLayoutHash(self, qvdTableHeader):
+        layout = [str(qvdTableHeader.RecordByteSize)] + [
+            "|".join([qvdFieldHeader.FieldName, str(qvdFieldHeader.BitOffset), str(qvdFieldHeader.BitWidth), str(qvdFieldHeader.Bias)])
+            for qvdFieldHeader in qvdTableHeader.Fields.QvdFieldHeader]
+        return hashlib.sha1("\n".join(layout).encode('utf-8')).hexdigest()
+
+    #This is to hash the first symbolLengths[j] bytes of every field's symbol table.
+    def GetSymbolHash(self, qvdConverter, symbolLengths):
+        symbolHash = hashlib.sha1()
+        with open(qvdConverter.qvdFile, 'rb') as file:
+            for qvdFieldHeader, symbolLength in zip(qvdConverter.qvdTableHeader.Fields.QvdFieldHeader, symbolLengths):
+                if symbolLength > qvdFieldHeader.Length:
+                    return None
+
+                file.seek(qvdConverter.xmlEndPosition + qvdFieldHeader.Offset + 1)
+                symbolHash.update(file.read(symbolLength))
+
+        return symbolHash.hexdigest()
+
+    #This is to hash the first and the last of noOfRecords records.
+    def GetRecordHash(self, qvdConverter, noOfRecords):
+        recordByteSize = qvdConverter.qvdTableHeader.RecordByteSize
+        recordHash = hashlib.sha1()
+        if noOfRecords > 0:
+            recordHash.update(qvdConverter.allRecordBytes[:recordByteSize])
+            recordHash.update(qvdConverter.allRecordBytes[(noOfRecords - 1) * recordByteSize:noOfRecords * recordByteSize])
+
+        return recordHash.hexdigest()
+
+    def GetFingerprint(self, qvdConverter, noOfRecords, symbolLengths):
+        return {"NoOfRecords": noOfRecords,
+                "LayoutHash": self.GetLayoutHash(qvdConverter.qvdTableHeader),
+                "SymbolLengths": symbolLengths,
+                "SymbolHash": self.GetSymbolHash(qvdConverter, symbolLengths),
+                "RecordHash": self.GetRecordHash(qvdConverter, noOfRecords)}
+
+    #This is to find the first row not read yet, 0 when there is no state or the file was rewritten.
+    def GetStartRow(self, qvdConverter):
+        import json
+
+        try:
+            with open(self.GetPath(qvdConverter.qvdFile), 'r', encoding='utf-8') as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return 0
+
+        try:
+            noOfRecords = int(state["NoOfRecords"])
+            symbolLengths = [int(symbolLength) for symbolLength in state["SymbolLengths"]]
+        except (KeyError, TypeError, ValueError):
+            return 0
+
+        qvdTableHeader = qvdConverter.qvdTableHeader
+        if noOfRecords > qvdTableHeader.NoOfRecords or len(symbolLengths) != len(qvdTableHeader.Fields.QvdFieldHeader):
+            return 0
+
+        if state != self.GetFingerprint(qvdConverter, noOfRecords, symbolLengths):
+            return 0
+
+        return noOfRecords
+
+    #This is to record that all records of the file have been read.
+    def Store(self, qvdConverter):
+        import json
+
+        path = self.GetPath(qvdConverter.qvdFile)
+        state = self.GetFingerprint(qvdConverter, qvdConverter.qvdTableHeader.NoOfRecords,
+                                    [qvdFieldHeader.Length for qvdFieldHeader in qvdConverter.qvdTableHeader.Fields.QvdFieldHeader])
+
+        #write to a temporary file first so an interrupted run never leaves a partial state
+        temporaryPath = path + "." + str(os.getpid()) + ".tmp"
+        with open(temporaryPath, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        os.replace(temporaryPath, path)
+
+
 class QVDConverter:
     bitMask = [
         0, 1, 3, 7, 15, 31, 63, 127, 255, 511, 1023, 2047, 4095, 8191, 16383, 32767,
@@ -271,44 +954,113 @@ class QVDConverter:
     
     qvdTableHeader : QvdTableHeader = None
 
-    allRecordBytes: bytearray()
+    allRecordBytes: memoryview = None
+    qvdMap = None
     qvdFile : str
     pyarrowDatatypes : [] = None
-    data : {} = None
+    recordChunkSize : int = 1000000
+    symbolTypeNames = {0: "Null", 1: "Integer", 2: "Float", 4: "Text", 5: "DualInteger", 6: "DualFloat"}
+    selectedFieldIndexes : [] = None
+    recordFilter = None
+    filterFieldIndexes : [] = ()
+    xmlEndPosition : int = 0
+    workers : int = 1
+    workerType : str = 'thread'
+    pipelineDepth : int = 2
+    symbolCache = None
+    symbolCacheHits : int = 0
+    symbolCacheMisses : int = 0
+    #disabled unless a profiler is passed in, also used by converters created in worker processes
+    profiler : QVDProfiler = QVDProfiler()
+    memoryTracker : QVDMemoryTracker = None
+    compactTypes : bool = False
+    fieldTypes : {} = None
+    fieldTypeNames = ("uint8", "int16", "int32", "int64", "float32", "float64", "string", "dictionary")
+    #text fields with at most this many symbols, each used twice on average, become dictionaries
+    compactDictionaryLimit : int = 32768
+    dictionaryFieldIndexes : set = frozenset()
+    typedDates : bool = False
+    dateText : bool = False
+    dateTextSuffix : str = "_Text"
+    dateTextFieldIndexes : set = frozenset()
+    #with nullMissingFilterFields filter fields missing from the file hold NULL instead of failing
+    nullMissingFilterFields : bool = False
+    #Qlik serial numbers count days from 1899-12-30, this is 1970-01-01
+    unixEpochSerial : int = 25569
     
 
    
-    def __init__(self, fileName):
+    def __init__(self, fileName, memoryMap=True, fieldNames=None, filterExpression=None, workers=1, workerType='thread', symbolCache=None,
+                 profiler=None, memoryTracker=None, schemaOnly=False, compactTypes=False, fieldTypes=None, typedDates=False, dateText=False,
+                 nullMissingFilterFields=False):
         self.qvdFile = fileName
         self.qvdTableHeader = QvdTableHeader()
+        self.workers = max(workers, 1)
+        self.workerType = workerType
+        self.symbolCache = symbolCache
+        self.profiler = profiler or self.profiler
+        self.memoryTracker = memoryTracker or QVDMemoryTracker()
+        self.compactTypes = compactTypes
+        self.fieldTypes = fieldTypes or {}
+        self.dictionaryFieldIndexes = set()
+        self.typedDates = typedDates
+        self.dateText = dateText
+        self.dateTextFieldIndexes = set()
+        self.nullMissingFilterFields = nullMissingFilterFields
         
-        self.ReadQVD(fileName)        
+        self.ReadQVD(fileName, memoryMap, fieldNames, filterExpression, schemaOnly)        
     
-    def ReadQVD(self, fileName):
+    #This is to read a QVD file. With memoryMap the file is mapped read-only and the XML
+    #header, the symbol sections and the record section are memoryviews into the mapping,
+    #so nothing is copied and the pages are shared through the OS page cache.
+    #With fieldNames only those fields are parsed and decoded, in header order.
+    #With filterExpression only the records matching the filter are returned.
+    #With schemaOnly only the symbol types are read, enough for GetArrowSchema.
+    #With compactTypes, or a type in fieldTypes, fields get the narrowest type that holds their values.
+    #With typedDates, date and timestamp fields are read as date32 and timestamp values,
+    #with dateText their text is also returned in a field named with dateTextSuffix.
+    def ReadQVD(self, fileName, memoryMap=True, fieldNames=None, filterExpression=None, schemaOnly=False):
+        import mmap
     
-        allBytes = bytearray()
         qvdXMLParser = QVDXMLParser()
-        self.data = {}
-        self.datatypes = {}
         
+        phaseToken = self.profiler.Begin("ReadQVD")
         with open(fileName, 'rb') as file:
-            allBytes = file.read()
+            #Read XML and the separator NULL
+            self.qvdTableHeader, xmlEndPosition = qvdXMLParser.ReadQvdTableHeader(file)
+            self.xmlEndPosition = xmlEndPosition
 
-        #Read XML and the separator NULL
-        xmlEndPosition = allBytes.find(b'\x00')
-        
-        XMLContent = allBytes[:xmlEndPosition].decode('utf-8')
-        self.qvdTableHeader = qvdXMLParser.GetQvdTableHeader(XMLContent)
+            if memoryMap:
+                self.qvdMap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                fileBytes = self.qvdMap
+            else:
+                fileSize = os.fstat(file.fileno()).st_size
+                self.memoryTracker.Check(fileSize, "Reading " + fileName + " into memory")
+                file.seek(0)
+                fileBytes = file.read()
+                self.memoryTracker.Set("FileBytes", fileSize, id(self))
+        self.profiler.End(phaseToken, 0, xmlEndPosition if memoryMap else len(fileBytes))
+
+        allBytes = memoryview(fileBytes)
+        self.selectedFieldIndexes = self.SelectFields(fieldNames)
+
+        self.filterFieldIndexes = []
+        if filterExpression and filterExpression.strip():
+            qvdFilterParser = QVDFilterParser()
+            self.recordFilter = qvdFilterParser.Parse(filterExpression)
+            filterFieldNames = qvdFilterParser.GetFieldNames(self.recordFilter)
+            if self.nullMissingFilterFields:
+                filterFieldNames = [fieldName for fieldName in filterFieldNames if fieldName in self.GetFieldNames()]
+            self.filterFieldIndexes = self.SelectFields(filterFieldNames) if filterFieldNames else []
         
         
-        #initialize for Symbol Read
-        for qvdFieldHeader in self.qvdTableHeader.Fields.QvdFieldHeader:
+        #initialize for Symbol Read, symbol sections of unused fields are never touched
+        for j in self.GetDecodedFieldIndexes():
+            qvdFieldHeader = self.qvdTableHeader.Fields.QvdFieldHeader[j]
             startPos = xmlEndPosition + qvdFieldHeader.Offset +1
             endPos = startPos + qvdFieldHeader.Length
             
             qvdFieldHeader._SymbolBytes = allBytes[startPos:endPos]
-            qvdFieldHeader._SymbolVal = [None] * qvdFieldHeader.NoOfSymbols
-            self.data[qvdFieldHeader.FieldName] = [None] * self.qvdTableHeader.NoOfRecords
 
 
       
@@ -320,124 +1072,1725 @@ class QVDConverter:
         
         #free memory
         allBytes = None
+        fileBytes = None
 
         #Read Symbols
         self.pyarrowDatatypes = [None] * len(self.qvdTableHeader.Fields.QvdFieldHeader)
-        self.ReadAllSymbol()
+        if schemaOnly:
+            self.ReadSymbolTypes()
+            return
+
+        self.ReadAllSymbol(self.filterFieldIndexes)
+
+        if self.recordFilter is not None:
+            self.CompileFilter(self.recordFilter)
+
+    #This is to release the record section and unmap the QVD file.
+    def Close(self):
+        self.allRecordBytes = None
+        self.memoryTracker.Set("FileBytes", 0, id(self))
+
+        for qvdFieldHeader in self.qvdTableHeader.Fields.QvdFieldHeader:
+            qvdFieldHeader._SymbolBytes = None
+
+        if self.qvdMap is not None:
+            try:
+                self.qvdMap.close()
+            except BufferError:
+                #views are still exported; the mapping is closed once they are garbage collected
+                pass
+            self.qvdMap = None
+
+    #This is to list the field names in header order.
+    def GetFieldNames(self):
+        return [qvdFieldHeader.FieldName for qvdFieldHeader in self.qvdTableHeader.Fields.QvdFieldHeader]
+
+    #This is to resolve the requested field names to positions in the field header list.
+    def SelectFields(self, fieldNames):
+        qvdFieldHeaders = self.qvdTableHeader.Fields.QvdFieldHeader
+
+        if not fieldNames:
+            return list(range(len(qvdFieldHeaders)))
+
+        headerFieldNames = [qvdFieldHeader.FieldName for qvdFieldHeader in qvdFieldHeaders]
+        missingFieldNames = [fieldName for fieldName in fieldNames if fieldName not in headerFieldNames]
+        if missingFieldNames:
+            raise ValueError("Fields not found in " + self.qvdFile + ": " + ", ".join(missingFieldNames))
+
+        return [j for j in range(len(qvdFieldHeaders)) if headerFieldNames[j] in fieldNames]
    
         
-    #This is to read all symbols in QVD.
-    def ReadAllSymbol(self):
+    #This is to read all symbols of the selected fields in QVD, plus any extra fields given.
+    #With more than one worker the symbol tables are parsed concurrently and the schema
+    #is assembled in field order afterwards. With a symbol cache, cached symbol tables are
+    #loaded instead of parsed and newly parsed ones are stored.
+    def ReadAllSymbol(self, extraFieldIndexes=()):
         import pyarrow as pa
+
+        fieldIndexes = sorted(set(self.selectedFieldIndexes) | set(extraFieldIndexes))
+        parsedFieldIndexes = fieldIndexes
+        phaseToken = self.profiler.Begin("ReadAllSymbol")
+
+        self.memoryTracker.Check(sum(self.EstimateSymbolBytes(self.qvdTableHeader.Fields.QvdFieldHeader[j]) for j in fieldIndexes),
+                                 "Parsing the symbol tables of " + self.qvdFile)
+
+        if self.symbolCache is not None:
+            cacheKey = self.symbolCache.GetKey(self.qvdFile, self.qvdTableHeader)
+            parsedFieldIndexes = [j for j in fieldIndexes if not self.symbolCache.Load(cacheKey, j, self.qvdTableHeader.Fields.QvdFieldHeader[j])]
+            self.symbolCacheHits = len(fieldIndexes) - len(parsedFieldIndexes)
+            self.symbolCacheMisses = len(parsedFieldIndexes)
+
+        if self.workers > 1 and len(parsedFieldIndexes) > 1:
+            self.ReadSymbolsParallel(parsedFieldIndexes)
+        else:
+            for j in parsedFieldIndexes:
+                self.ReadSymbol(j)
+
+        if self.symbolCache is not None and parsedFieldIndexes:
+            for j in parsedFieldIndexes:
+                self.symbolCache.Store(cacheKey, j, self.qvdTableHeader.Fields.QvdFieldHeader[j])
+            self.symbolCache.Evict(cacheKey)
         
-        for j in range(len(self.qvdTableHeader.Fields.QvdFieldHeader)):
-            self.ReadSymbol(j)
-            
+        self.profiler.End(phaseToken, sum(self.qvdTableHeader.Fields.QvdFieldHeader[j].NoOfSymbols for j in fieldIndexes),
+                          sum(self.qvdTableHeader.Fields.QvdFieldHeader[j].Length for j in parsedFieldIndexes))
+
+        for j in fieldIndexes:
             self.qvdTableHeader.Fields.QvdFieldHeader[j]._SymbolBytes = None
             fieldName = self.qvdTableHeader.Fields.QvdFieldHeader[j].FieldName
             
-            if self.qvdTableHeader.Fields.QvdFieldHeader[j].NoOfSymbols == 1 and self.qvdTableHeader.Fields.QvdFieldHeader[j]._SymbolVal[0] is None:
+            if self.qvdTableHeader.Fields.QvdFieldHeader[j].NoOfSymbols == 1 and self.qvdTableHeader.Fields.QvdFieldHeader[j]._SymbolVal.null_count == 1:
                 self.pyarrowDatatypes[j] = pa.field(fieldName, pa.null())
-            elif self.qvdTableHeader.Fields.QvdFieldHeader[j]._SymbolType == 1:
-                self.pyarrowDatatypes[j] = pa.field(fieldName, pa.int64())
-            elif self.qvdTableHeader.Fields.QvdFieldHeader[j]._SymbolType == 2:
-                self.pyarrowDatatypes[j] = pa.field(fieldName, pa.float64())
-            elif self.qvdTableHeader.Fields.QvdFieldHeader[j]._SymbolType == 4:
-                self.pyarrowDatatypes[j] = pa.field(fieldName, pa.string())
-            elif self.qvdTableHeader.Fields.QvdFieldHeader[j]._SymbolType == 5:
-                self.pyarrowDatatypes[j] = pa.field(fieldName, pa.string())
-            elif self.qvdTableHeader.Fields.QvdFieldHeader[j]._SymbolType == 6:
-                self.pyarrowDatatypes[j] = pa.field(fieldName, pa.string())
             else:
-                self.pyarrowDatatypes[j] = pa.field(fieldName, pa.string())
-            
+                self.TypeDateSymbols(j)
+                self.pyarrowDatatypes[j] = pa.field(fieldName, self.CompactSymbols(j))
+
+            self.qvdTableHeader.Fields.QvdFieldHeader[j]._SymbolNum = None
+
+        self.memoryTracker.Set("Symbols", sum(self.qvdTableHeader.Fields.QvdFieldHeader[j]._SymbolVal.nbytes for j in fieldIndexes), id(self))
+
+    #This is to find the value type of the selected fields without parsing their symbol tables.
+    #A text or dual symbol makes the field a string field, so sections starting with one are
+    #never read further; sections starting with a number are checked with one strided pass over
+    #their type bytes and only mixed sections are parsed. The symbol tables are left empty.
+    #Compacted numeric fields, typed date fields and fields with a type in fieldTypes are parsed for their values.
+    def ReadSymbolTypes(self):
+        import numpy as np
+        import pyarrow as pa
+
+        for j in self.selectedFieldIndexes:
+            qvdFieldHeader = self.qvdTableHeader.Fields.QvdFieldHeader[j]
+            noOfSymbols = qvdFieldHeader.NoOfSymbols
+            symbolBytes = np.frombuffer(qvdFieldHeader._SymbolBytes, dtype=np.uint8)
+            symbolType = int(symbolBytes[0]) if noOfSymbols > 0 and len(symbolBytes) > 0 else 0
+            qvdFieldHeader._SymbolVal = None
+
+            if ((self.compactTypes and symbolType in (1, 2)) or (noOfSymbols > 0 and qvdFieldHeader.FieldName in self.fieldTypes)
+                    or (self.typedDates and self.GetDateArrowType(qvdFieldHeader) is not None)):
+                self.ParseSymbol(qvdFieldHeader)
+                symbolType = qvdFieldHeader._SymbolType
+            elif symbolType == 1 and len(symbolBytes) == 5 * noOfSymbols and (symbolBytes[0::5] == 1).all():
+                pass
+            elif symbolType == 2 and len(symbolBytes) == 9 * noOfSymbols and (symbolBytes[0::9] == 2).all():
+                pass
+            elif symbolType in (1, 2):
+                self.ParseSymbol(qvdFieldHeader)
+                symbolType = qvdFieldHeader._SymbolType
+
+            qvdFieldHeader._SymbolType = symbolType
+            qvdFieldHeader._SymbolBytes = None
+
+            if noOfSymbols == 1 and symbolType == 0:
+                self.pyarrowDatatypes[j] = pa.field(qvdFieldHeader.FieldName, pa.null())
+            else:
+                if qvdFieldHeader._SymbolVal is None:
+                    qvdFieldHeader._SymbolVal = pa.array([], type=self.GetSymbolArrowType(symbolType))
+                self.TypeDateSymbols(j)
+                self.pyarrowDatatypes[j] = pa.field(qvdFieldHeader.FieldName, self.CompactSymbols(j))
+            qvdFieldHeader._SymbolVal = pa.array([], type=self.pyarrowDatatypes[j].type)
+            qvdFieldHeader._SymbolNum = None
+            if qvdFieldHeader._SymbolText is not None:
+                qvdFieldHeader._SymbolText = qvdFieldHeader._SymbolText.slice(0, 0)
+
+    #This is to parse the symbol tables of several fields on a thread or process pool.
+    #Every field's symbol section is an independent byte range, largest ones are submitted first.
+    #Threads share the symbol views directly; processes map the QVD file themselves so the
+    #bytes are shared through the OS page cache and only the parsed symbols are sent back.
+    def ReadSymbolsParallel(self, fieldIndexes):
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        qvdFieldHeaders = self.qvdTableHeader.Fields.QvdFieldHeader
+        fieldIndexes = sorted(fieldIndexes, key=lambda j: qvdFieldHeaders[j].Length, reverse=True)
+
+        if self.workerType == 'process':
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {}
+                for j in fieldIndexes:
+                    startPos = self.xmlEndPosition + qvdFieldHeaders[j].Offset + 1
+                    futures[j] = pool.submit(ReadSymbolInProcess, self.qvdFile, startPos, qvdFieldHeaders[j].Length, qvdFieldHeaders[j].NoOfSymbols)
+
+                for j, future in futures.items():
+                    qvdFieldHeaders[j]._SymbolType, qvdFieldHeaders[j]._SymbolVal, qvdFieldHeaders[j]._SymbolNum = future.result()
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                list(pool.map(self.ReadSymbol, fieldIndexes))
+
+    #This is to estimate the memory of a parsed symbol table: the values or text, and offsets.
+    def EstimateSymbolBytes(self, qvdFieldHeader):
+        return qvdFieldHeader.Length + 8 * qvdFieldHeader.NoOfSymbols
+
+    #This is to estimate the memory one record takes while a chunk is decoded: its record
+    #words, an 8 byte symbol index per decoded field, and the output value of every selected
+    #field, a dictionary code or the value itself (strings at their average symbol length).
+    def EstimateRowBytes(self, dictionaryEncode=False):
+        import pyarrow as pa
+
+        rowBytes = 8 * max((self.qvdTableHeader.RecordByteSize + 7) // 8, 1) + 8 * len(self.GetDecodedFieldIndexes())
+        for j in self.selectedFieldIndexes:
+            qvdFieldHeader = self.qvdTableHeader.Fields.QvdFieldHeader[j]
+            valueType = self.pyarrowDatatypes[j].type
+            if dictionaryEncode or j in self.dictionaryFieldIndexes or pa.types.is_null(valueType):
+                rowBytes += 4
+            elif pa.types.is_string(valueType):
+                rowBytes += 4 + qvdFieldHeader.Length // max(qvdFieldHeader.NoOfSymbols, 1)
+            else:
+                rowBytes += valueType.bit_width // 8
+
+        return rowBytes
+
+    #This is to shrink the chunk size so the chunks in flight fit in what the memory budget
+    #leaves after the symbol tables, failing when not even a small chunk would fit.
+    def GetBudgetChunkSize(self, chunkSize, dictionaryEncode=False, pipelined=False, chunksInFlight=None):
+        availableBytes = self.memoryTracker.GetAvailableBytes()
+        if availableBytes is None:
+            return chunkSize
+
+        if chunksInFlight is None:
+            chunksInFlight = 2 * self.pipelineDepth + 1 if pipelined else 2 * self.workers if self.workers > 1 else 1
+
+        chunkBytes = self.EstimateRowBytes(dictionaryEncode) * chunksInFlight
+        minimumChunkSize = min(chunkSize, 1000)
+        self.memoryTracker.Check(minimumChunkSize * chunkBytes, "Decoding " + str(chunksInFlight) + " chunks of " + str(minimumChunkSize) +
+                                 " records of " + self.qvdFile)
+
+        return max(min(chunkSize, availableBytes // max(chunkBytes, 1)), minimumChunkSize)
+
+    #This is to map a QVD symbol type to the pyarrow type of its values.
+    def GetSymbolArrowType(self, symbolType):
+        import pyarrow as pa
+
+        if symbolType == 1:
+            return pa.int64()
+        elif symbolType == 2:
+            return pa.float64()
+        else:
+            return pa.string()
+
+    #This is to read the per-field types, one "FieldName=type" per line, into a dictionary.
+    @staticmethod
+    def ParseFieldTypes(lines):
+        fieldTypes = {}
+        for line in lines:
+            fieldName, separator, typeName = line.rpartition("=")
+            typeName = typeName.strip().lower()
+            if not separator or not fieldName.strip() or typeName not in QVDConverter.fieldTypeNames:
+                raise ValueError("Unknown field type " + line + ", use FieldName=type with type one of " + ", ".join(QVDConverter.fieldTypeNames))
+            fieldTypes[fieldName.strip()] = typeName
+
+        return fieldTypes
+
+    #This is to narrow the symbol table of a field to the smallest Arrow type that holds its values
+    #and return that type. Integers take the narrowest of uint8 (Alteryx Byte, for 0 to 255), int16,
+    #int32 or int64 that fits their minimum and maximum, floats become float32 when every value survives the round trip, and text fields with
+    #few symbols used repeatedly are emitted as dictionaries. A type in fieldTypes overrides the choice.
+    def CompactSymbols(self, fieldIndex):
+        import pyarrow as pa
+
+        qvdFieldHeader = self.qvdTableHeader.Fields.QvdFieldHeader[fieldIndex]
+        symbols = qvdFieldHeader._SymbolVal
+        typeName = self.fieldTypes.get(qvdFieldHeader.FieldName)
+
+        if typeName is None and not self.compactTypes:
+            return symbols.type
+
+        if typeName == "dictionary" or (typeName is None and pa.types.is_string(symbols.type)
+                                        and qvdFieldHeader.NoOfSymbols <= self.compactDictionaryLimit
+                                        and 2 * qvdFieldHeader.NoOfSymbols <= self.qvdTableHeader.NoOfRecords):
+            self.dictionaryFieldIndexes.add(fieldIndex)
+            return symbols.type
+
+        valueType = self.GetCompactArrowType(symbols) if typeName is None else getattr(pa, typeName)()
+        if valueType != symbols.type:
+            try:
+                qvdFieldHeader._SymbolVal = symbols.cast(valueType)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as error:
+                raise ValueError("Field [" + qvdFieldHeader.FieldName + "] cannot be read as " + str(valueType) + ": " + str(error))
+
+        return valueType
+
+    #This is to get the Arrow type of a date or timestamp field from its number format, or from
+    #its $date and $timestamp tags when the format is not set, or None for any other field.
+    def GetDateArrowType(self, qvdFieldHeader):
+        import pyarrow as pa
+
+        formatType = qvdFieldHeader.NumberFormat.Type if qvdFieldHeader.NumberFormat is not None else FieldType.UNKNOWN
+        tags = qvdFieldHeader.Tags.String if qvdFieldHeader.Tags is not None and qvdFieldHeader.Tags.String else []
+
+        if formatType == FieldType.TIMESTAMP or (formatType == FieldType.UNKNOWN and Value.TIMESTAMP in tags):
+            return pa.timestamp('ms')
+        if formatType == FieldType.DATE or (formatType == FieldType.UNKNOWN and Value.DATE in tags):
+            return pa.date32()
+        return None
+
+    #This is to turn the symbols of a date or timestamp field into date32 or timestamp values,
+    #computed at once from the Qlik serial numbers: the number part of dual symbols or the
+    #numeric symbols themselves. Symbols without a number become NULL. With dateText the text
+    #symbols are kept for the text field. Fields of text symbols only are left as they are.
+    def TypeDateSymbols(self, fieldIndex):
+        import numpy as np
+        import pyarrow as pa
+
+        qvdFieldHeader = self.qvdTableHeader.Fields.QvdFieldHeader[fieldIndex]
+        symbols = qvdFieldHeader._SymbolVal
+        dateType = self.GetDateArrowType(qvdFieldHeader) if self.typedDates else None
+        if dateType is None:
+            return
+
+        if qvdFieldHeader._SymbolNum is not None:
+            numbers = qvdFieldHeader._SymbolNum
+        elif pa.types.is_integer(symbols.type) or pa.types.is_floating(symbols.type):
+            numbers = symbols.cast(pa.float64()).to_numpy(zero_copy_only=False)
+        else:
+            return
+
+        days = numbers - self.unixEpochSerial
+        if pa.types.is_date(dateType):
+            values = np.floor(np.nan_to_num(days)).astype(np.int32)
+        else:
+            values = np.round(np.nan_to_num(days) * 86400000).astype(np.int64)
+
+        if self.dateText:
+            qvdFieldHeader._SymbolText = symbols if pa.types.is_string(symbols.type) else symbols.cast(pa.string())
+            self.dateTextFieldIndexes.add(fieldIndex)
+        qvdFieldHeader._SymbolVal = pa.array(values, type=dateType, mask=np.isnan(days))
+
+    #This is to find the narrowest numeric type that holds every symbol of a field exactly.
+    def GetCompactArrowType(self, symbols):
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if pa.types.is_integer(symbols.type):
+            minMax = pc.min_max(symbols)
+            if minMax["min"].as_py() is None:
+                return symbols.type
+
+            #This is to stay within the Alteryx integer types, which have an unsigned Byte but no int8
+            for valueType in (pa.uint8(), pa.int16(), pa.int32()):
+                integerInfo = np.iinfo(valueType.to_pandas_dtype())
+                if integerInfo.min <= minMax["min"].as_py() and minMax["max"].as_py() <= integerInfo.max:
+                    return valueType
+            return pa.int64()
+
+        if pa.types.is_float64(symbols.type):
+            values = symbols.to_numpy(zero_copy_only=False)
+            if np.all((values.astype(np.float32).astype(np.float64) == values) | np.isnan(values)):
+                return pa.float32()
+
+        return symbols.type
+
     #This is to read a single symbol in QVD.
+    #Sections made only of ints, only of floats or only of strings are decoded in bulk
+    #with numpy; anything else is walked symbol by symbol using precomputed terminators.
+    #The values end up in _SymbolVal as a pyarrow array, the number part of dual symbols in _SymbolNum.
     def ReadSymbol(self, fieldIndex):
-        qvdFieldHeader = self.qvdTableHeader.Fields.QvdFieldHeader[fieldIndex]
-        startPos = 0
-        readPos = 0
-        endPos = len(qvdFieldHeader._SymbolBytes)
-        
-        for j in range(qvdFieldHeader.NoOfSymbols):
-            
-            if readPos <=endPos:
-                symbolType = qvdFieldHeader._SymbolBytes[readPos]
-                qvdFieldHeader._SymbolType = max(qvdFieldHeader._SymbolType , symbolType)
-                readPos += 1
-                startPos = readPos
-                
-                #int
-                if symbolType == 1:
-                    readPos += 4
-                    qvdFieldHeader._SymbolVal[j] = struct.unpack('<i', qvdFieldHeader._SymbolBytes[startPos:readPos])[0]
-
-                #float
-                elif symbolType == 2:
-                    readPos += 8          
-                    qvdFieldHeader._SymbolVal[j] = struct.unpack('<d', qvdFieldHeader._SymbolBytes[startPos:readPos])[0]
-
-                #string
-                elif symbolType == 4:
-                    while qvdFieldHeader._SymbolBytes[readPos] > 0:
-                        readPos += 1
-
-                    qvdFieldHeader._SymbolVal[j] = qvdFieldHeader._SymbolBytes[startPos:readPos].decode("utf-8")
-                    
-                    readPos += 1
-
-                #dual (text, int)
-                elif symbolType == 5:
-                    readPos += 4
-                                      
-                    startPos = readPos
-                    while qvdFieldHeader._SymbolBytes[readPos] > 0:
-                        readPos += 1
-                    
-                    qvdFieldHeader._SymbolVal[j] = qvdFieldHeader._SymbolBytes[startPos:readPos].decode("utf-8")
-                    
-                    readPos += 1
-                
-                #dual (text, float)
-                elif symbolType == 6:
-                    readPos += 8
-                
-                    startPos = readPos
-                    while qvdFieldHeader._SymbolBytes[readPos] > 0:
-                        readPos += 1
-                    
-                    qvdFieldHeader._SymbolVal[j] = qvdFieldHeader._SymbolBytes[startPos:readPos].decode("utf-8")
-                    
-                    readPos+= 1
+        self.ParseSymbol(self.qvdTableHeader.Fields.QvdFieldHeader[fieldIndex])
 
-    #This is to read all the record data.
-    def ReadAllRecords(self, io):
-        io.info("Total number of records: " + str(self.qvdTableHeader.NoOfRecords))
-        
+    def ParseSymbol(self, qvdFieldHeader):
+        import numpy as np
         import pyarrow as pa
-               
 
-        for r in range(self.qvdTableHeader.NoOfRecords):
-            #Get the bytes for one record 
-            startPos = r * self.qvdTableHeader.RecordByteSize
-            endPos = startPos + self.qvdTableHeader.RecordByteSize 
-            result = int.from_bytes(self.allRecordBytes[startPos:endPos], byteorder='little', signed=False)
-        
-            #read bytes of each field and convert to symbol index to get the value
-            for j in range(len(self.qvdTableHeader.Fields.QvdFieldHeader)):
-                qvdFieldHeader = self.qvdTableHeader.Fields.QvdFieldHeader[j]
-                           
-                if qvdFieldHeader.Bias==0:
-                    index = (result >> qvdFieldHeader.BitOffset) & self.bitMask[qvdFieldHeader.BitWidth] 
-                    
-                    self.data[qvdFieldHeader.FieldName][r] = qvdFieldHeader._SymbolVal[index]
+        noOfSymbols = qvdFieldHeader.NoOfSymbols
+        symbolBytes = np.frombuffer(qvdFieldHeader._SymbolBytes, dtype=np.uint8)
+        endPos = len(symbolBytes)
 
-            if  (r+1) % 1000000 == 0:
-                io.info("Read " + str(r+1) + " records ...")
+        if noOfSymbols == 0 or endPos == 0:
+            qvdFieldHeader._SymbolVal = pa.nulls(noOfSymbols, type=pa.string())
+            return
 
+        #int
+        if endPos == 5 * noOfSymbols and (symbolBytes[0::5] == 1).all():
+            qvdFieldHeader._SymbolType = 1
+            values = symbolBytes.reshape(noOfSymbols, 5)[:, 1:].copy().view('<i4').ravel()
+            qvdFieldHeader._SymbolVal = pa.array(values.astype(np.int64))
+            return
 
-        arrays = [pa.array(colData) for colData in self.data.values()]
-        self.data = None
+        #float
+        if endPos == 9 * noOfSymbols and (symbolBytes[0::9] == 2).all():
+            qvdFieldHeader._SymbolType = 2
+            values = symbolBytes.reshape(noOfSymbols, 9)[:, 1:].copy().view('<f8').ravel()
+            qvdFieldHeader._SymbolVal = pa.array(values)
+            return
 
+        terminators = np.flatnonzero(symbolBytes == 0)
 
-        return pa.Table.from_arrays(arrays, schema=pa.schema(self.pyarrowDatatypes))
-        
+        #string: every terminator is followed by the type byte of the next string
+        if (symbolBytes[0] == 4 and len(terminators) == noOfSymbols and terminators[-1] == endPos - 1
+                and (symbolBytes[terminators[:-1] + 1] == 4).all()):
+            qvdFieldHeader._SymbolType = 4
+            textStarts = np.concatenate(([1], terminators[:-1] + 2))
+            qvdFieldHeader._SymbolVal = self.BuildStringArray(symbolBytes, textStarts, terminators)
+            return
+
+        #dual (text, int) and dual (text, float): chain each terminator to the next symbol's one
+        symbolType = int(symbolBytes[0])
+        if symbolType in (5, 6) and len(terminators) >= noOfSymbols:
+            textEnds = self.ChainDualTerminators(terminators, noOfSymbols, 4 if symbolType == 5 else 8)
+
+            if textEnds is not None and textEnds[-1] == endPos - 1:
+                symbolStarts = np.concatenate(([0], textEnds[:-1] + 1))
+
+                if (symbolBytes[symbolStarts] == symbolType).all():
+                    qvdFieldHeader._SymbolType = symbolType
+                    numberSize = 4 if symbolType == 5 else 8
+                    numberBytes = symbolBytes[symbolStarts[:, None] + 1 + np.arange(numberSize)]
+                    qvdFieldHeader._SymbolNum = numberBytes.view('<i4' if symbolType == 5 else '<f8').ravel().astype(np.float64)
+                    textStarts = symbolStarts + 1 + numberSize
+                    qvdFieldHeader._SymbolVal = self.BuildStringArray(symbolBytes, textStarts, textEnds)
+                    return
+
+        self.ReadMixedSymbol(qvdFieldHeader, symbolBytes, terminators.tolist())
+
+    #This is to find the text terminators of a section of same-typed dual symbols.
+    #The number part may contain zero bytes, so for every zero byte the zero that would
+    #terminate the following symbol's text is looked up at once, and the chain is followed
+    #from the first symbol. Returns None if the section ends before noOfSymbols symbols.
+    def ChainDualTerminators(self, terminators, noOfSymbols, numberSize):
+        import numpy as np
+
+        nextTerminator = np.searchsorted(terminators, terminators + 2 + numberSize).tolist()
+        terminatorList = terminators.tolist()
+        terminatorPos = int(np.searchsorted(terminators, 1 + numberSize))
+        textEnds = [0] * noOfSymbols
+
+        for j in range(noOfSymbols):
+            if terminatorPos >= len(terminatorList):
+                return None
+
+            textEnds[j] = terminatorList[terminatorPos]
+            terminatorPos = nextTerminator[terminatorPos]
+
+        return np.array(textEnds)
+
+    #This is to walk a symbol section with mixed or dual symbol types.
+    def ReadMixedSymbol(self, qvdFieldHeader, symbolBytes, terminators):
+        import numpy as np
+        import pyarrow as pa
+
+        rawBytes = memoryview(qvdFieldHeader._SymbolBytes)
+        endPos = len(rawBytes)
+        values = [None] * qvdFieldHeader.NoOfSymbols
+        numbers = [np.nan] * qvdFieldHeader.NoOfSymbols
+        textSymbols = []
+        textStarts = []
+        textEnds = []
+        readPos = 0
+        terminatorPos = 0
+
+        for j in range(qvdFieldHeader.NoOfSymbols):
+            if readPos >= endPos:
+                break
+
+            symbolType = rawBytes[readPos]
+            qvdFieldHeader._SymbolType = max(qvdFieldHeader._SymbolType, symbolType)
+            readPos += 1
+
+            #int
+            if symbolType == 1:
+                values[j] = numbers[j] = struct.unpack_from('<i', rawBytes, readPos)[0]
+                readPos += 4
+
+            #float
+            elif symbolType == 2:
+                values[j] = numbers[j] = struct.unpack_from('<d', rawBytes, readPos)[0]
+                readPos += 8
+
+            #string, dual (text, int) and dual (text, float)
+            elif symbolType in (4, 5, 6):
+                if symbolType != 4:
+                    numbers[j] = struct.unpack_from('<i' if symbolType == 5 else '<d', rawBytes, readPos)[0]
+                readPos += 0 if symbolType == 4 else 4 if symbolType == 5 else 8
+
+                while terminators[terminatorPos] < readPos:
+                    terminatorPos += 1
+
+                textSymbols.append(j)
+                textStarts.append(readPos)
+                textEnds.append(terminators[terminatorPos])
+                readPos = terminators[terminatorPos] + 1
+
+        arrowType = self.GetSymbolArrowType(qvdFieldHeader._SymbolType)
+        qvdFieldHeader._SymbolNum = np.array(numbers, dtype=np.float64) if qvdFieldHeader._SymbolType in (5, 6) else None
+
+        if len(textSymbols) == qvdFieldHeader.NoOfSymbols:
+            qvdFieldHeader._SymbolVal = self.BuildStringArray(symbolBytes, np.array(textStarts), np.array(textEnds))
+            return
+
+        #numbers in a section with text symbols become their text
+        if pa.types.is_string(arrowType):
+            values = [value if value is None else str(value) for value in values]
+
+        for j, startPos, endPos in zip(textSymbols, textStarts, textEnds):
+            values[j] = bytes(rawBytes[startPos:endPos]).decode("utf-8")
+
+        qvdFieldHeader._SymbolVal = pa.array(values, type=arrowType)
+
+    #This is to build a pyarrow string array from the text ranges of a symbol section
+    #by compacting the text bytes and computing the offsets, without decoding each string.
+    def BuildStringArray(self, symbolBytes, textStarts, textEnds):
+        import numpy as np
+        import pyarrow as pa
+
+        offsets = np.zeros(len(textStarts) + 1, dtype=np.int32)
+        np.cumsum(textEnds - textStarts, out=offsets[1:])
+
+        textMarks = np.zeros(len(symbolBytes) + 1, dtype=np.int8)
+        textMarks[textStarts] += 1
+        textMarks[textEnds] -= 1
+        textBytes = symbolBytes[np.cumsum(textMarks[:-1]) > 0]
+
+        stringArray = pa.StringArray.from_buffers(len(textStarts), pa.py_buffer(offsets), pa.py_buffer(textBytes))
+        stringArray.validate(full=True)
+
+        return stringArray
+
+    #This is to evaluate each filter condition once against its field's symbol table.
+    #Every condition gets a boolean mask over the symbols and a flag telling whether
+    #null rows match, so that records can later be filtered by their symbol index.
+    def CompileFilter(self, filterNode):
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if isinstance(filterNode, FilterGroup):
+            for condition in filterNode.Conditions:
+                self.CompileFilter(condition)
+            return
+
+        if self.nullMissingFilterFields and filterNode.FieldName not in self.GetFieldNames():
+            #the field holds NULL in every record, as the column filled in for it
+            filterNode._FieldIndex = -1
+            filterNode._NullMatch = filterNode.Operator == "IS NULL"
+            return
+
+        filterNode._FieldIndex = self.SelectFields([filterNode.FieldName])[0]
+        symbols = self.qvdTableHeader.Fields.QvdFieldHeader[filterNode._FieldIndex]._SymbolVal
+        filterNode._NullMatch = filterNode.Operator == "IS NULL"
+
+        if filterNode.Operator in ("IS NULL", "IS NOT NULL"):
+            symbolMask = pc.is_null(symbols)
+            if filterNode.Operator == "IS NOT NULL":
+                symbolMask = pc.invert(symbolMask)
+        elif symbols.type == pa.null():
+            symbolMask = pa.array([False] * len(symbols))
+        else:
+            symbols, values = self.CoerceFilterValues(filterNode, symbols)
+
+            if filterNode.Operator in ("IN", "NOT IN"):
+                symbolMask = pc.is_in(symbols, value_set=values)
+                if filterNode.Operator == "NOT IN":
+                    symbolMask = pc.invert(symbolMask)
+            else:
+                compare = {"=": pc.equal, "!=": pc.not_equal, "<": pc.less, "<=": pc.less_equal,
+                           ">": pc.greater, ">=": pc.greater_equal}[filterNode.Operator]
+                symbolMask = compare(symbols, values[0])
+
+        #the last entry is for NULL records, whose index is -1
+        filterNode._SymbolMask = np.append(symbolMask.fill_null(False).to_numpy(zero_copy_only=False), filterNode._NullMatch)
+
+    #This is to bring the symbols and the filter values of a condition to a common type.
+    def CoerceFilterValues(self, filterNode, symbols):
+        import pyarrow as pa
+
+        if pa.types.is_string(symbols.type):
+            return symbols, pa.array([str(value) for value in filterNode.Values], type=pa.string())
+
+        if pa.types.is_temporal(symbols.type):
+            try:
+                return symbols, pa.array([str(value) for value in filterNode.Values], type=pa.string()).cast(symbols.type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                raise ValueError("Field [" + filterNode.FieldName + "] holds dates and cannot be compared with " + str(filterNode.Values) +
+                                 ", use values such as '2024-01-31' or '2024-01-31 12:00:00'")
+
+        try:
+            values = [float(value) if isinstance(value, str) else value for value in filterNode.Values]
+        except ValueError:
+            raise ValueError("Field [" + filterNode.FieldName + "] is numeric and cannot be compared with " + str(filterNode.Values))
+
+        if pa.types.is_integer(symbols.type) and all(isinstance(value, int) for value in values):
+            return symbols, pa.array(values, type=pa.int64())
+
+        return symbols.cast(pa.float64()), pa.array(values, type=pa.float64())
+
+    #This is to turn the compiled filter into a row mask, given the decoded symbol indexes.
+    def EvaluateFilter(self, filterNode, fieldIndexes, noOfRows):
+        import numpy as np
+
+        if isinstance(filterNode, FilterGroup):
+            rowMask = self.EvaluateFilter(filterNode.Conditions[0], fieldIndexes, noOfRows)
+            for condition in filterNode.Conditions[1:]:
+                if filterNode.Operator == "AND":
+                    rowMask &= self.EvaluateFilter(condition, fieldIndexes, noOfRows)
+                else:
+                    rowMask |= self.EvaluateFilter(condition, fieldIndexes, noOfRows)
+            return rowMask
+
+        if filterNode._FieldIndex < 0:
+            return np.full(noOfRows, filterNode._NullMatch)
+
+        return filterNode._SymbolMask[fieldIndexes[filterNode._FieldIndex]]
+
+    #This is to view a range of records as little-endian 64-bit words.
+    #Each row is zero-padded to a whole number of words so that a field can be
+    #extracted from one word, or from two adjacent words when it crosses a boundary.
+    def GetRecordWords(self, startRow, endRow):
+        import numpy as np
+
+        recordByteSize = self.qvdTableHeader.RecordByteSize
+
+        with self.profiler.Phase("ReadRecords", endRow - startRow, (endRow - startRow) * recordByteSize):
+            recordBytes = np.frombuffer(self.allRecordBytes, dtype=np.uint8,
+                                        count=(endRow - startRow) * recordByteSize,
+                                        offset=startRow * recordByteSize)
+
+            return self.PadRecordWords(recordBytes.reshape(endRow - startRow, recordByteSize))
+
+    #This is to gather arbitrary records, in the given order, as little-endian 64-bit words.
+    #Only the bytes of the requested rows are read from the record section.
+    def GetRecordWordsAt(self, rowNumbers):
+        import numpy as np
+
+        recordByteSize = self.qvdTableHeader.RecordByteSize
+        noOfRecords = self.qvdTableHeader.NoOfRecords
+
+        with self.profiler.Phase("ReadRecords", len(rowNumbers), len(rowNumbers) * recordByteSize):
+            recordBytes = np.frombuffer(self.allRecordBytes, dtype=np.uint8, count=noOfRecords * recordByteSize)
+
+            return self.PadRecordWords(recordBytes.reshape(noOfRecords, recordByteSize)[rowNumbers])
+
+    def PadRecordWords(self, recordBytes):
+        import numpy as np
+
+        recordByteSize = self.qvdTableHeader.RecordByteSize
+        noOfWords = max((recordByteSize + 7) // 8, 1)
+
+        if recordByteSize == noOfWords * 8:
+            return recordBytes.view('<u8')
+
+        paddedBytes = np.zeros((len(recordBytes), noOfWords * 8), dtype=np.uint8)
+        paddedBytes[:, :recordByteSize] = recordBytes
+
+        return paddedBytes.view('<u8')
+
+    #This is to extract the symbol index of one field from all rows at once.
+    #Fields with a non-zero Bias get their Bias added, see ApplyBias.
+    def DecodeFieldIndexes(self, recordWords, qvdFieldHeader):
+        indexes = self.DecodeFieldBits(recordWords, qvdFieldHeader)
+        if qvdFieldHeader.Bias != 0:
+            return self.ApplyBias(indexes, qvdFieldHeader.Bias)
+
+        return indexes
+
+    #This is to extract the stored value of one field from all rows at once.
+    def DecodeFieldBits(self, recordWords, qvdFieldHeader):
+        import numpy as np
+
+        wordIndex = qvdFieldHeader.BitOffset // 64
+        bitShift = qvdFieldHeader.BitOffset % 64
+
+        if qvdFieldHeader.BitWidth == 0:
+            return np.zeros(len(recordWords), dtype=np.uint64)
+
+        indexes = recordWords[:, wordIndex] >> np.uint64(bitShift)
+        if bitShift + qvdFieldHeader.BitWidth > 64:
+            indexes |= recordWords[:, wordIndex + 1] << np.uint64(64 - bitShift)
+
+        indexes &= np.uint64(self.bitMask[qvdFieldHeader.BitWidth])
+
+        return indexes
+
+    #This is to turn the stored values of a field with a Bias into symbol indexes: the symbol
+    #index is the stored value plus the Bias, and a negative one means the record holds NULL.
+    #The indexes are returned as int64 with -1 for NULL.
+    def ApplyBias(self, storedValues, bias):
+        import numpy as np
+
+        indexes = storedValues.view(np.int64) + bias
+        return np.maximum(indexes, -1, out=indexes)
+
+    #This is to decode the records [startRow, endRow) into a pyarrow record batch.
+    def ReadRecordBatch(self, startRow, endRow, dictionaryEncode=False):
+        return self.DecodeRecordBatch(self.GetRecordWords(startRow, endRow), dictionaryEncode)
+
+    #This is to decode records given as 64-bit words into a pyarrow record batch.
+    def DecodeRecordBatch(self, recordWords, dictionaryEncode=False):
+        return self.BuildRecordBatch(self.DecodeRecordIndexes(recordWords), len(recordWords), dictionaryEncode)
+
+    #This is to extract the symbol indexes of the selected and filter fields from records
+    #given as 64-bit words. Indexes of fields with a non-zero Bias are int64 with -1 for NULL.
+    def DecodeRecordIndexes(self, recordWords, qvdFieldHeaders=None):
+        qvdFieldHeaders = qvdFieldHeaders or {j: self.qvdTableHeader.Fields.QvdFieldHeader[j] for j in self.GetDecodedFieldIndexes()}
+
+        with self.profiler.Phase("DecodeRecords", len(recordWords), len(recordWords) * self.qvdTableHeader.RecordByteSize):
+            return {j: self.DecodeFieldIndexes(recordWords, qvdFieldHeader) for j, qvdFieldHeader in qvdFieldHeaders.items()}
+
+    #This is to get the schema of the record batches without decoding any record.
+    def GetArrowSchema(self, dictionaryEncode=False):
+        return self.ReadRecordBatch(0, 0, dictionaryEncode).schema
+
+    def GetDecodedFieldIndexes(self):
+        return sorted(set(self.selectedFieldIndexes) | set(self.filterFieldIndexes))
+
+    @staticmethod
+    def GetFieldProfileSchema():
+        import pyarrow as pa
+
+        return pa.schema([("FileName", pa.string()), ("FieldName", pa.string()), ("SymbolType", pa.string()), ("NumberFormat", pa.string()),
+                          ("Cardinality", pa.int64()), ("BitWidth", pa.int64()), ("Bias", pa.int64()), ("Nullable", pa.bool_()),
+                          ("MinValue", pa.string()), ("MaxValue", pa.string())])
+
+    @staticmethod
+    def GetDistinctValueSchema():
+        import pyarrow as pa
+
+        return pa.schema([("FileName", pa.string()), ("FieldName", pa.string()), ("Value", pa.string())])
+
+    #This is to describe every selected field with one row, from its header and symbol table only:
+    #NoOfSymbols is the cardinality and the symbol table holds every distinct value once.
+    #Nullable is true when the field can hold NULL: its Bias is negative or it has a NULL symbol.
+    #Whether any record actually is NULL would take decoding every record, so it is not reported.
+    def GetFieldProfile(self):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        rows = []
+        for j in self.selectedFieldIndexes:
+            qvdFieldHeader = self.qvdTableHeader.Fields.QvdFieldHeader[j]
+            symbols = qvdFieldHeader._SymbolVal
+            minValue = maxValue = None
+
+            if len(symbols) > 0 and not pa.types.is_null(symbols.type):
+                minMax = pc.min_max(symbols)
+                minValue = None if minMax["min"].as_py() is None else str(minMax["min"].as_py())
+                maxValue = None if minMax["max"].as_py() is None else str(minMax["max"].as_py())
+
+            rows.append({"FileName": self.qvdFile, "FieldName": qvdFieldHeader.FieldName,
+                         "SymbolType": self.symbolTypeNames.get(qvdFieldHeader._SymbolType, str(qvdFieldHeader._SymbolType)),
+                         "NumberFormat": qvdFieldHeader.NumberFormat.Type.value if qvdFieldHeader.NumberFormat is not None else None,
+                         "Cardinality": qvdFieldHeader.NoOfSymbols, "BitWidth": qvdFieldHeader.BitWidth, "Bias": qvdFieldHeader.Bias,
+                         "Nullable": qvdFieldHeader.Bias < 0 or symbols.null_count > 0, "MinValue": minValue, "MaxValue": maxValue})
+
+        return pa.RecordBatch.from_pylist(rows, schema=self.GetFieldProfileSchema())
+
+    #This is to yield the distinct values of every selected field as text, in symbol order and chunkSize at a time.
+    def GetDistinctValueBatches(self, chunkSize=None):
+        import pyarrow as pa
+
+        chunkSize = chunkSize or self.recordChunkSize
+        for j in self.selectedFieldIndexes:
+            qvdFieldHeader = self.qvdTableHeader.Fields.QvdFieldHeader[j]
+            values = qvdFieldHeader._SymbolVal.cast(pa.string())
+
+            for startPos in range(0, len(values), chunkSize):
+                chunk = values.slice(startPos, chunkSize)
+                yield pa.RecordBatch.from_arrays([pa.array([self.qvdFile] * len(chunk), pa.string()),
+                                                  pa.array([qvdFieldHeader.FieldName] * len(chunk), pa.string()), chunk],
+                                                 schema=self.GetDistinctValueSchema())
+
+    #This is to build a pyarrow record batch from decoded symbol indexes.
+    #The filter is applied to the indexes first, so only matching records are materialized,
+    #then each field's symbol values are looked up with a single take.
+    def BuildRecordBatch(self, fieldIndexes, noOfRows, dictionaryEncode=False, applyFilter=True):
+        import pyarrow as pa
+
+        phaseToken = self.profiler.Begin("BuildArrow")
+
+        if self.recordFilter is not None and applyFilter:
+            rowMask = self.EvaluateFilter(self.recordFilter, fieldIndexes, noOfRows)
+            fieldIndexes = {j: indexes[rowMask] for j, indexes in fieldIndexes.items()}
+            noOfRows = int(rowMask.sum())
+
+        arrays = []
+        fields = []
+        for j in self.selectedFieldIndexes:
+            field, array = self.BuildFieldArray(j, fieldIndexes[j], noOfRows, dictionaryEncode)
+            fields.append(field)
+            arrays.append(array)
+
+            if j in self.dateTextFieldIndexes:
+                field, array = self.BuildFieldArray(j, fieldIndexes[j], noOfRows, dictionaryEncode, dateText=True)
+                fields.append(field)
+                arrays.append(array)
+
+        batch = pa.RecordBatch.from_arrays(arrays, schema=pa.schema(fields))
+        if phaseToken is not None:
+            self.profiler.End(phaseToken, batch.num_rows, batch.nbytes)
+
+        return batch
+
+    #This is to decode chunks of records, given as (startRow, endRow) ranges or arrays of
+    #row numbers, and yield (chunk, record batch) in chunk order.
+    #With more than one worker the chunks are decoded concurrently, with at most twice as
+    #many chunks in flight as there are workers to bound memory. Threads decode whole batches;
+    #processes map the QVD file themselves and only return the symbol indexes of their rows.
+    def DecodeRecordChunks(self, chunks, dictionaryEncode=False, pipelined=False):
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        if pipelined:
+            yield from self.DecodeRecordChunksPipelined(chunks, dictionaryEncode)
+            return
+
+        if self.workers <= 1:
+            for chunk in chunks:
+                yield chunk, self.DecodeRecordChunk(chunk, dictionaryEncode)
+            return
+
+        if self.workerType == 'process':
+            pool = ProcessPoolExecutor(max_workers=self.workers)
+            recordStart = self.xmlEndPosition + self.qvdTableHeader.Offset + 1
+            recordHeader = QvdTableHeader(RecordByteSize=self.qvdTableHeader.RecordByteSize, NoOfRecords=self.qvdTableHeader.NoOfRecords,
+                                          Length=self.qvdTableHeader.Length)
+            qvdFieldHeaders = {j: replace(self.qvdTableHeader.Fields.QvdFieldHeader[j], _SymbolVal=None, _SymbolBytes=None)
+                               for j in self.GetDecodedFieldIndexes()}
+            submit = lambda chunk: pool.submit(DecodeRecordIndexesInProcess, self.qvdFile, recordStart, recordHeader, qvdFieldHeaders, chunk)
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.workers)
+            submit = lambda chunk: pool.submit(self.DecodeRecordChunk, chunk, dictionaryEncode)
+
+        try:
+            pending = deque()
+            for chunk in chunks:
+                pending.append((chunk, submit(chunk)))
+
+                if len(pending) >= 2 * self.workers:
+                    yield self.CollectRecordChunk(pending.popleft(), dictionaryEncode)
+
+            while pending:
+                yield self.CollectRecordChunk(pending.popleft(), dictionaryEncode)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    #This is to decode chunks of records in three overlapping stages connected by bounded queues:
+    #a read-ahead thread reads the next chunk of the record section from disk with its own file
+    #handle, a decode thread turns chunks into record batches, and the caller emits them.
+    #At most pipelineDepth chunks wait between two stages, which caps the memory in flight.
+    def DecodeRecordChunksPipelined(self, chunks, dictionaryEncode=False):
+        import queue
+        import threading
+
+        stopEvent = threading.Event()
+        readQueue = queue.Queue(self.pipelineDepth)
+        decodeQueue = queue.Queue(self.pipelineDepth)
+        endOfChunks = object()
+
+        def Put(stageQueue, item):
+            while not stopEvent.is_set():
+                try:
+                    stageQueue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def Get(stageQueue):
+            while not stopEvent.is_set():
+                try:
+                    return stageQueue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return endOfChunks
+
+        def ReadStage():
+            try:
+                with open(self.qvdFile, 'rb') as file:
+                    for chunk in chunks:
+                        if not Put(readQueue, (chunk, self.ReadRecordChunkWords(file, chunk))):
+                            return
+                Put(readQueue, endOfChunks)
+            except Exception as e:
+                Put(readQueue, e)
+
+        def DecodeStage():
+            try:
+                while True:
+                    item = Get(readQueue)
+                    if item is endOfChunks or isinstance(item, Exception):
+                        Put(decodeQueue, item)
+                        return
+
+                    chunk, recordWords = item
+                    if not Put(decodeQueue, (chunk, self.DecodeRecordBatch(recordWords, dictionaryEncode))):
+                        return
+            except Exception as e:
+                Put(decodeQueue, e)
+
+        stages = [threading.Thread(target=ReadStage, daemon=True), threading.Thread(target=DecodeStage, daemon=True)]
+        for stage in stages:
+            stage.start()
+
+        try:
+            while True:
+                item = Get(decodeQueue)
+                if item is endOfChunks:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stopEvent.set()
+            for stage in stages:
+                stage.join()
+
+    #This is to read the records of a chunk from the file as 64-bit words.
+    #Row ranges are read with a single seek and read; row lists are gathered from the record section.
+    def ReadRecordChunkWords(self, file, chunk):
+        import numpy as np
+
+        if not isinstance(chunk, tuple):
+            return self.GetRecordWordsAt(chunk)
+
+        recordByteSize = self.qvdTableHeader.RecordByteSize
+        with self.profiler.Phase("ReadRecords", chunk[1] - chunk[0], (chunk[1] - chunk[0]) * recordByteSize):
+            file.seek(self.xmlEndPosition + self.qvdTableHeader.Offset + 1 + chunk[0] * recordByteSize)
+            recordBytes = np.frombuffer(file.read((chunk[1] - chunk[0]) * recordByteSize), dtype=np.uint8)
+
+            return self.PadRecordWords(recordBytes.reshape(chunk[1] - chunk[0], recordByteSize))
+
+    def CollectRecordChunk(self, pendingChunk, dictionaryEncode):
+        chunk, future = pendingChunk
+        result = future.result()
+
+        if isinstance(result, dict):
+            noOfRows = chunk[1] - chunk[0] if isinstance(chunk, tuple) else len(chunk)
+            result = self.BuildRecordBatch(result, noOfRows, dictionaryEncode)
+
+        return chunk, result
+
+    def DecodeRecordChunk(self, chunk, dictionaryEncode=False):
+        if isinstance(chunk, tuple):
+            return self.ReadRecordBatch(chunk[0], chunk[1], dictionaryEncode)
+
+        return self.DecodeRecordBatch(self.GetRecordWordsAt(chunk), dictionaryEncode)
+
+    #This is to read the record data as a stream of record batches of chunkSize rows.
+    #The schema and the symbol tables are shared by all batches.
+    #startRow/endRow restrict the read to the rows [startRow, endRow), rowNumbers reads
+    #exactly those rows in the given order, and recordLimit stops after that many records
+    #have been returned. Rows are located by their offset in the record section, so
+    #records outside the requested rows are never read.
+    #With pipelined, reading, decoding and emitting of consecutive chunks overlap.
+    def ReadRecordBatches(self, io, chunkSize=None, dictionaryEncode=False, startRow=0, endRow=None, rowNumbers=None, recordLimit=None,
+                          pipelined=False):
+        import numpy as np
+
+        io.info("Total number of records: " + str(self.qvdTableHeader.NoOfRecords))
+
+        noOfRecords = self.qvdTableHeader.NoOfRecords
+        chunkSize = chunkSize or self.recordChunkSize
+
+        if rowNumbers is not None:
+            rowNumbers = np.asarray(rowNumbers, dtype=np.int64)
+            if len(rowNumbers) > 0 and (rowNumbers.min() < 0 or rowNumbers.max() >= noOfRecords):
+                raise ValueError("Row numbers must be between 0 and " + str(noOfRecords - 1))
+
+            chunks = (rowNumbers[chunkStart:chunkStart + chunkSize] for chunkStart in range(0, len(rowNumbers), chunkSize))
+        else:
+            endRow = noOfRecords if endRow is None else min(endRow, noOfRecords)
+            startRow = min(max(startRow, 0), endRow)
+
+            #without a filter the limit is a plain row range
+            if recordLimit is not None and self.recordFilter is None:
+                endRow = min(endRow, startRow + recordLimit)
+
+            chunks = ((chunkStart, min(chunkStart + chunkSize, endRow)) for chunkStart in range(startRow, endRow, chunkSize))
+
+        noOfBatches = 0
+        noOfReturnedRecords = 0
+        noOfReadRecords = 0
+        decodedChunks = self.DecodeRecordChunks(chunks, dictionaryEncode, pipelined)
+        for chunk, batch in decodedChunks:
+            noOfReadRecords += chunk[1] - chunk[0] if isinstance(chunk, tuple) else len(chunk)
+
+            if recordLimit is not None and noOfReturnedRecords + batch.num_rows > recordLimit:
+                batch = batch.slice(0, recordLimit - noOfReturnedRecords)
+
+            if batch.num_rows > 0:
+                noOfBatches += 1
+                noOfReturnedRecords += batch.num_rows
+                self.memoryTracker.Set("RecordBatch", batch.nbytes, id(self))
+                yield batch
+
+            io.info("Read " + str(noOfReadRecords) + " records ...")
+
+            if recordLimit is not None and noOfReturnedRecords >= recordLimit:
+                break
+
+        decodedChunks.close()
+        self.memoryTracker.Set("RecordBatch", 0, id(self))
+
+        #always emit the schema, even when no record is returned
+        if noOfBatches == 0:
+            yield self.ReadRecordBatch(0, 0, dictionaryEncode)
+
+    #This is to get a mask per 64-bit record word with the bits of the given fields set,
+    #by default those of the selected fields.
+    def GetFieldBitMask(self, fieldIndexes=None):
+        import numpy as np
+
+        fieldBitMask = [0] * max((self.qvdTableHeader.RecordByteSize + 7) // 8, 1)
+        for j in self.selectedFieldIndexes if fieldIndexes is None else fieldIndexes:
+            qvdFieldHeader = self.qvdTableHeader.Fields.QvdFieldHeader[j]
+            if qvdFieldHeader.BitWidth > 0:
+                bits = self.bitMask[qvdFieldHeader.BitWidth] << qvdFieldHeader.BitOffset
+                for k in range(len(fieldBitMask)):
+                    fieldBitMask[k] |= (bits >> (64 * k)) & self.bitMask[64]
+
+        return np.array(fieldBitMask, dtype=np.uint64)
+
+    #This is to get one sort key per masked record. When the selected fields take 64 bits or less
+    #their stored values are packed into one integer, otherwise the words are compared as one opaque value.
+    def GetDistinctKeys(self, recordWords):
+        import numpy as np
+
+        if recordWords.shape[1] == 1:
+            return recordWords[:, 0]
+
+        qvdFieldHeaders = [self.qvdTableHeader.Fields.QvdFieldHeader[j] for j in self.selectedFieldIndexes]
+        qvdFieldHeaders = [qvdFieldHeader for qvdFieldHeader in qvdFieldHeaders if qvdFieldHeader.BitWidth > 0]
+        if sum(qvdFieldHeader.BitWidth for qvdFieldHeader in qvdFieldHeaders) > 64:
+            return np.ascontiguousarray(recordWords).view(np.dtype((np.void, 8 * recordWords.shape[1]))).ravel()
+
+        keys = np.zeros(len(recordWords), dtype=np.uint64)
+        for qvdFieldHeader in qvdFieldHeaders:
+            keys <<= np.uint64(qvdFieldHeader.BitWidth)
+            keys |= self.DecodeFieldBits(recordWords, qvdFieldHeader)
+        return keys
+
+    #This is to deduplicate masked record words, keeping the first row number and the number of
+    #records of every distinct one.
+    def GetDistinctWords(self, recordWords, firstRows, counts):
+        import numpy as np
+
+        if len(recordWords) == 0:
+            return recordWords, firstRows, counts
+
+        keys = self.GetDistinctKeys(recordWords)
+
+        order = np.argsort(keys, kind='stable')
+        sortedKeys = keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], sortedKeys[1:] != sortedKeys[:-1])))
+
+        return recordWords[order[starts]], np.minimum.reduceat(firstRows[order], starts), np.add.reduceat(counts[order], starts)
+
+    #This is to deduplicate one chunk of records on the bits of the selected fields, after the filter.
+    #A field with a Bias can store NULL as any value below -Bias, so its bits are cleared in NULL
+    #records to make them all one distinct value.
+    def DistinctRecordChunk(self, chunk, fieldBitMask):
+        import numpy as np
+
+        recordWords = self.GetRecordWords(chunk[0], chunk[1])
+        firstRows = np.arange(chunk[0], chunk[1], dtype=np.int64)
+
+        if self.recordFilter is not None:
+            filterFieldHeaders = {j: self.qvdTableHeader.Fields.QvdFieldHeader[j] for j in self.filterFieldIndexes}
+            rowMask = self.EvaluateFilter(self.recordFilter, self.DecodeRecordIndexes(recordWords, filterFieldHeaders), len(recordWords))
+            recordWords, firstRows = recordWords[rowMask], firstRows[rowMask]
+
+        recordWords = recordWords & fieldBitMask
+        for j in self.selectedFieldIndexes:
+            qvdFieldHeader = self.qvdTableHeader.Fields.QvdFieldHeader[j]
+            if qvdFieldHeader.Bias != 0 and qvdFieldHeader.BitWidth > 0:
+                recordWords[self.DecodeFieldIndexes(recordWords, qvdFieldHeader) < 0] &= ~self.GetFieldBitMask([j])
+
+        return self.GetDistinctWords(recordWords, firstRows, np.ones(len(firstRows), dtype=np.int64))
+
+    #This is to read the distinct records of the selected fields, deduplicated on their packed
+    #index bits before any symbol value is looked up. The other fields' bits are masked out of
+    #the record words, chunks are deduplicated on the worker threads and merged pairwise, and only
+    #the distinct records are decoded, in the order of their first occurrence. With countField
+    #a column of that name holds the number of records of every distinct record.
+    def ReadDistinctRecordBatches(self, io, chunkSize=None, dictionaryEncode=False, startRow=0, endRow=None, recordLimit=None,
+                                  countField=None):
+        import numpy as np
+        import pyarrow as pa
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+
+        noOfRecords = self.qvdTableHeader.NoOfRecords
+        chunkSize = chunkSize or self.recordChunkSize
+        endRow = noOfRecords if endRow is None else min(endRow, noOfRecords)
+        startRow = min(max(startRow, 0), endRow)
+        chunks = [(chunkStart, min(chunkStart + chunkSize, endRow)) for chunkStart in range(startRow, endRow, chunkSize)]
+        fieldBitMask = self.GetFieldBitMask()
+
+        io.info("Total number of records: " + str(noOfRecords))
+
+        partials = []
+        noOfReadRecords = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque()
+            for chunkIndex in range(len(chunks) + 1):
+                if chunkIndex < len(chunks):
+                    pending.append((chunks[chunkIndex], pool.submit(self.DistinctRecordChunk, chunks[chunkIndex], fieldBitMask)))
+
+                while pending and (len(pending) >= 2 * self.workers or chunkIndex == len(chunks)):
+                    chunk, future = pending.popleft()
+                    partials.append((1, future.result()))
+                    while len(partials) > 1 and partials[-1][0] == partials[-2][0]:
+                        noOfChunks, partial = partials.pop()
+                        partials[-1] = (partials[-1][0] + noOfChunks,
+                                        self.GetDistinctWords(*(np.concatenate(parts) for parts in zip(partials[-1][1], partial))))
+
+                    noOfReadRecords += chunk[1] - chunk[0]
+                    self.memoryTracker.Set("DistinctRecords", sum(partial[0].nbytes for noOfChunks, partial in partials), id(self))
+                    io.info("Deduplicated " + str(noOfReadRecords) + " records ...")
+
+        noOfWords = len(fieldBitMask)
+        distinctWords, firstRows, counts = np.zeros((0, noOfWords), dtype=np.uint64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        if partials:
+            distinctWords, firstRows, counts = self.GetDistinctWords(*(np.concatenate(parts) for parts in zip(*(partial for noOfChunks, partial in partials))))
+
+        order = np.argsort(firstRows, kind='stable')[:recordLimit]
+        distinctWords, counts = distinctWords[order], counts[order]
+        io.info("Distinct records: " + str(len(distinctWords)))
+
+        qvdFieldHeaders = {j: self.qvdTableHeader.Fields.QvdFieldHeader[j] for j in self.selectedFieldIndexes}
+        for batchStart in range(0, max(len(distinctWords), 1), chunkSize):
+            batchWords = distinctWords[batchStart:batchStart + chunkSize]
+            batch = self.BuildRecordBatch(self.DecodeRecordIndexes(batchWords, qvdFieldHeaders), len(batchWords), dictionaryEncode, applyFilter=False)
+            if countField:
+                batch = pa.RecordBatch.from_arrays(batch.columns + [pa.array(counts[batchStart:batchStart + chunkSize], type=pa.int64())],
+                                                   schema=batch.schema.append(pa.field(countField, pa.int64())))
+            yield batch
+
+        self.memoryTracker.Set("DistinctRecords", 0, id(self))
+
+    #This is to read all the record data.
+    #With dictionaryEncode, columns are emitted as pa.DictionaryArray over the symbol tables.
+    def ReadAllRecords(self, io, dictionaryEncode=False):
+        import pyarrow as pa
+
+        return pa.Table.from_batches(list(self.ReadRecordBatches(io, self.recordChunkSize, dictionaryEncode)))
+
+    #This is to pick the narrowest signed dictionary index type for a symbol table.
+    def GetDictionaryIndexType(self, noOfSymbols):
+        import pyarrow as pa
+
+        if noOfSymbols <= 128:
+            return pa.int8()
+        elif noOfSymbols <= 32768:
+            return pa.int16()
+        else:
+            return pa.int32()
+
+    #This is to turn the decoded symbol indexes of one field into an Arrow column.
+    #Records with a negative index hold NULL. With dictionaryEncode, and for compacted
+    #text fields, the symbol table becomes the dictionary and the indexes its codes, otherwise
+    #the values are taken. With dateText the text of a typed date field is returned instead.
+    def BuildFieldArray(self, fieldIndex, indexes, noOfRecords, dictionaryEncode=False, dateText=False):
+        import pyarrow as pa
+
+        qvdFieldHeader = self.qvdTableHeader.Fields.QvdFieldHeader[fieldIndex]
+        field = self.pyarrowDatatypes[fieldIndex]
+
+        if field.type == pa.null():
+            return field, pa.nulls(noOfRecords)
+
+        symbols = qvdFieldHeader._SymbolVal
+        if dateText:
+            field = pa.field(field.name + self.dateTextSuffix, pa.string())
+            symbols = qvdFieldHeader._SymbolText
+
+        nullMask = indexes < 0 if qvdFieldHeader.Bias != 0 else None
+
+        if not dictionaryEncode and (dateText or fieldIndex not in self.dictionaryFieldIndexes):
+            return field, symbols.take(pa.array(indexes, mask=nullMask))
+
+        indexType = self.GetDictionaryIndexType(qvdFieldHeader.NoOfSymbols)
+        field = pa.field(field.name, pa.dictionary(indexType, field.type))
+        codes = pa.array(indexes.astype(indexType.to_pandas_dtype()), mask=nullMask)
+
+        return field, pa.DictionaryArray.from_arrays(codes, symbols)
+
+
+class QVDAggregator:
+    """
+    Grouped aggregates of one QVD file, computed on the symbol indexes of its records.
+
+    The symbol indexes of the group-by fields are packed into one integer key per record,
+    the first field in the most significant position. Records are grouped with a bincount
+    over the keys when all combinations fit in denseGroupLimit, otherwise over the distinct
+    keys of each chunk. Counts, sums, minimums and maximums are accumulated per chunk and
+    merged, and symbol values are only looked up for the groups in the result. Sums of integer
+    fields are accumulated in int64 so they stay exact. Group-by fields with a non-zero Bias
+    can hold NULL, which gets the code 0 in the key and shifts the symbol indexes up by one.
+    """
+
+    outputPrefixes = {"count": "CountNonNull", "count_distinct": "CountDistinct", "sum": "Sum", "min": "Min", "max": "Max"}
+    denseGroupLimit : int = 1 << 22
+
+    qvdConverter : QVDConverter = None
+    groupByFieldIndexes : [] = None
+    aggregates : [] = None
+
+    def __init__(self, qvdConverter, groupByFieldNames, aggregates):
+        import pyarrow as pa
+
+        self.qvdConverter = qvdConverter
+        qvdFieldHeaders = qvdConverter.qvdTableHeader.Fields.QvdFieldHeader
+        fieldIndexes = {qvdFieldHeader.FieldName: j for j, qvdFieldHeader in enumerate(qvdFieldHeaders)}
+
+        self.groupByFieldIndexes = [fieldIndexes[fieldName] for fieldName in groupByFieldNames]
+        self.aggregates = []
+        for function, fieldName in (self.ParseAggregate(aggregate) for aggregate in aggregates):
+            fieldIndex = fieldIndexes[fieldName] if fieldName else None
+            if function in ("sum", "min", "max"):
+                valueType = qvdConverter.pyarrowDatatypes[fieldIndex].type
+                if not (pa.types.is_integer(valueType) or pa.types.is_floating(valueType) or pa.types.is_null(valueType)):
+                    raise ValueError(function + " needs a numeric field, " + fieldName + " holds " + str(valueType) + " values")
+
+            outputName = "Count" if fieldName is None else self.outputPrefixes[function] + "_" + fieldName
+            self.aggregates.append((function, fieldIndex, outputName))
+
+        #key code range of every group-by field; fields with a Bias have an extra code for NULL
+        self.nullOffsets = [1 if qvdFieldHeaders[j].Bias != 0 else 0 for j in self.groupByFieldIndexes]
+        self.cardinalities = [max(qvdFieldHeaders[j].NoOfSymbols + nullOffset, 1) for j, nullOffset in zip(self.groupByFieldIndexes, self.nullOffsets)]
+        self.strides = [1] * len(self.cardinalities)
+        for k in range(len(self.cardinalities) - 2, -1, -1):
+            self.strides[k] = self.strides[k + 1] * self.cardinalities[k + 1]
+
+        self.noOfGroups = self.strides[0] * self.cardinalities[0] if self.cardinalities else 1
+        if self.noOfGroups >= 1 << 62:
+            raise ValueError("Too many combinations of the group-by fields to aggregate on symbol indexes")
+        self.dense = self.noOfGroups <= self.denseGroupLimit
+
+    #This is to split an aggregate such as count, sum(Amount) or count_distinct(Customer) into function and field name.
+    @staticmethod
+    def ParseAggregate(aggregate):
+        match = re.fullmatch(r"\s*(\w+)\s*(?:\((.*)\))?\s*", aggregate)
+        function = match.group(1).lower() if match else None
+        fieldName = (match.group(2) or "").strip() if match else ""
+
+        if function not in QVDAggregator.outputPrefixes or (not fieldName and function != "count"):
+            raise ValueError("Unknown aggregate " + aggregate + ", use count, count(Field), count_distinct(Field), sum(Field), min(Field) or max(Field)")
+        return function, fieldName or None
+
+    #This is to list the fields an aggregation reads, group-by fields first.
+    @staticmethod
+    def GetFieldNames(groupByFieldNames, aggregates):
+        fieldNames = list(groupByFieldNames)
+        fieldNames += [fieldName for function, fieldName in map(QVDAggregator.ParseAggregate, aggregates) if fieldName]
+        return list(dict.fromkeys(fieldNames))
+
+    def GetArrowSchema(self):
+        import pyarrow as pa
+
+        pyarrowDatatypes = self.qvdConverter.pyarrowDatatypes
+        fields = [pyarrowDatatypes[j] for j in self.groupByFieldIndexes]
+        for function, fieldIndex, outputName in self.aggregates:
+            if function in ("count", "count_distinct"):
+                fields.append(pa.field(outputName, pa.int64()))
+            elif function == "sum" and not pa.types.is_floating(pyarrowDatatypes[fieldIndex].type):
+                fields.append(pa.field(outputName, pa.int64()))
+            elif function == "sum":
+                fields.append(pa.field(outputName, pa.float64()))
+            else:
+                fields.append(pa.field(outputName, pyarrowDatatypes[fieldIndex].type))
+
+        return pa.schema(fields)
+
+    #This is to get the numeric values of a field's symbols as float64, with NaN for NULL,
+    #or with exact as int64 for an integer field, with 0 for NULL.
+    def GetSymbolValues(self, fieldIndex, exact=False):
+        import numpy as np
+        import pyarrow as pa
+
+        symbols = self.qvdConverter.qvdTableHeader.Fields.QvdFieldHeader[fieldIndex]._SymbolVal
+        if exact:
+            return symbols.cast(pa.int64()).fill_null(0).to_numpy(zero_copy_only=False)
+        if pa.types.is_null(symbols.type):
+            return np.full(len(symbols), np.nan)
+        return symbols.cast(pa.float64()).to_numpy(zero_copy_only=False)
+
+    #This is to tell whether an aggregate sums an integer field, which is summed exactly in int64.
+    def IsExactSum(self, function, fieldIndex):
+        import pyarrow as pa
+
+        return function == "sum" and pa.types.is_integer(self.qvdConverter.pyarrowDatatypes[fieldIndex].type)
+
+    #This is to get the symbol indexes of a field and a mask of its non-NULL records,
+    #or None as mask when every record has a value.
+    def GetValidIndexes(self, fieldIndexes, fieldIndex):
+        import numpy as np
+
+        qvdFieldHeader = self.qvdConverter.qvdTableHeader.Fields.QvdFieldHeader[fieldIndex]
+        indexes = fieldIndexes[fieldIndex].view(np.int64)
+        validMask = indexes >= 0 if qvdFieldHeader.Bias != 0 else None
+
+        symbols = qvdFieldHeader._SymbolVal
+        if symbols.null_count > 0:
+            #NULL records index the last symbol here and are already masked out
+            symbolMask = ~symbols.is_null().to_numpy(zero_copy_only=False)[indexes]
+            validMask = symbolMask if validMask is None else validMask & symbolMask
+        return indexes, validMask
+
+    #This is to get the sorted distinct values of an integer array; sorting is much faster
+    #than np.unique's hashing for the large key arrays of an aggregation.
+    def GetSortedKeys(self, keys):
+        import numpy as np
+
+        keys = np.sort(keys)
+        if len(keys) < 2:
+            return keys
+        return keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+
+    #This is to tell whether the distinct (group, symbol) pairs of a field are kept as a bitmap.
+    def IsDenseDistinct(self, fieldIndex):
+        noOfSymbols = max(self.qvdConverter.qvdTableHeader.Fields.QvdFieldHeader[fieldIndex].NoOfSymbols, 1)
+        return self.noOfGroups * noOfSymbols <= self.denseGroupLimit
+
+    #This is to aggregate one chunk of records into per-group partial results.
+    def AggregateChunk(self, chunk, symbolValues):
+        import numpy as np
+
+        qvdConverter = self.qvdConverter
+        noOfRows = chunk[1] - chunk[0]
+        fieldIndexes = qvdConverter.DecodeRecordIndexes(qvdConverter.GetRecordWords(chunk[0], chunk[1]))
+
+        if qvdConverter.recordFilter is not None:
+            rowMask = qvdConverter.EvaluateFilter(qvdConverter.recordFilter, fieldIndexes, noOfRows)
+            fieldIndexes = {j: indexes[rowMask] for j, indexes in fieldIndexes.items()}
+            noOfRows = int(rowMask.sum())
+
+        keys = np.zeros(noOfRows, dtype=np.int64)
+        for j, stride, nullOffset in zip(self.groupByFieldIndexes, self.strides, self.nullOffsets):
+            codes = fieldIndexes[j].view(np.int64) + nullOffset if nullOffset else fieldIndexes[j].view(np.int64)
+            keys += codes * stride if stride > 1 else codes
+
+        if self.dense:
+            groupKeys, groupPositions, noOfGroups = None, keys, self.noOfGroups
+        else:
+            order = np.argsort(keys)
+            sortedKeys = keys[order]
+            firstFlags = np.concatenate(([True], sortedKeys[1:] != sortedKeys[:-1])) if noOfRows > 0 else np.zeros(0, dtype=bool)
+            groupKeys = sortedKeys[firstFlags]
+            groupPositions = np.empty(noOfRows, dtype=np.int64)
+            groupPositions[order] = np.cumsum(firstFlags) - 1
+            noOfGroups = len(groupKeys)
+
+        partial = {"keys": groupKeys, "count": np.bincount(groupPositions, minlength=noOfGroups)}
+        for k, (function, fieldIndex, outputName) in enumerate(self.aggregates):
+            if fieldIndex is None:
+                continue
+
+            indexes, validMask = self.GetValidIndexes(fieldIndexes, fieldIndex)
+            if validMask is None:
+                validKeys, validPositions, validIndexes = keys, groupPositions, indexes
+                partial[("valid", k)] = partial["count"]
+            else:
+                validKeys, validPositions, validIndexes = keys[validMask], groupPositions[validMask], indexes[validMask]
+                partial[("valid", k)] = np.bincount(validPositions, minlength=noOfGroups)
+
+            if function == "count_distinct":
+                noOfSymbols = max(qvdConverter.qvdTableHeader.Fields.QvdFieldHeader[fieldIndex].NoOfSymbols, 1)
+                pairKeys = validKeys * noOfSymbols + validIndexes
+                if self.IsDenseDistinct(fieldIndex):
+                    partial[("distinct", k)] = np.zeros(self.noOfGroups * noOfSymbols, dtype=bool)
+                    partial[("distinct", k)][pairKeys] = True
+                else:
+                    partial[("distinct", k)] = [self.GetSortedKeys(pairKeys)]
+            elif self.IsExactSum(function, fieldIndex):
+                #float64 weights would round integer sums beyond 2**53
+                partial[("sum", k)] = np.zeros(noOfGroups, dtype=np.int64)
+                np.add.at(partial[("sum", k)], validPositions, symbolValues[(fieldIndex, True)][validIndexes])
+            elif function == "sum":
+                partial[("sum", k)] = np.bincount(validPositions, weights=symbolValues[(fieldIndex, False)][validIndexes], minlength=noOfGroups)
+            elif function == "min":
+                partial[("min", k)] = np.full(noOfGroups, np.inf)
+                np.minimum.at(partial[("min", k)], validPositions, symbolValues[(fieldIndex, False)][validIndexes])
+            elif function == "max":
+                partial[("max", k)] = np.full(noOfGroups, -np.inf)
+                np.maximum.at(partial[("max", k)], validPositions, symbolValues[(fieldIndex, False)][validIndexes])
+
+        return partial
+
+    #This is to merge the partial results of two chunks; group keys of both are sorted and distinct.
+    def MergePartials(self, total, partial):
+        import numpy as np
+
+        if total is None:
+            return partial
+
+        if self.dense:
+            keys = None
+            totalPositions = partialPositions = slice(None)
+            noOfGroups = self.noOfGroups
+        else:
+            keys = self.GetSortedKeys(np.concatenate((total["keys"], partial["keys"])))
+            totalPositions = np.searchsorted(keys, total["keys"])
+            partialPositions = np.searchsorted(keys, partial["keys"])
+            noOfGroups = len(keys)
+
+        merged = {"keys": keys}
+        for name, values in total.items():
+            if name == "keys":
+                continue
+            if name[0] == "distinct" and isinstance(values, list):
+                #distinct pairs of chunks are collected and only deduplicated once they outgrow the deduplicated ones
+                merged[name] = values + partial[name]
+                if sum(len(pairKeys) for pairKeys in merged[name][1:]) > len(merged[name][0]):
+                    merged[name] = [self.GetSortedKeys(np.concatenate(merged[name]))]
+                continue
+            if name[0] == "distinct":
+                merged[name] = values | partial[name]
+                continue
+
+            identity, operator = {"min": (np.inf, np.minimum), "max": (-np.inf, np.maximum)}.get(name[0], (0, np.add))
+            merged[name] = np.full(noOfGroups, identity, dtype=values.dtype)
+            merged[name][totalPositions] = values
+            merged[name][partialPositions] = operator(merged[name][partialPositions], partial[name])
+
+        return merged
+
+    #This is to turn the merged partial results into the result table, one row per group with records.
+    def BuildResult(self, total):
+        import numpy as np
+        import pyarrow as pa
+
+        schema = self.GetArrowSchema()
+        qvdFieldHeaders = self.qvdConverter.qvdTableHeader.Fields.QvdFieldHeader
+
+        counts = total["count"]
+        groupPositions = np.flatnonzero(counts)
+        groupKeys = groupPositions if self.dense else total["keys"][groupPositions]
+
+        arrays = []
+        for j, cardinality, stride, nullOffset in zip(self.groupByFieldIndexes, self.cardinalities, self.strides, self.nullOffsets):
+            indexes = (groupKeys // stride) % cardinality - nullOffset
+            arrays.append(qvdFieldHeaders[j]._SymbolVal.take(pa.array(indexes, mask=indexes < 0 if nullOffset else None)))
+
+        for k, ((function, fieldIndex, outputName), field) in enumerate(zip(self.aggregates, list(schema)[len(arrays):])):
+            if fieldIndex is None:
+                arrays.append(pa.array(counts[groupPositions], type=pa.int64()))
+                continue
+
+            if function == "count":
+                arrays.append(pa.array(total[("valid", k)][groupPositions], type=pa.int64()))
+            elif function == "count_distinct":
+                noOfSymbols = max(qvdFieldHeaders[fieldIndex].NoOfSymbols, 1)
+                #every pair belongs to a group with records, and the group keys are sorted
+                if self.IsDenseDistinct(fieldIndex):
+                    distinctGroups = np.flatnonzero(total[("distinct", k)]) // noOfSymbols
+                else:
+                    distinctGroups = self.GetSortedKeys(np.concatenate(total[("distinct", k)])) // noOfSymbols
+                if self.dense:
+                    distinctCounts = np.bincount(distinctGroups, minlength=self.noOfGroups)[groupPositions]
+                else:
+                    distinctCounts = np.bincount(np.searchsorted(groupKeys, distinctGroups), minlength=len(groupKeys))
+                arrays.append(pa.array(distinctCounts, type=pa.int64()))
+            else:
+                values = total[(function, k)][groupPositions]
+                noValues = total[("valid", k)][groupPositions] == 0
+                if pa.types.is_null(field.type):
+                    arrays.append(pa.nulls(len(groupKeys)))
+                    continue
+                if pa.types.is_integer(field.type):
+                    values = np.round(np.where(noValues, 0, values)).astype(np.int64)
+                arrays.append(pa.array(values, mask=noValues).cast(field.type))
+
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    #This is to aggregate the records from startRow to endRow in chunks of chunkSize.
+    #With more than one worker the chunks are aggregated on a thread pool, with at most
+    #twice as many chunks in flight as there are workers. Partial results are merged like a
+    #binary counter, two results of equally many chunks at a time, so with many groups every
+    #group is merged O(log n) times instead of once per chunk.
+    def Aggregate(self, io, chunkSize=None, startRow=0, endRow=None):
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+
+        qvdConverter = self.qvdConverter
+        noOfRecords = qvdConverter.qvdTableHeader.NoOfRecords
+        chunkSize = chunkSize or qvdConverter.recordChunkSize
+        endRow = noOfRecords if endRow is None else min(endRow, noOfRecords)
+        startRow = min(max(startRow, 0), endRow)
+        chunks = [(chunkStart, min(chunkStart + chunkSize, endRow)) for chunkStart in range(startRow, endRow, chunkSize)]
+
+        io.info("Total number of records: " + str(noOfRecords))
+
+        #symbol values by field index and whether they are exact integers
+        symbolValues = {}
+        for function, fieldIndex, outputName in self.aggregates:
+            if function in ("sum", "min", "max"):
+                exact = self.IsExactSum(function, fieldIndex)
+                symbolValues[(fieldIndex, exact)] = self.GetSymbolValues(fieldIndex, exact)
+
+        partials = []
+        noOfReadRecords = 0
+        with ThreadPoolExecutor(max_workers=qvdConverter.workers) as pool:
+            pending = deque()
+            for chunkIndex in range(len(chunks) + 1):
+                if chunkIndex < len(chunks):
+                    pending.append((chunks[chunkIndex], pool.submit(self.AggregateChunk, chunks[chunkIndex], symbolValues)))
+
+                while pending and (len(pending) >= 2 * qvdConverter.workers or chunkIndex == len(chunks)):
+                    chunk, future = pending.popleft()
+                    partials.append((1, future.result()))
+                    while len(partials) > 1 and partials[-1][0] == partials[-2][0]:
+                        noOfChunks, partial = partials.pop()
+                        partials[-1] = (partials[-1][0] + noOfChunks, self.MergePartials(partials[-1][1], partial))
+
+                    noOfReadRecords += chunk[1] - chunk[0]
+                    io.info("Aggregated " + str(noOfReadRecords) + " records ...")
+
+        total = None
+        for noOfChunks, partial in reversed(partials):
+            total = self.MergePartials(partial, total) if total is not None else partial
+
+        if total is None:
+            total = self.AggregateChunk((startRow, startRow), symbolValues)
+
+        return self.BuildResult(total)
+
+
+class QVDMultiFileReader:
+    """
+    Read several QVD files as one stream of record batches.
+
+    The files are opened concurrently and their schemas are unified by field name in order
+    of first appearance: a field that is all nulls in one file takes the type of the others,
+    integers and floats widen to float64, and any other mix becomes string. Fields missing
+    from a file are filled with nulls, and the record filter sees them as NULL. The record
+    chunks of all files are decoded on one thread pool, so the workers stay busy across file
+    boundaries, and batches are emitted in file and row order.
+    """
+
+    qvdConverters : [] = None
+    workers : int = 1
+    sourceFileColumn : str = None
+    memoryTracker : QVDMemoryTracker = None
+
+    def __init__(self, fileNames, memoryMap=True, fieldNames=None, filterExpression=None, workers=1, symbolCache=None, sourceFileColumn=None,
+                 profiler=None, memoryTracker=None, schemaOnly=False, compactTypes=False, fieldTypes=None, typedDates=False, dateText=False):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.workers = max(workers, 1)
+        self.sourceFileColumn = sourceFileColumn
+        self.memoryTracker = memoryTracker or QVDMemoryTracker()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            self.qvdConverters = list(pool.map(lambda fileName: self.OpenQVD(fileName, memoryMap, fieldNames, filterExpression, symbolCache,
+                                                                             profiler, self.memoryTracker, schemaOnly, compactTypes, fieldTypes,
+                                                                             typedDates, dateText),
+                                               fileNames))
+
+    #This is to open one QVD file, reading only those selected fields the file has.
+    def OpenQVD(self, fileName, memoryMap=True, fieldNames=None, filterExpression=None, symbolCache=None, profiler=None, memoryTracker=None,
+                schemaOnly=False, compactTypes=False, fieldTypes=None, typedDates=False, dateText=False):
+        if fieldNames:
+            with open(fileName, 'rb') as file:
+                qvdTableHeader, xmlEndPosition = QVDXMLParser().ReadQvdTableHeader(file)
+
+            headerFieldNames = {qvdFieldHeader.FieldName for qvdFieldHeader in qvdTableHeader.Fields.QvdFieldHeader}
+            fieldNames = [fieldName for fieldName in fieldNames if fieldName in headerFieldNames]
+            if not fieldNames:
+                raise ValueError("None of the selected fields are in " + fileName)
+
+        #a filter field missing from this file holds NULL there, like the selected fields it lacks
+        return QVDConverter(fileName, memoryMap, fieldNames, filterExpression, 1, 'thread', symbolCache, profiler, memoryTracker, schemaOnly,
+                            compactTypes, fieldTypes, typedDates, dateText, nullMissingFilterFields=True)
+
+    def Close(self):
+        for qvdConverter in self.qvdConverters:
+            qvdConverter.Close()
+
+    #This is to shrink the chunk size so the chunks in flight of any file fit in the memory budget.
+    def GetBudgetChunkSize(self, chunkSize, dictionaryEncode=False):
+        return min(qvdConverter.GetBudgetChunkSize(chunkSize, dictionaryEncode, chunksInFlight=2 * self.workers)
+                   for qvdConverter in self.qvdConverters)
+
+    #This is to widen two Arrow value types to one that can hold both.
+    def WidenType(self, typeA, typeB):
+        import pyarrow as pa
+
+        if typeA == typeB or pa.types.is_null(typeB):
+            return typeA
+        if pa.types.is_null(typeA):
+            return typeB
+        if all(pa.types.is_integer(t) for t in (typeA, typeB)) or all(pa.types.is_floating(t) for t in (typeA, typeB)):
+            return max(typeA, typeB, key=lambda t: t.bit_width)
+        if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in (typeA, typeB)):
+            return pa.float64()
+        return pa.string()
+
+    def GetArrowSchema(self, dictionaryEncode=False):
+        import pyarrow as pa
+
+        #fields without symbols hold only nulls and do not constrain the type,
+        #compacted text fields stay dictionaries when they are in every file
+        valueTypes = {}
+        dictionaryFieldNames = {}
+        for qvdConverter in self.qvdConverters:
+            noOfSymbols = {qvdFieldHeader.FieldName: qvdFieldHeader.NoOfSymbols for qvdFieldHeader in qvdConverter.qvdTableHeader.Fields.QvdFieldHeader}
+            for field in qvdConverter.GetArrowSchema():
+                valueType = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+                valueType = valueType if noOfSymbols.get(field.name, 1) > 0 else pa.null()
+                valueTypes[field.name] = self.WidenType(valueTypes.get(field.name, pa.null()), valueType)
+                dictionaryFieldNames[field.name] = dictionaryFieldNames.get(field.name, True) and pa.types.is_dictionary(field.type)
+
+        fields = [pa.field(fieldName, pa.dictionary(pa.int32(), valueType)
+                           if (dictionaryEncode or dictionaryFieldNames[fieldName]) and not pa.types.is_null(valueType) else valueType)
+                  for fieldName, valueType in valueTypes.items()]
+
+        if self.sourceFileColumn:
+            fields.append(pa.field(self.sourceFileColumn, pa.string()))
+
+        return pa.schema(fields)
+
+    #This is to cast a record batch of one file to the unified schema.
+    def ConformRecordBatch(self, batch, schema, fileName):
+        import pyarrow as pa
+
+        arrays = []
+        for field in schema:
+            if field.name == self.sourceFileColumn:
+                arrays.append(pa.array([fileName] * batch.num_rows, type=pa.string()))
+            elif field.name in batch.schema.names:
+                array = batch.column(field.name)
+                arrays.append(array if array.type == field.type else array.cast(field.type))
+            else:
+                arrays.append(pa.nulls(batch.num_rows, type=field.type))
+
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    #This is to decode (qvdConverter, chunk) pairs on the thread pool and yield
+    #(qvdConverter, chunk, record batch) in order. At most twice as many chunks as there
+    #are workers are in flight to bound memory.
+    def DecodeRecordChunks(self, chunks, dictionaryEncode=False):
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            pending = deque()
+            for qvdConverter, chunk in chunks:
+                pending.append((qvdConverter, chunk, pool.submit(qvdConverter.DecodeRecordChunk, chunk, dictionaryEncode)))
+
+                if len(pending) >= 2 * self.workers:
+                    qvdConverter, chunk, future = pending.popleft()
+                    yield qvdConverter, chunk, future.result()
+
+            while pending:
+                qvdConverter, chunk, future = pending.popleft()
+                yield qvdConverter, chunk, future.result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    #This is to read the records of all files as a stream of record batches of at most
+    #chunkSize rows conforming to the unified schema. recordLimit counts over all files,
+    #startRows gives the first row to read of every file.
+    def ReadRecordBatches(self, io, chunkSize=None, dictionaryEncode=False, recordLimit=None, startRows=None):
+        import pyarrow as pa
+
+        schema = self.GetArrowSchema(dictionaryEncode)
+        chunkSize = chunkSize or QVDConverter.recordChunkSize
+
+        io.info("Total number of records: " + str(sum(qvdConverter.qvdTableHeader.NoOfRecords for qvdConverter in self.qvdConverters)) +
+                " in " + str(len(self.qvdConverters)) + " files")
+
+        startRows = startRows or [0] * len(self.qvdConverters)
+        chunks = ((qvdConverter, (chunkStart, min(chunkStart + chunkSize, qvdConverter.qvdTableHeader.NoOfRecords)))
+                  for qvdConverter, startRow in zip(self.qvdConverters, startRows)
+                  for chunkStart in range(startRow, qvdConverter.qvdTableHeader.NoOfRecords, chunkSize))
+
+        noOfBatches = 0
+        noOfReturnedRecords = 0
+        noOfReadRecords = 0
+        decodedChunks = self.DecodeRecordChunks(chunks, dictionaryEncode)
+        for qvdConverter, chunk, batch in decodedChunks:
+            noOfReadRecords += chunk[1] - chunk[0]
+            batch = self.ConformRecordBatch(batch, schema, qvdConverter.qvdFile)
+
+            if recordLimit is not None and noOfReturnedRecords + batch.num_rows > recordLimit:
+                batch = batch.slice(0, recordLimit - noOfReturnedRecords)
+
+            if batch.num_rows > 0:
+                noOfBatches += 1
+                noOfReturnedRecords += batch.num_rows
+                self.memoryTracker.Set("RecordBatch", batch.nbytes, id(self))
+                yield batch
+
+            io.info("Read " + str(noOfReadRecords) + " records ...")
+
+            if recordLimit is not None and noOfReturnedRecords >= recordLimit:
+                break
+
+        decodedChunks.close()
+        self.memoryTracker.Set("RecordBatch", 0, id(self))
+
+        #always emit the schema, even when no record is returned
+        if noOfBatches == 0:
+            yield pa.RecordBatch.from_arrays([pa.array([], type=field.type) for field in schema], schema=schema)
+
+
+#This is to parse one field's symbol table in a worker process.
+#The worker maps the QVD file itself, so the symbol bytes are not copied between processes.
+def ReadSymbolInProcess(fileName, startPos, length, noOfSymbols):
+    import mmap
+
+    qvdFieldHeader = QvdFieldHeader(NoOfSymbols=noOfSymbols)
+
+    with open(fileName, 'rb') as file:
+        qvdMap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    qvdFieldHeader._SymbolBytes = memoryview(qvdMap)[startPos:startPos + length]
+    QVDConverter.__new__(QVDConverter).ParseSymbol(qvdFieldHeader)
+    qvdFieldHeader._SymbolBytes = None
+
+    try:
+        qvdMap.close()
+    except BufferError:
+        pass
+
+    return qvdFieldHeader._SymbolType, qvdFieldHeader._SymbolVal, qvdFieldHeader._SymbolNum
+
+
+#This is to extract the symbol indexes of a chunk of records in a worker process.
+#The worker maps the QVD file itself and returns only the index arrays of its rows.
+def DecodeRecordIndexesInProcess(fileName, recordStart, qvdTableHeader, qvdFieldHeaders, chunk):
+    import mmap
+
+    qvdConverter = QVDConverter.__new__(QVDConverter)
+    qvdConverter.qvdTableHeader = qvdTableHeader
+
+    with open(fileName, 'rb') as file:
+        qvdMap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    qvdConverter.allRecordBytes = memoryview(qvdMap)[recordStart:recordStart + qvdTableHeader.Length]
+
+    if isinstance(chunk, tuple):
+        recordWords = qvdConverter.GetRecordWords(chunk[0], chunk[1])
+    else:
+        recordWords = qvdConverter.GetRecordWordsAt(chunk)
+
+    fieldIndexes = qvdConverter.DecodeRecordIndexes(recordWords, qvdFieldHeaders)
+
+    recordWords = None
+    qvdConverter.allRecordBytes = None
+
+    try:
+        qvdMap.close()
+    except BufferError:
+        pass
+
+    return fieldIndexes
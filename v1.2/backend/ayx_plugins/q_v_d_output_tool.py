@@ -12,25 +12,33 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from ayx_python_sdk.core import (
-    Anchor,
-    PluginV2,
-)
-from ayx_python_sdk.providers.amp_provider.amp_provider_v2 import AMPProviderV2
-
-import pyarrow as pa
+try:
+    from ayx_python_sdk.core import (
+        Anchor,
+        PluginV2,
+    )
+    from ayx_python_sdk.providers.amp_provider.amp_provider_v2 import AMPProviderV2
+except ImportError:
+    #QVDConverter is also used outside Alteryx, e.g. by qvdtool, where the SDK is not installed
+    Anchor = None
+    PluginV2 = object
+    AMPProviderV2 = None
 
 
 import xml.etree.ElementTree as ET
 from dataclasses import dataclass
 from enum import Enum, auto
 from io import BytesIO
+import os
 import struct
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 import sys
+import tempfile
 import time
 import traceback
 
+from ayx_plugins.qvd_diagnostics import QVDMemoryTracker, QVDProfiler
+
 
 class QVDOutputTool(PluginV2):
     qvdConverter : None
@@ -41,9 +49,36 @@ class QVDOutputTool(PluginV2):
         self.provider = provider
         self.provider.io.info("QVD Output Tool initialized")
         
-        QVDFile = self.provider.tool_config["QVDFile"]
-        self.qvdConverter = QVDConverter(QVDFile)
+        #the converter and pyarrow are set up with the first batch, in update-only mode no batch arrives
+        self.qvdConverter = None
         self.batchTable = None
+        self.spillFile = None
+        self.spillWriter = None
+
+    def GetIntegerConfig(self, name, default):
+        """Read a positive number from the tool configuration, reporting an error and falling back to the default when invalid."""
+        value = str(self.provider.tool_config.get(name) or "").strip()
+        if not value:
+            return default
+
+        try:
+            number = int(value)
+        except ValueError:
+            number = 0
+        if number <= 0:
+            self.provider.io.error(name + " must be a positive whole number, not '" + value + "'")
+            return default
+        return number
+
+    def GetQVDConverter(self):
+        """Create the QVD converter with its profiler and memory budget on first use."""
+        if self.qvdConverter is None:
+            self.profileFile = (self.provider.tool_config.get("ProfileFile") or "").strip()
+            self.profiler = QVDProfiler(str(self.provider.tool_config.get("Profile", False)).strip().lower() == "true" or bool(self.profileFile))
+            memoryBudgetMB = self.GetIntegerConfig("MemoryBudgetMB", None)
+            self.memoryTracker = QVDMemoryTracker(memoryBudgetMB * 1024 * 1024 if memoryBudgetMB else None, "write")
+            self.qvdConverter = QVDConverter(self.provider.tool_config["QVDFile"], self.profiler, self.memoryTracker)
+        return self.qvdConverter
 
     def on_record_batch(self, batch: "pa.Table", anchor: Anchor) -> None:
         """
@@ -60,10 +95,35 @@ class QVDOutputTool(PluginV2):
         anchor
             A namedtuple('Anchor', ['name', 'connection']) containing input connection identifiers.
         """
-        if self.batchTable is None:
-            self.batchTable = batch
-        else:
-            self.batchTable = pa.concat_tables([self.batchTable, batch])
+        import pyarrow as pa
+
+        self.GetQVDConverter()
+        with self.profiler.Phase("AccumulateBatches", len(batch), batch.nbytes if self.profiler.enabled else 0):
+            if self.spillWriter is not None:
+                self.spillWriter.write_table(batch)
+            elif self.batchTable is None:
+                self.batchTable = batch
+            else:
+                self.batchTable = pa.concat_tables([self.batchTable, batch])
+
+            if self.spillWriter is None:
+                self.memoryTracker.Set("Batches", self.batchTable.nbytes)
+                if self.memoryTracker.maxBytes is not None and self.batchTable.nbytes > self.memoryTracker.maxBytes // 2:
+                    self.SpillBatches()
+
+    def SpillBatches(self):
+        """Move the received records to a temporary Arrow file, later batches are appended to it."""
+        import pyarrow as pa
+
+        spillFile = tempfile.NamedTemporaryFile(suffix=".arrow", delete=False)
+        spillFile.close()
+        self.spillFile = spillFile.name
+        self.provider.io.info("Received records are kept in " + self.spillFile + " to stay within the memory budget")
+
+        self.spillWriter = pa.ipc.new_file(self.spillFile, self.batchTable.schema)
+        self.spillWriter.write_table(self.batchTable)
+        self.batchTable = None
+        self.memoryTracker.Set("Batches", 0)
                 
         
     def on_incoming_connection_complete(self, anchor: Anchor) -> None:
@@ -93,11 +153,42 @@ class QVDOutputTool(PluginV2):
         Note: A tool with an optional input anchor and no incoming connections should
         also write any records to output anchors here.
         """
-        self.qvdConverter.WriteRecords(self.batchTable, self.provider.io)
-        self.provider.io.info("Finished QVD Processing and writing to file...")
-
-        self.qvdConverter.WriteQVD()
-        self.provider.io.info("QVD Output Tool finished writing to " + self.provider.tool_config["QVDFile"])
+        import pyarrow as pa
+
+        if self.qvdConverter is None:
+            if not self.provider.environment.update_only:
+                self.provider.io.warn("No records received, nothing written to " + self.provider.tool_config["QVDFile"])
+            return
+
+        if self.spillWriter is not None:
+            #the spilled records are memory-mapped, the OS pages them in and out as WriteRecords reads them
+            self.spillWriter.close()
+            self.batchTable = pa.ipc.open_file(pa.memory_map(self.spillFile)).read_all()
+
+        try:
+            #the estimate counts distinct values, which is only worth it against a budget
+            if self.memoryTracker.maxBytes is not None:
+                self.memoryTracker.Check(self.qvdConverter.EstimateWriteBytes(self.batchTable), "Building the QVD symbols and records")
+            self.qvdConverter.WriteRecords(self.batchTable, self.provider.io)
+            self.provider.io.info("Finished QVD Processing and writing to file...")
+
+            self.batchTable = None
+            self.memoryTracker.Set("Batches", 0)
+            self.qvdConverter.WriteQVD()
+            self.provider.io.info("QVD Output Tool finished writing to " + self.provider.tool_config["QVDFile"])
+        finally:
+            self.batchTable = None
+            if self.spillFile is not None:
+                os.remove(self.spillFile)
+
+        if self.profiler.enabled or self.memoryTracker.maxBytes is not None:
+            self.memoryTracker.Report(self.provider.io)
+
+        if self.profiler.enabled:
+            self.profiler.Report(self.provider.io)
+            if self.profileFile:
+                self.profiler.WriteTrace(self.profileFile)
+                self.provider.io.info("Phase timings written to " + self.profileFile)
 
 
 # Enum for FieldTag.Value
@@ -286,13 +377,20 @@ class QVDConverter:
         9223372036854775807, 18446744073709551615
     ]
     
+    #Qlik dates and timestamps are days since this date
+    qlikEpoch = datetime(1899, 12, 30)
+
     qvdTableHeader : QvdTableHeader = None
     qvdFile : str
     recordBytes: None
+    profiler : QVDProfiler = None
+    memoryTracker : QVDMemoryTracker = None
 
 
-    def __init__(self, fileName):
+    def __init__(self, fileName, profiler=None, memoryTracker=None):
         self.qvdFile = fileName
+        self.profiler = profiler or QVDProfiler()
+        self.memoryTracker = memoryTracker or QVDMemoryTracker(fieldAction="write")
         self.qvdTableHeader = QvdTableHeader()
 
         self.qvdTableHeader.Fields = []
@@ -311,6 +409,13 @@ class QVDConverter:
 
         
 
+    def EstimateWriteBytes(self, batch):
+        import pyarrow.compute as pc
+
+        #WriteRecords keeps a Python int per record and a dictionary entry plus symbol bytes per distinct value
+        noOfSymbols = sum(pc.count_distinct(batch.column(j)).as_py() for j in range(batch.num_columns))
+        return batch.num_rows * 44 + noOfSymbols * 120
+
     def WriteRecords(self, batch, io ):
         import pyarrow as pa      
         
@@ -333,14 +438,18 @@ class QVDConverter:
         Time, column.type: time32[s]
         datetime, column.type: timestamp[s]
         =================================================
+        Timestamps of any unit are written, e.g. the timestamp[ms] of typed QVD dates, and so is
+        every integer and floating point width the QVD Input Tool emits for compacted fields.
+        Dictionary columns are written by their values and fixed decimals as doubles. Any other
+        type, such as blob, raises a ValueError rather than being written without symbols.
         """
         
         io.info("Total number of records: " + str(len(batch)))
 
         
-        intTypes = ['bool', 'uint8','int16', 'int32', 'int64']
-        floatingPointTypes = ['float', 'double']
-        dateTypes = ['date32[day]']
+        intTypes = ['bool', 'int8', 'uint8', 'int16', 'uint16', 'int32', 'uint32', 'int64', 'uint64']
+        floatingPointTypes = ['halffloat', 'float', 'double']
+        dateTypes = ['date32[day]', 'date64[ms]']
         dateTimeTypes = ['time32[s]', 'timestamp[s]']
         stringType = 'string'
         
@@ -349,10 +458,22 @@ class QVDConverter:
         offset = 0
         bitOffset = 0
 
+        phaseToken = self.profiler.Begin("BuildSymbols")
+
         #process each field
         for colIndex in range(len(batch.schema)):
             
             column = batch.column(colIndex)
+
+            #dictionary columns are written by their values, decimals as doubles and large text as text
+            valueType = column.type.value_type if pa.types.is_dictionary(column.type) else column.type
+            if pa.types.is_decimal(valueType):
+                valueType = pa.float64()
+            elif pa.types.is_large_string(valueType) or pa.types.is_string_view(valueType):
+                valueType = pa.string()
+            if valueType != column.type:
+                column = column.cast(valueType)
+                batch = batch.set_column(colIndex, batch.schema.names[colIndex], column)
             
             qvdFieldHeader = QvdFieldHeader()
             
@@ -373,10 +494,10 @@ class QVDConverter:
             symbolType = -1
             
             #classifying symbol type
-            if columnType in dateTimeTypes:                       
-                if columnType == 'time32[s]':
+            if columnType in dateTimeTypes or pa.types.is_timestamp(column.type) or pa.types.is_time(column.type):
+                if pa.types.is_time(column.type):
                     symbolType = 6
-                elif columnType == 'timestamp[s]':
+                else:
                     symbolType = 66
                  
                 qvdFieldHeader.NumberFormat.Type = FieldType.TIMESTAMP
@@ -424,6 +545,10 @@ class QVDConverter:
                 if Value.NUMERIC.value not in qvdFieldHeader.Tags.String:
                     qvdFieldHeader.Tags.String.append(Value.NUMERIC.value)
 
+            #a column of any other type would be written without symbols, i.e. all NULL
+            elif not pa.types.is_null(column.type):
+                raise ValueError("Field [" + qvdFieldHeader.FieldName + "] of type " + columnType + " cannot be written to a QVD file")
+
             B6 = struct.pack('B', 6)
             B5 = struct.pack('B', 5)
             B4 = struct.pack('B', 4)
@@ -443,19 +568,20 @@ class QVDConverter:
 
                     if symbolType==6:                       
                         symbolBytes += B6
-                        symbolBytes += struct.pack('<d', (value - value.date()).days)
+                        symbolBytes += struct.pack('<d', (value.hour * 3600 + value.minute * 60 + value.second) / 86400)
                         symbolBytes += value.strftime("%H:%M:%S").encode('utf-8')
                         symbolBytes += b'\x00'
 
                     elif symbolType==66:        
+                        #the serial number keeps fractions of a second, the text shows milliseconds when there are any
                         symbolBytes += B6
-                        symbolBytes += struct.pack('<d', (value - datetime(1900, 1, 1)).days)
-                        symbolBytes += value.strftime("%Y-%m-%d %H:%M:%S").encode('utf-8')
+                        symbolBytes += struct.pack('<d', (value.replace(tzinfo=None) - self.qlikEpoch) / timedelta(days=1))
+                        symbolBytes += (value.strftime("%Y-%m-%d %H:%M:%S") + (".%03d" % (value.microsecond // 1000) if value.microsecond else "")).encode('utf-8')
                         symbolBytes += b'\x00'                        
 
                     elif symbolType==5:                       
                         symbolBytes += B5
-                        symbolBytes += struct.pack('<i', (value - datetime(1900, 1, 1)).days)
+                        symbolBytes += struct.pack('<i', (value - self.qlikEpoch.date()).days)
                         symbolBytes += value.strftime("%Y-%m-%d").encode('utf-8')
                         symbolBytes += b'\x00' 
 
@@ -469,10 +595,15 @@ class QVDConverter:
                         symbolBytes += B2
                         symbolBytes += struct.pack('<d', value)
                             
-                    elif symbolType==1:
+                    elif symbolType==1 and -2**31 <= value < 2**31:
                         symbolBytes += B1
                         symbolBytes += struct.pack('<i',value)
 
+                    elif symbolType==1:
+                        #integer symbols hold 32 bits, wider values are stored as doubles
+                        symbolBytes += B2
+                        symbolBytes += struct.pack('<d', value)
+
             qvdFieldHeader._SymbolBytes += symbolBytes
 
             #update XML metadata
@@ -491,6 +622,9 @@ class QVDConverter:
             bitOffset += qvdFieldHeader.BitWidth
             offset += qvdFieldHeader.Length 
 
+        self.profiler.End(phaseToken, len(batch), offset)
+        self.memoryTracker.Set("Symbols", offset)
+        phaseToken = self.profiler.Begin("PackBits")
             
         self.qvdTableHeader.Offset = offset
         self.qvdTableHeader.RecordByteSize = bitOffset // 8 + (1 if bitOffset %8>0 else 0)
@@ -532,20 +666,26 @@ class QVDConverter:
         else:
             for j in range(len(resultColumn)):                
                 self.recordBytes += struct.pack(f'<{self.qvdTableHeader.RecordByteSize}B', *(resultColumn[j]>> (8 * i) & 0xFF for i in range(self.qvdTableHeader.RecordByteSize)))
+
+        self.profiler.End(phaseToken, len(batch), len(self.recordBytes))
+        self.memoryTracker.Set("RecordBytes", len(self.recordBytes))
         
      
     def WriteQVD(self):
         
         #write XML
-        qvdXMLParser = QVDXMLParser()
-        qvdXMLParser.WriteQVDXML(self.qvdTableHeader, self.qvdFile)
+        with self.profiler.Phase("WriteXML"):
+            qvdXMLParser = QVDXMLParser()
+            qvdXMLParser.WriteQVDXML(self.qvdTableHeader, self.qvdFile)
         
         #write the record bytes
-        with open(self.qvdFile, 'ab') as fs:
-            fs.write(b'\r\n\x00')
-            for qvdFieldHeader in self.qvdTableHeader.Fields.QvdFieldHeader:
-                fs.write(qvdFieldHeader._SymbolBytes)
-            fs.write(self.recordBytes)
+        with self.profiler.Phase("WriteFile", self.qvdTableHeader.NoOfRecords, self.qvdTableHeader.Offset + len(self.recordBytes)):
+            with open(self.qvdFile, 'ab') as fs:
+                fs.write(b'\r\n\x00')
+                for qvdFieldHeader in self.qvdTableHeader.Fields.QvdFieldHeader:
+                    fs.write(qvdFieldHeader._SymbolBytes)
+                fs.write(self.recordBytes)
         
         self.recordBytes = None
+        self.memoryTracker.Set("RecordBytes", 0)
         self.qvdTableHeader = None
\ No newline at end of file
@@ -0,0 +1,139 @@
+# Copyright (C) 2022 Alteryx, Inc. All rights reserved.
+#
+# Licensed under the ALTERYX SDK AND API LICENSE AGREEMENT;
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.alteryx.com/alteryx-sdk-and-api-license-agreement
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Timing and memory accounting shared by the QVD input and output tools.
+"""
+from contextlib import contextmanager
+import os
+import threading
+import time
+
+
+class QVDProfiler:
+    """
+    Per-phase timing of a QVD tool run.
+
+    Phases are timed with Phase() or Begin()/End() and counted with the rows and bytes they
+    processed. Report() logs time, rows/s and MB/s per phase and WriteTrace() writes a
+    Chrome trace (chrome://tracing, Perfetto) with one event per timed call, plus the
+    per-phase totals. When disabled, Begin() returns None and nothing is recorded.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = {}
+        self.events = []
+        self.lock = threading.Lock()
+        self.startTime = time.perf_counter()
+
+    def Begin(self, name):
+        if not self.enabled:
+            return None
+        return name, time.perf_counter()
+
+    def End(self, token, rows=0, noOfBytes=0):
+        if token is None:
+            return
+
+        name, startTime = token
+        endTime = time.perf_counter()
+        with self.lock:
+            phase = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0, "rows": 0, "bytes": 0})
+            phase["seconds"] += endTime - startTime
+            phase["calls"] += 1
+            phase["rows"] += rows
+            phase["bytes"] += noOfBytes
+            self.events.append({"name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                                "ts": round((startTime - self.startTime) * 1e6, 1), "dur": round((endTime - startTime) * 1e6, 1),
+                                "args": {"rows": rows, "bytes": noOfBytes}})
+
+    @contextmanager
+    def Phase(self, name, rows=0, noOfBytes=0):
+        token = self.Begin(name)
+        try:
+            yield
+        finally:
+            self.End(token, rows, noOfBytes)
+
+    def Report(self, io):
+        for name, phase in self.phases.items():
+            seconds = max(phase["seconds"], 1e-9)
+            message = "%s: %.3f s in %d calls" % (name, phase["seconds"], phase["calls"])
+            if phase["rows"]:
+                message += ", %d rows, %.0f rows/s" % (phase["rows"], phase["rows"] / seconds)
+            if phase["bytes"]:
+                message += ", %.1f MB, %.1f MB/s" % (phase["bytes"] / 1e6, phase["bytes"] / seconds / 1e6)
+            io.info(message)
+
+    def WriteTrace(self, fileName):
+        import json
+
+        with open(fileName, 'w', encoding='utf-8') as file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms", "phases": self.phases}, file)
+
+
+class QVDMemoryTracker:
+    """
+    Accounting of the large buffers a QVD tool holds.
+
+    Every buffer is registered by name and owner with Set(), giving its current size in bytes;
+    the tracker keeps the current and peak total and the peak of every buffer name over all
+    owners, e.g. the symbol tables of all files read together. With a budget,
+    Check() fails early with a clear message when a planned allocation would not fit, and
+    GetAvailableBytes() tells how much the tool can still use to size its chunks.
+    fieldAction is the verb for fields in that message, "read" or "write".
+    """
+
+    def __init__(self, maxBytes=None, fieldAction="read"):
+        self.maxBytes = maxBytes
+        self.fieldAction = fieldAction
+        self.buffers = {}
+        self.peaks = {}
+        self.totalBytes = 0
+        self.peakBytes = 0
+        self.lock = threading.Lock()
+
+    def Set(self, name, noOfBytes, owner=None):
+        with self.lock:
+            self.totalBytes += noOfBytes - self.buffers.get((name, owner), 0)
+            self.buffers[(name, owner)] = noOfBytes
+            self.peaks[name] = max(self.peaks.get(name, 0), sum(size for (bufferName, _), size in self.buffers.items() if bufferName == name))
+            self.peakBytes = max(self.peakBytes, self.totalBytes)
+
+    def GetAvailableBytes(self):
+        if self.maxBytes is None:
+            return None
+        return max(self.maxBytes - self.totalBytes, 0)
+
+    def Check(self, noOfBytes, purpose):
+        if self.maxBytes is not None and self.totalBytes + noOfBytes > self.maxBytes:
+            raise ValueError("%s needs about %.0f MB, but only %.0f MB of the %.0f MB memory budget are left. "
+                             "Raise the memory budget or %s fewer fields." %
+                             (purpose, noOfBytes / 1048576, self.GetAvailableBytes() / 1048576, self.maxBytes / 1048576, self.fieldAction))
+
+    def Report(self, io):
+        message = "Peak memory: %.1f MB" % (self.peakBytes / 1048576)
+        if self.maxBytes is not None:
+            message += " of a %.0f MB budget" % (self.maxBytes / 1048576)
+        if self.peaks:
+            message += " (" + ", ".join("%s %.1f MB" % (name, peak / 1048576) for name, peak in self.peaks.items()) + ")"
+        io.info(message)
+
+        try:
+            import resource
+            #ru_maxrss is in KB on Linux
+            io.info("Peak process memory: %.1f MB" % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+        except ImportError:
+            pass
@@ -0,0 +1,437 @@
+from datetime import datetime
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ayx_plugins.q_v_d_input_tool import Fields, FieldType, FilterCondition, FilterGroup, NumberFormat, QVDAggregator, QVDConverter, QVDFilterParser, QVDInputTool, QVDMultiFileReader, QVDSymbolCache, QVDWatermarkStore, QvdFieldHeader, QvdTableHeader
+
+
+#This is to parse a symbol section given as bytes, as ReadSymbol does for a field of a QVD file.
+def ParseSymbolBytes(symbolBytes, noOfSymbols):
+    qvdFieldHeader = QvdFieldHeader(NoOfSymbols=noOfSymbols)
+    qvdFieldHeader._SymbolBytes = memoryview(symbolBytes)
+    QVDConverter.__new__(QVDConverter).ParseSymbol(qvdFieldHeader)
+    return qvdFieldHeader
+
+
+def test_mixed_int_and_text_symbols():
+    symbolBytes = b"\x01" + struct.pack('<i', 5) + b"\x04abc\x00" + b"\x02" + struct.pack('<d', 1.5) + b"\x04x\x00"
+
+    qvdFieldHeader = ParseSymbolBytes(symbolBytes, 4)
+
+    assert qvdFieldHeader._SymbolVal.to_pylist() == ['5', 'abc', '1.5', 'x']
+
+
+def test_mixed_int_and_float_symbols():
+    symbolBytes = b"\x01" + struct.pack('<i', 5) + b"\x02" + struct.pack('<d', 1.5)
+
+    qvdFieldHeader = ParseSymbolBytes(symbolBytes, 2)
+
+    assert qvdFieldHeader._SymbolVal.to_pylist() == [5.0, 1.5]
+
+
+#This is to write a synthetic QVD file with fields stored with Bias -2, as generate_qvd.py writes nullable fields.
+def WriteBiasedQVD(fileName, noOfRecords=2000):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "benchmarks"))
+    from generate_qvd import WriteSyntheticQVD
+
+    return WriteSyntheticQVD(fileName, noOfRecords, ["int:10:0.3", "string:5:0.5", "int:7"], seed=1)
+
+
+class IO:
+    def info(self, message): pass
+    def warn(self, message): pass
+
+
+def test_biased_fields(tmp_path):
+    fileName = str(tmp_path / "biased.qvd")
+    WriteBiasedQVD(fileName)
+
+    table = QVDConverter(fileName).ReadAllRecords(IO())
+
+    assert 400 < table.column("int_0").null_count < 800
+    assert 800 < table.column("string_1").null_count < 1200
+    assert table.column("int_2").null_count == 0
+    assert set(table.column("int_0").drop_null().to_pylist()) == set(range(-5, 5))
+    assert set(table.column("string_1").drop_null().to_pylist()) == {"S0_", "S1_x", "S2_xx", "S3_xxx", "S4_xxxx"}
+    assert QVDConverter(fileName).ReadAllRecords(IO(), dictionaryEncode=True).cast(table.schema).equals(table)
+
+
+def test_biased_field_filter(tmp_path):
+    fileName = str(tmp_path / "biased.qvd")
+    WriteBiasedQVD(fileName)
+    table = QVDConverter(fileName).ReadAllRecords(IO())
+
+    isNull = QVDConverter(fileName, filterExpression="[int_0] IS NULL").ReadAllRecords(IO())
+    equals = QVDConverter(fileName, filterExpression="[int_0] = 3").ReadAllRecords(IO())
+
+    assert isNull.num_rows == table.column("int_0").null_count
+    assert equals.num_rows == table.column("int_0").to_pylist().count(3)
+
+
+def test_aggregate_on_biased_fields(tmp_path):
+    fileName = str(tmp_path / "biased.qvd")
+    WriteBiasedQVD(fileName)
+    table = QVDConverter(fileName).ReadAllRecords(IO())
+
+    qvdConverter = QVDConverter(fileName, fieldNames=QVDAggregator.GetFieldNames(["string_1"], ["count", "sum(int_0)", "count(int_0)"]))
+    result = QVDAggregator(qvdConverter, ["string_1"], ["count", "sum(int_0)", "count(int_0)"]).Aggregate(IO(), 500)
+
+    expected = table.group_by(["string_1"]).aggregate([([], "count_all"), ("int_0", "sum"), ("int_0", "count")])
+    expected = {row["string_1"]: (row["count_all"], row["int_0_sum"], row["int_0_count"]) for row in expected.to_pylist()}
+    assert None in expected and len(expected) == 6
+    assert {row["string_1"]: (row["Count"], row["Sum_int_0"], row["CountNonNull_int_0"]) for row in result.to_pylist()} == expected
+
+
+def test_distinct_on_biased_fields(tmp_path):
+    fileName = str(tmp_path / "biased.qvd")
+    WriteBiasedQVD(fileName)
+    table = QVDConverter(fileName).ReadAllRecords(IO())
+
+    batches = QVDConverter(fileName, fieldNames=["int_0", "string_1"]).ReadDistinctRecordBatches(IO(), 500, countField="N")
+    result = {(row["int_0"], row["string_1"]): row["N"] for batch in batches for row in batch.to_pylist()}
+
+    expected = table.group_by(["int_0", "string_1"]).aggregate([([], "count_all")])
+    assert result == {(row["int_0"], row["string_1"]): row["count_all"] for row in expected.to_pylist()}
+    assert (None, None) in result
+
+
+def test_typed_timestamp_keeps_milliseconds():
+    #2023-03-15 12:00:00.250 as a Qlik serial number
+    serial = 45000.5 + 0.25 / 86400
+    symbolBytes = b"\x06" + struct.pack('<d', serial) + b"2023-03-15 12:00:00.250\x00"
+    qvdFieldHeader = ParseSymbolBytes(symbolBytes, 1)
+    qvdFieldHeader.NumberFormat = NumberFormat(Type=FieldType.TIMESTAMP)
+
+    qvdConverter = QVDConverter.__new__(QVDConverter)
+    qvdConverter.qvdTableHeader = QvdTableHeader(Fields=Fields(QvdFieldHeader=[qvdFieldHeader]))
+    qvdConverter.typedDates = True
+    qvdConverter.TypeDateSymbols(0)
+
+    assert str(qvdFieldHeader._SymbolVal.type) == "timestamp[ms]"
+    assert qvdFieldHeader._SymbolVal.to_pylist() == [datetime(2023, 3, 15, 12, 0, 0, 250000)]
+
+
+class Provider:
+    def __init__(self, toolConfig, updateOnly=False):
+        self.tool_config = toolConfig
+        self.io = IO()
+        self.environment = type("Environment", (), {"update_only": updateOnly})()
+        self.anchors = {}
+        self.metadata = {}
+
+    def write_to_anchor(self, name, table):
+        self.anchors.setdefault(name, []).append(table)
+
+    def push_outgoing_metadata(self, name, schema):
+        self.metadata[name] = schema
+
+
+def test_file_names_with_brackets(tmp_path):
+    folder = tmp_path / "[2024] Sales"
+    folder.mkdir()
+    for name in ("x.qvd", "y.qvd"):
+        (folder / name).write_bytes(b"")
+    inputTool = QVDInputTool(Provider({}))
+
+    assert inputTool.GetQVDFileNames(str(folder / "x.qvd")) == [str(folder / "x.qvd")]
+    assert inputTool.GetQVDFileNames(str(tmp_path / "*" / "*.qvd")) == [str(folder / "x.qvd"), str(folder / "y.qvd")]
+
+
+def test_multi_file_filter_on_field_missing_from_a_file(tmp_path):
+    import pyarrow as pa
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "benchmarks"))
+    from generate_qvd import WriteSyntheticQVD
+
+    #m0.qvd has int_0 and float_1, m1.qvd only int_0
+    fileNames = [str(tmp_path / "m0.qvd"), str(tmp_path / "m1.qvd")]
+    WriteSyntheticQVD(fileNames[0], 300, ["int:10", "float:20"], seed=1)
+    WriteSyntheticQVD(fileNames[1], 200, ["int:10"], seed=2)
+
+    def Read(filterExpression):
+        qvdReader = QVDMultiFileReader(fileNames, filterExpression=filterExpression)
+        table = pa.Table.from_batches(list(qvdReader.ReadRecordBatches(IO(), 64)))
+        qvdReader.Close()
+        return table
+
+    table = Read(None)
+    assert table.column("float_1").null_count == 200
+
+    assert Read("[float_1] > 10").equals(table.filter(pa.compute.greater(table["float_1"], 10)))
+    assert Read("[float_1] IS NULL").equals(table.filter(table["float_1"].is_null()))
+    assert Read("[float_1] IS NULL AND [int_0] = 2").equals(table.filter(pa.compute.and_(table["float_1"].is_null(), pa.compute.equal(table["int_0"], 2))))
+    #NULL is neither in nor not in a list, as in the other conditions
+    rows = table.to_pylist()
+    expected = [row for row in rows if (row["float_1"] is not None and row["float_1"] != 1) or row["int_0"] == 2]
+    assert Read("[float_1] NOT IN (1) OR [int_0] = 2").to_pylist() == expected
+
+
+def test_symbol_cache(tmp_path, monkeypatch):
+    fileName = str(tmp_path / "cached.qvd")
+    WriteBiasedQVD(fileName)
+    symbolCache = QVDSymbolCache(str(tmp_path / "cache"))
+    table = QVDConverter(fileName).ReadAllRecords(IO())
+
+    def Read():
+        qvdConverter = QVDConverter(fileName, symbolCache=symbolCache)
+        return qvdConverter.ReadAllRecords(IO()), qvdConverter.symbolCacheHits, qvdConverter.symbolCacheMisses
+
+    assert Read() == (table, 0, 3)
+    assert Read() == (table, 3, 0)
+
+    #a rewritten file gets a new key, so its symbols are parsed again
+    WriteBiasedQVD(fileName, 2500)
+    rewritten, hits, misses = Read()
+    assert (hits, misses) == (0, 3) and rewritten.num_rows == 2500
+    assert len(os.listdir(str(tmp_path / "cache"))) == 2
+
+    #files removed by another process while the cache is listed are skipped
+    stat = os.stat
+    def RemovedStat(path, *args, **kwargs):
+        if str(path).endswith("0.arrow"):
+            raise FileNotFoundError(path)
+        return stat(path, *args, **kwargs)
+    monkeypatch.setattr(os, "stat", RemovedStat)
+    symbolCache.Evict()
+    monkeypatch.undo()
+
+    #beyond maxBytes the files of the older key are evicted, those of the current key kept
+    currentKey = symbolCache.GetKey(fileName, QVDConverter(fileName).qvdTableHeader)
+    QVDSymbolCache(str(tmp_path / "cache"), maxBytes=0).Evict(currentKey)
+    assert os.listdir(str(tmp_path / "cache")) == [currentKey]
+    assert Read() == (rewritten, 3, 0)
+
+
+def test_integer_sums_are_exact(tmp_path):
+    import pyarrow as pa
+
+    fileName = str(tmp_path / "biased.qvd")
+    WriteBiasedQVD(fileName)
+    qvdConverter = QVDConverter(fileName, fieldNames=["string_1", "int_2"], fieldTypes={"int_2": "int64"})
+    #values beyond 2**53, as a float64 accumulator would round them
+    qvdFieldHeader = qvdConverter.qvdTableHeader.Fields.QvdFieldHeader[2]
+    qvdFieldHeader._SymbolVal = pa.array([2**53 + 2 * k + 1 for k in range(qvdFieldHeader.NoOfSymbols)], pa.int64())
+    table = qvdConverter.ReadAllRecords(IO())
+
+    result = QVDAggregator(qvdConverter, ["string_1"], ["sum(int_2)"]).Aggregate(IO(), 300)
+
+    expected = {}
+    for row in table.to_pylist():
+        expected[row["string_1"]] = expected.get(row["string_1"], 0) + row["int_2"]
+    assert result.schema.field("Sum_int_2").type == pa.int64()
+    assert {row["string_1"]: row["Sum_int_2"] for row in result.to_pylist()} == expected
+
+
+def test_field_profile(tmp_path):
+    fileName = str(tmp_path / "biased.qvd")
+    WriteBiasedQVD(fileName)
+
+    profile = QVDConverter(fileName).GetFieldProfile().to_pylist()
+
+    assert [(row["FieldName"], row["Cardinality"], row["Bias"], row["Nullable"]) for row in profile] == \
+        [("int_0", 10, -2, True), ("string_1", 5, -2, True), ("int_2", 7, 0, False)]
+    assert (profile[0]["MinValue"], profile[0]["MaxValue"]) == ("-5", "4")
+
+
+def test_filter_tokenizer():
+    tokens = QVDFilterParser().Tokenize("[Sales Region] <> 'O''Brien' and [n] >= -1.5e3 OR [m] in (2, 'x')")
+
+    assert tokens == [("field", "Sales Region"), ("op", "<>"), ("string", "O'Brien"), ("word", "AND"),
+                      ("field", "n"), ("op", ">="), ("number", -1500.0), ("word", "OR"),
+                      ("field", "m"), ("word", "IN"), ("punct", "("), ("number", 2), ("punct", ","), ("string", "x"), ("punct", ")")]
+
+
+def test_filter_parser():
+    qvdFilterParser = QVDFilterParser()
+
+    #AND binds tighter than OR, and NOT only belongs to NOT IN and IS NOT NULL
+    filterNode = qvdFilterParser.Parse("[a] = 1 OR [b] NOT IN (2, 3.5) AND [c] IS NOT NULL")
+    assert filterNode == FilterGroup("OR", [FilterCondition("a", "=", [1]),
+                                            FilterGroup("AND", [FilterCondition("b", "NOT IN", [2, 3.5]), FilterCondition("c", "IS NOT NULL", [])])])
+
+    filterNode = qvdFilterParser.Parse("([a] = 1 OR [b] <> 'x') AND [c] IS NULL")
+    assert filterNode == FilterGroup("AND", [FilterGroup("OR", [FilterCondition("a", "=", [1]), FilterCondition("b", "!=", ["x"])]),
+                                             FilterCondition("c", "IS NULL", [])])
+    assert qvdFilterParser.GetFieldNames(filterNode) == ["a", "b", "c"]
+
+
+def test_filter_parser_errors():
+    import pytest
+
+    errors = {"[a] = ": "Expected number but found 'end of filter' in filter",
+              "[a] = 1 [b] = 2": "Unexpected 'b' in filter: [a] = 1 [b] = 2",
+              "[a] ~ 1": "Cannot parse filter at '~ 1'",
+              "[a] IS 1": "Expected NULL but found '1' in filter",
+              "([a] = 1": "Expected ) but found 'end of filter' in filter",
+              "[a] IN 1": "Expected ( but found '1' in filter",
+              "[a] = 1 AND": "Expected field but found 'end of filter' in filter"}
+    for expression, message in errors.items():
+        with pytest.raises(ValueError) as error:
+            QVDFilterParser().Parse(expression)
+        assert str(error.value) == message
+
+
+def test_filter_on_symbol_types(tmp_path):
+    import pytest
+    from datetime import date
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "benchmarks"))
+    from generate_qvd import WriteSyntheticQVD
+
+    fileName = str(tmp_path / "types.qvd")
+    WriteSyntheticQVD(fileName, 1000, ["int:10:0.3", "float:20", "string:5", "date:30"], seed=3)
+    rows = QVDConverter(fileName, typedDates=True).ReadAllRecords(IO()).to_pylist()
+
+    filters = {"[int_0] >= 2 OR [string_2] = 'S1_x'": lambda row: (row["int_0"] is not None and row["int_0"] >= 2) or row["string_2"] == "S1_x",
+               "[float_1] < 5.5 AND [int_0] IN (1, -3)": lambda row: row["float_1"] < 5.5 and row["int_0"] in (1, -3),
+               "[int_0] NOT IN (1, 2) AND [string_2] <> 'S0_'": lambda row: row["int_0"] is not None and row["int_0"] not in (1, 2) and row["string_2"] != "S0_",
+               "[int_0] IS NOT NULL AND [float_1] >= 10": lambda row: row["int_0"] is not None and row["float_1"] >= 10,
+               "[int_0] IS NULL OR [int_0] = '3'": lambda row: row["int_0"] in (None, 3),
+               "[int_0] = 2.5": lambda row: False,
+               "[date_3] >= '2000-01-15' AND [date_3] < '2000-01-20'": lambda row: date(2000, 1, 15) <= row["date_3"] < date(2000, 1, 20)}
+    for filterExpression, expected in filters.items():
+        result = QVDConverter(fileName, filterExpression=filterExpression, typedDates=True).ReadAllRecords(IO()).to_pylist()
+        assert result == [row for row in rows if expected(row)], filterExpression
+
+    with pytest.raises(ValueError, match=r"Field \[int_0\] is numeric"):
+        QVDConverter(fileName, filterExpression="[int_0] = 'abc'").ReadAllRecords(IO())
+    with pytest.raises(ValueError, match=r"Field \[date_3\] holds dates"):
+        QVDConverter(fileName, filterExpression="[date_3] = 'soon'", typedDates=True).ReadAllRecords(IO())
+
+
+def test_incremental_reads(tmp_path):
+    import pyarrow as pa
+    from ayx_plugins.q_v_d_output_tool import QVDConverter as QVDWriter
+
+    fileName = str(tmp_path / "live.qvd")
+    stateDirectory = str(tmp_path / "state")
+    rows = [{"Id": i, "Code": "C" + str(i % 5)} for i in range(300)]
+    appendedRows = [{"Id": i, "Code": "C" + str(i % 6)} for i in range(300, 500)]
+
+    #the writer adds symbols in order of first appearance, so appending rows and new symbols
+    #within the same bit widths keeps the start of the file as it was
+    def Write(rows):
+        qvdWriter = QVDWriter(fileName)
+        qvdWriter.WriteRecords(pa.Table.from_pylist(rows), IO())
+        qvdWriter.WriteQVD()
+
+    def Read():
+        provider = Provider({"QVDFile": fileName, "IncrementalStateDirectory": stateDirectory})
+        QVDInputTool(provider).on_complete()
+        return [row for table in provider.anchors.get("Output", []) for row in table.to_pylist()]
+
+    Write(rows)
+    assert Read() == rows
+    assert Read() == []
+
+    Write(rows + appendedRows)
+    assert Read() == appendedRows
+
+    #the watermark is persisted in the state directory
+    qvdConverter = QVDConverter(fileName)
+    assert len(os.listdir(stateDirectory)) == 1
+    assert QVDWatermarkStore(stateDirectory).GetStartRow(qvdConverter) == 500
+    qvdConverter.Close()
+
+    #a rewritten file no longer matches the watermark and is read in full
+    rewrittenRows = rows[::-1] + appendedRows
+    Write(rewrittenRows)
+    assert Read() == rewrittenRows
+    assert Read() == []
+
+
+def test_update_only_schema_matches_records(tmp_path):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "benchmarks"))
+    from generate_qvd import WriteSyntheticQVD
+
+    fileNames = [str(tmp_path / "s0.qvd"), str(tmp_path / "s1.qvd")]
+    WriteSyntheticQVD(fileNames[0], 500, ["int:10:0.3", "float:20", "string:5", "date:30", "timestamp:100", "int:300"], seed=4)
+    WriteSyntheticQVD(fileNames[1], 300, ["int:10:0.3", "float:20", "string:5", "date:30", "timestamp:100", "int:300"], seed=5)
+
+    typeOptions = [{}, {"CompactTypes": True}, {"TypedDates": True}, {"TypedDates": True, "DateText": True},
+                   {"FieldTypes": "int_0=int64\nstring_2=dictionary\nfloat_1=float32"},
+                   {"CompactTypes": True, "TypedDates": True, "FieldTypes": "int_5=int32"}]
+    readOptions = [{}, {"DictionaryEncode": True}, {"SelectedFields": "string_2\ndate_3"}, {"DistinctRows": True, "DistinctCountField": "N"},
+                   {"QVDFile": ";".join(fileNames)}, {"SourceFileColumn": "Source"}]
+    for typeOption in typeOptions:
+        for readOption in readOptions:
+            toolConfig = dict({"QVDFile": fileNames[0]}, **typeOption, **readOption)
+            updateOnly = Provider(toolConfig, updateOnly=True)
+            QVDInputTool(updateOnly).on_complete()
+            provider = Provider(toolConfig)
+            QVDInputTool(provider).on_complete()
+
+            assert "Output" not in updateOnly.anchors
+            assert updateOnly.metadata["Output"] == provider.anchors["Output"][0].schema, toolConfig
+
+
+
+#This is to write a file whose 79-bit records put int_3 at bit 41, crossing into the second 64-bit word.
+def WriteWideQVD(fileName):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "benchmarks"))
+    from generate_qvd import WriteSyntheticQVD
+
+    return WriteSyntheticQVD(fileName, 3000, ["int:1000:0:13", "string:300:0.2:11", "float:5000:0:17", "int:7:0:29", "date:30:0:9"], seed=8)
+
+
+#This is to read a file in chunks of 333 records with the given reader and selection options.
+def ReadChunked(fileName, rowNumbers=None, startRow=0, endRow=None, recordLimit=None, filterExpression=None, pipelined=False, **options):
+    import pyarrow as pa
+
+    qvdConverter = QVDConverter(fileName, filterExpression=filterExpression, **options)
+    table = pa.Table.from_batches(list(qvdConverter.ReadRecordBatches(IO(), 333, False, startRow, endRow, rowNumbers, recordLimit, pipelined)))
+    qvdConverter.Close()
+    return table
+
+
+def test_parallel_symbol_decoding(tmp_path):
+    fileName = str(tmp_path / "wide.qvd")
+    WriteWideQVD(fileName)
+    serial = QVDConverter(fileName)
+
+    for options in ({"workers": 4}, {"workers": 3, "workerType": "process"}):
+        qvdConverter = QVDConverter(fileName, **options)
+        for qvdFieldHeader, serialFieldHeader in zip(qvdConverter.qvdTableHeader.Fields.QvdFieldHeader, serial.qvdTableHeader.Fields.QvdFieldHeader):
+            assert qvdFieldHeader._SymbolVal.equals(serialFieldHeader._SymbolVal), options
+        assert qvdConverter.pyarrowDatatypes == serial.pyarrowDatatypes
+        qvdConverter.Close()
+    serial.Close()
+
+
+def test_parallel_record_decoding(tmp_path):
+    fileName = str(tmp_path / "wide.qvd")
+    WriteWideQVD(fileName)
+    filterExpression = "[int_3] IN (0, 2) OR [string_1] IS NULL"
+    serial = ReadChunked(fileName)
+    filtered = ReadChunked(fileName, filterExpression=filterExpression)
+    assert serial.num_rows == 3000 and 0 < filtered.num_rows < 3000
+
+    for options in ({"workers": 4}, {"workers": 3, "workerType": "process"}):
+        assert ReadChunked(fileName, **options).equals(serial), options
+        assert ReadChunked(fileName, filterExpression=filterExpression, **options).equals(filtered), options
+        assert ReadChunked(fileName, startRow=100, endRow=1700, **options).equals(serial.slice(100, 1600)), options
+        assert ReadChunked(fileName, startRow=2990, recordLimit=50, **options).equals(serial.slice(2990)), options
+        assert ReadChunked(fileName, filterExpression=filterExpression, recordLimit=40, **options).equals(filtered.slice(0, 40)), options
+
+        rowNumbers = [5, 2999, 0, 5, 1234, 333, 332]
+        assert ReadChunked(fileName, rowNumbers=rowNumbers, **options).equals(serial.take(rowNumbers)), options
+
+
+def test_pipelined_read(tmp_path):
+    fileName = str(tmp_path / "wide.qvd")
+    WriteWideQVD(fileName)
+    filterExpression = "[int_3] IN (0, 2) OR [string_1] IS NULL"
+    serial = ReadChunked(fileName)
+    filtered = ReadChunked(fileName, filterExpression=filterExpression)
+
+    for options in ({"pipelined": True}, {"pipelined": True, "workers": 4}):
+        assert ReadChunked(fileName, **options).equals(serial), options
+        assert ReadChunked(fileName, filterExpression=filterExpression, **options).equals(filtered), options
+        assert ReadChunked(fileName, startRow=100, endRow=1700, **options).equals(serial.slice(100, 1600)), options
+        assert ReadChunked(fileName, filterExpression=filterExpression, recordLimit=40, **options).equals(filtered.slice(0, 40)), options
+
+        rowNumbers = [5, 2999, 0, 5, 1234, 333, 332]
+        assert ReadChunked(fileName, rowNumbers=rowNumbers, **options).equals(serial.take(rowNumbers)), options
@@ -0,0 +1,98 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "benchmarks"))
+
+from ayx_plugins.q_v_d_input_tool import QVDConverter
+from ayx_plugins.q_v_d_output_tool import QVDConverter as QVDWriter
+from generate_qvd import WriteSyntheticQVD
+
+
+class IO:
+    def info(self, message): pass
+    def warn(self, message): pass
+
+
+#This is to write a table with the output tool's converter and read it back with the given read options.
+def WriteAndRead(table, fileName, **options):
+    qvdWriter = QVDWriter(fileName)
+    qvdWriter.WriteRecords(table, IO())
+    qvdWriter.WriteQVD()
+    return QVDConverter(fileName, **options).ReadAllRecords(IO())
+
+
+def test_typed_dates_round_trip(tmp_path):
+    fileName = str(tmp_path / "dates.qvd")
+    WriteSyntheticQVD(fileName, 500, ["date:40", "timestamp:300", "int:7"], seed=2)
+    table = QVDConverter(fileName, typedDates=True).ReadAllRecords(IO())
+    assert str(table.schema.field("timestamp_1").type) == "timestamp[ms]"
+
+    result = WriteAndRead(table, str(tmp_path / "out.qvd"), typedDates=True)
+
+    assert result.equals(table)
+
+
+def test_timestamp_units_round_trip(tmp_path):
+    import pyarrow as pa
+    from datetime import datetime
+
+    values = {"s": [datetime(2024, 2, 29, 23, 59, 59), datetime(1999, 12, 31)],
+              "ms": [datetime(2024, 2, 29, 23, 59, 59, 125000), datetime(1999, 12, 31)],
+              "us": [datetime(2024, 2, 29, 23, 59, 59, 125000), datetime(1999, 12, 31)]}
+    for unit, stamps in values.items():
+        table = pa.table({"Stamp": pa.array(stamps, pa.timestamp(unit))})
+
+        result = WriteAndRead(table, str(tmp_path / (unit + ".qvd")), typedDates=True)
+
+        assert result.column("Stamp").to_pylist() == stamps
+
+
+def test_compacted_types_round_trip(tmp_path):
+    import pyarrow as pa
+
+    table = pa.table({"Tiny": pa.array([i % 100 for i in range(600)], pa.int64()),
+                      "Small": pa.array([i % 200 for i in range(600)], pa.int64()),
+                      "Signed": pa.array([i - 300 for i in range(600)], pa.int64()),
+                      "Wide": pa.array([2**40 + i % 9 for i in range(600)], pa.int64()),
+                      "Half": pa.array([i / 2 for i in range(600)], pa.float64())})
+    fileName = str(tmp_path / "source.qvd")
+    qvdWriter = QVDWriter(fileName)
+    qvdWriter.WriteRecords(table, IO())
+    qvdWriter.WriteQVD()
+    compacted = QVDConverter(fileName, compactTypes=True).ReadAllRecords(IO())
+    assert [str(field.type) for field in compacted.schema] == ["uint8", "uint8", "int16", "double", "float"]
+
+    result = WriteAndRead(compacted, str(tmp_path / "out.qvd"), compactTypes=True)
+    assert result.equals(compacted)
+
+    #integer symbols hold 32 bits, so int64 values beyond that come back as exact doubles
+    result = WriteAndRead(table, str(tmp_path / "wide.qvd"))
+    assert result.column("Wide").to_pylist() == table.column("Wide").to_pylist()
+    result = WriteAndRead(table.cast(pa.schema([("Tiny", pa.int8()), ("Small", pa.uint16()), ("Signed", pa.int32()), ("Wide", pa.uint64()), ("Half", pa.float16())])), str(tmp_path / "widths.qvd"))
+    assert result.to_pylist() == table.to_pylist()
+
+
+def test_dictionary_and_decimal_columns_are_written(tmp_path):
+    import pyarrow as pa
+    from decimal import Decimal
+
+    table = pa.table({"Text": pa.array(["a", "b", "c", "a"] * 50).dictionary_encode(),
+                      "Number": pa.array([3, 1, 3, 2] * 50, pa.int64()).dictionary_encode(),
+                      "Amount": pa.array([Decimal("1.25"), Decimal("-2.50"), Decimal("0.75"), Decimal("1.25")] * 50, pa.decimal128(3, 2))})
+
+    result = WriteAndRead(table, str(tmp_path / "dictionary.qvd"))
+
+    assert result.column("Text").to_pylist() == table.column("Text").to_pylist()
+    assert result.column("Number").to_pylist() == table.column("Number").to_pylist()
+    assert result.column("Amount").to_pylist() == [float(value) for value in table.column("Amount").to_pylist()]
+
+
+def test_unsupported_column_type_raises(tmp_path):
+    import pyarrow as pa
+    import pytest
+
+    table = pa.table({"Blob": pa.array([b"\x00\x01", b"\x02"], pa.binary())})
+
+    with pytest.raises(ValueError, match=r"Field \[Blob\] of type binary"):
+        QVDWriter(str(tmp_path / "blob.qvd")).WriteRecords(table, IO())
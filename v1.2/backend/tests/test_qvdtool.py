@@ -0,0 +1,44 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "benchmarks"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "tools"))
+
+from ayx_plugins.q_v_d_input_tool import QVDConverter
+from generate_qvd import WriteSyntheticQVD
+import qvdtool
+
+
+class IO:
+    def info(self, message): pass
+    def warn(self, message): pass
+
+
+def test_convert_round_trip(tmp_path):
+    fileName = str(tmp_path / "source.qvd")
+    WriteSyntheticQVD(fileName, 2000, ["int:10", "float:200", "string:50", "date:30", "timestamp:300"], seed=6)
+    table = QVDConverter(fileName).ReadAllRecords(IO())
+
+    for targetFormat in ("parquet", "arrow", "csv", "qvd"):
+        formatDirectory = str(tmp_path / targetFormat)
+        assert qvdtool.main(["convert", fileName, "--to", targetFormat, "--output-dir", formatDirectory, "--jobs", "1", "--memory-mb", "1"]) == 0
+        convertedFile = os.path.join(formatDirectory, "source" + qvdtool.fileExtensions[targetFormat])
+        assert qvdtool.main(["convert", convertedFile, "--to", "qvd", "--output-dir", str(tmp_path / (targetFormat + "_qvd")), "--jobs", "1"]) == 0
+
+        result = QVDConverter(str(tmp_path / (targetFormat + "_qvd") / "source.qvd")).ReadAllRecords(IO())
+
+        assert result.to_pylist() == table.to_pylist(), targetFormat
+
+
+def test_convert_fields_and_filter(tmp_path):
+    import pyarrow.parquet as pq
+
+    fileName = str(tmp_path / "source.qvd")
+    WriteSyntheticQVD(fileName, 2000, ["int:10", "float:200", "string:50"], seed=7)
+    table = QVDConverter(fileName, fieldNames=["string_2", "int_0"], filterExpression="[int_0] >= 3").ReadAllRecords(IO())
+
+    assert qvdtool.main(["convert", fileName, "--to", "parquet", "--output-dir", str(tmp_path), "--jobs", "1",
+                         "--fields", "string_2,int_0", "--filter", "[int_0] >= 3"]) == 0
+
+    assert pq.read_table(str(tmp_path / "source.parquet")).equals(table)
@@ -0,0 +1,108 @@
+"""
+Benchmark QVDConverter.ReadSymbol against the original byte-at-a-time parser.
+
+Usage: python bench_read_symbol.py [number of symbols] [repeat]
+
+A high-cardinality symbol section is generated for each symbol type
+(int, float, string, dual int and dual float), parsed by both parsers,
+checked for equal values and timed. Each parser runs once untimed as a
+warm-up and then repeat times (default 3), keeping the best time.
+"""
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from ayx_plugins.q_v_d_input_tool import QVDConverter, QvdTableHeader, QvdFieldHeader, Fields
+
+
+#The original parser, kept here as the reference implementation.
+def LegacyReadSymbol(symbolBytes, noOfSymbols):
+    symbolVal = [None] * noOfSymbols
+    readPos = 0
+    endPos = len(symbolBytes)
+
+    for j in range(noOfSymbols):
+        if readPos <= endPos:
+            symbolType = symbolBytes[readPos]
+            readPos += 1
+            startPos = readPos
+
+            if symbolType == 1:
+                readPos += 4
+                symbolVal[j] = struct.unpack('<i', symbolBytes[startPos:readPos])[0]
+            elif symbolType == 2:
+                readPos += 8
+                symbolVal[j] = struct.unpack('<d', symbolBytes[startPos:readPos])[0]
+            elif symbolType in (4, 5, 6):
+                readPos += 0 if symbolType == 4 else 4 if symbolType == 5 else 8
+                startPos = readPos
+                while symbolBytes[readPos] > 0:
+                    readPos += 1
+                symbolVal[j] = symbolBytes[startPos:readPos].decode("utf-8")
+                readPos += 1
+
+    return symbolVal
+
+
+def GenerateSymbolBytes(symbolType, noOfSymbols):
+    symbolBytes = bytearray()
+    for j in range(noOfSymbols):
+        symbolBytes += struct.pack('B', symbolType)
+        if symbolType == 1:
+            symbolBytes += struct.pack('<i', j)
+        elif symbolType == 2:
+            symbolBytes += struct.pack('<d', j / 3)
+        else:
+            if symbolType == 5:
+                symbolBytes += struct.pack('<i', j)
+            elif symbolType == 6:
+                symbolBytes += struct.pack('<d', j / 3)
+            symbolBytes += ("ORD-%010d" % j).encode('utf-8') + b'\x00'
+    return symbolBytes
+
+
+def ReadSymbolBulk(symbolBytes, noOfSymbols):
+    qvdFieldHeader = QvdFieldHeader(NoOfSymbols=noOfSymbols)
+    qvdFieldHeader._SymbolBytes = symbolBytes
+
+    qvdConverter = QVDConverter.__new__(QVDConverter)
+    qvdConverter.qvdTableHeader = QvdTableHeader(Fields=Fields(QvdFieldHeader=[qvdFieldHeader]))
+    qvdConverter.ReadSymbol(0)
+
+    return qvdFieldHeader._SymbolVal
+
+
+#This is to run function once as a warm-up and then repeat times, returning its result and best time.
+def TimeBest(function, repeat):
+    result = function()
+    bestTime = None
+    for run in range(repeat):
+        startTime = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - startTime
+        bestTime = seconds if bestTime is None else min(bestTime, seconds)
+    return result, bestTime
+
+
+def main():
+    noOfSymbols = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    repeat = max(int(sys.argv[2]) if len(sys.argv) > 2 else 3, 1)
+
+    print(f"{'type':>6} {'symbols':>10} {'legacy (s)':>12} {'bulk (s)':>10} {'speedup':>8}")
+    for symbolType in (1, 2, 4, 5, 6):
+        symbolBytes = GenerateSymbolBytes(symbolType, noOfSymbols)
+
+        legacyValues, legacyTime = TimeBest(lambda: LegacyReadSymbol(symbolBytes, noOfSymbols), repeat)
+        bulkValues, bulkTime = TimeBest(lambda: ReadSymbolBulk(symbolBytes, noOfSymbols), repeat)
+
+        if bulkValues.to_pylist() != legacyValues:
+            raise AssertionError(f"Symbol type {symbolType}: bulk parser returned different values")
+
+        print(f"{symbolType:>6} {noOfSymbols:>10} {legacyTime:>12.3f} {bulkTime:>10.3f} {legacyTime / bulkTime:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Benchmark reading and writing QVD files at several scales and check for regressions.
+
+Usage: python bench_suite.py [--rows 10000,100000,1000000] [--fields SPEC,SPEC,...] [--repeat 3]
+                             [--max-write-rows 1000000] [--output results.json]
+                             [--baseline baseline.json] [--threshold 0.2] [--save-baseline]
+
+For every row count a synthetic QVD is generated (see generate_qvd.py, the same seed
+gives the same file) and, after one untimed warm-up run, these phases are timed, keeping
+the best of --repeat runs:
+
+    ReadQVD          QVDConverter construction: header, symbol tables and record views
+    ReadAllSymbol    parsing all symbol tables again on the open file
+    ReadAllRecords   decoding all records into a pyarrow table
+    WriteRecords     output QVDConverter building symbols and records from that table
+    WriteQVD         writing the output QVD file
+
+Write phases are skipped above --max-write-rows, as the output tool keeps every record in
+memory. Scales up to 100M rows are supported; pass them with --rows.
+
+Results are written as JSON. With --baseline every phase is compared with the stored
+baseline of the same scale and flagged when its throughput (rows per second) drops by more
+than --threshold; the exit code is then 1. --save-baseline stores the results as baseline.
+"""
+import argparse
+import json
+import mmap
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from ayx_plugins.q_v_d_input_tool import QVDConverter
+from ayx_plugins.q_v_d_output_tool import QVDConverter as QVDWriter
+from generate_qvd import DEFAULT_FIELDS, WriteSyntheticQVD
+
+
+class QuietIO:
+    def info(self, message):
+        pass
+
+    def warn(self, message):
+        print("Warning: " + message, file=sys.stderr)
+
+    def error(self, message):
+        print("Error: " + message, file=sys.stderr)
+
+
+def TimePhase(timings, phase, function):
+    startTime = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - startTime
+    timings[phase] = min(timings.get(phase, seconds), seconds)
+    return result
+
+
+#This is to point the symbol sections back into the file, ReadAllSymbol releases them once parsed.
+def ResetSymbolBytes(qvdConverter, fileBytes):
+    for j in qvdConverter.selectedFieldIndexes:
+        qvdFieldHeader = qvdConverter.qvdTableHeader.Fields.QvdFieldHeader[j]
+        startPos = qvdConverter.xmlEndPosition + qvdFieldHeader.Offset + 1
+        qvdFieldHeader._SymbolBytes = fileBytes[startPos:startPos + qvdFieldHeader.Length]
+
+
+#This is to run every phase once, recording the times in timings.
+def RunPhases(timings, fileName, outputFileName, fileBytes, writeRecords, io):
+    qvdConverter = TimePhase(timings, "ReadQVD", lambda: QVDConverter(fileName))
+    ResetSymbolBytes(qvdConverter, fileBytes)
+    TimePhase(timings, "ReadAllSymbol", lambda: qvdConverter.ReadAllSymbol())
+    table = TimePhase(timings, "ReadAllRecords", lambda: qvdConverter.ReadAllRecords(io))
+    qvdConverter.Close()
+
+    if writeRecords:
+        qvdWriter = QVDWriter(outputFileName)
+        TimePhase(timings, "WriteRecords", lambda: qvdWriter.WriteRecords(table, io))
+        TimePhase(timings, "WriteQVD", lambda: qvdWriter.WriteQVD())
+
+
+def RunScale(noOfRecords, fieldSpecs, repeat, maxWriteRows, workDirectory):
+    io = QuietIO()
+    fileName = os.path.join(workDirectory, "bench_%d.qvd" % noOfRecords)
+    outputFileName = os.path.join(workDirectory, "bench_%d_out.qvd" % noOfRecords)
+
+    WriteSyntheticQVD(fileName, noOfRecords, fieldSpecs)
+
+    #the file is memory mapped as ReadQVD does, so the symbol sections are not copied
+    with open(fileName, 'rb') as file:
+        fileMap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    fileBytes = memoryview(fileMap)
+
+    #the warm-up run loads modules and fills the page cache before anything is timed
+    RunPhases({}, fileName, outputFileName, fileBytes, noOfRecords <= maxWriteRows, io)
+
+    timings = {}
+    for run in range(repeat):
+        RunPhases(timings, fileName, outputFileName, fileBytes, noOfRecords <= maxWriteRows, io)
+
+    results = {phase: {"seconds": round(seconds, 6), "rows_per_second": round(noOfRecords / max(seconds, 1e-9), 1)}
+               for phase, seconds in timings.items()}
+    results["_file_bytes"] = os.path.getsize(fileName)
+
+    fileBytes.release()
+    fileMap.close()
+    os.remove(fileName)
+    if os.path.exists(outputFileName):
+        os.remove(outputFileName)
+
+    return results
+
+
+def GetEnvironment():
+    import pyarrow as pa
+
+    return {"python": platform.python_version(), "numpy": np.__version__, "pyarrow": pa.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count()}
+
+
+#This is to compare results with a baseline and return the regressions found.
+def CompareWithBaseline(results, baseline, threshold):
+    regressions = []
+    for scale, phases in results["results"].items():
+        baselinePhases = baseline.get("results", {}).get(scale, {})
+        for phase, measurement in phases.items():
+            if phase.startswith("_") or phase not in baselinePhases:
+                continue
+
+            baselineThroughput = baselinePhases[phase]["rows_per_second"]
+            ratio = measurement["rows_per_second"] / max(baselineThroughput, 1e-9)
+            measurement["baseline_ratio"] = round(ratio, 3)
+            if ratio < 1 - threshold:
+                regressions.append((scale, phase, ratio))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark QVD reading and writing.")
+    parser.add_argument("--rows", default="10000,100000,1000000", help="comma separated row counts")
+    parser.add_argument("--fields", default=",".join(DEFAULT_FIELDS), help="comma separated field specs, see generate_qvd.py")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-write-rows", type=int, default=1000000)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed throughput drop, 0.2 is 20%%")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as --baseline")
+    parser.add_argument("--work-dir", help="folder for the generated files, default a temporary folder")
+    arguments = parser.parse_args(argv)
+
+    fieldSpecs = [fieldSpec for fieldSpec in arguments.fields.split(",") if fieldSpec]
+    results = {"environment": GetEnvironment(), "fields": fieldSpecs, "repeat": arguments.repeat, "results": {}}
+
+    with tempfile.TemporaryDirectory(dir=arguments.work_dir) as workDirectory:
+        for noOfRecords in (int(rows) for rows in arguments.rows.split(",")):
+            scaleResults = RunScale(noOfRecords, fieldSpecs, arguments.repeat, arguments.max_write_rows, workDirectory)
+            results["results"][str(noOfRecords)] = scaleResults
+
+            for phase, measurement in scaleResults.items():
+                if not phase.startswith("_"):
+                    print(f"{noOfRecords:>12} {phase:<16} {measurement['seconds']:>10.3f} s {measurement['rows_per_second']:>14,.0f} rows/s")
+
+    exitCode = 0
+    if arguments.baseline and arguments.save_baseline:
+        with open(arguments.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print("Baseline saved to " + arguments.baseline)
+    elif arguments.baseline:
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)
+
+        regressions = CompareWithBaseline(results, baseline, arguments.threshold)
+        for scale, phase, ratio in regressions:
+            print(f"REGRESSION {phase} at {scale} rows: {ratio:.0%} of baseline throughput")
+        if not regressions:
+            print("No regression beyond %.0f%% against %s" % (arguments.threshold * 100, arguments.baseline))
+        exitCode = 1 if regressions else 0
+
+    with open(arguments.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    return exitCode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
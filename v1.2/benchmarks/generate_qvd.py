@@ -0,0 +1,172 @@
+"""
+Write synthetic QVD files for benchmarks.
+
+Usage: python generate_qvd.py FILE ROWS [FIELD SPEC ...] [--seed=N]
+
+A field spec is type:cardinality[:nullRatio[:bitWidth]], with type one of int, float,
+string, date or timestamp. date and timestamp are dual symbols (number and text) as Qlik
+writes them. With a nullRatio the field is written with Bias -2 and that share of the
+records holds NULL. A bitWidth wider than the cardinality needs pads the field.
+Without field specs DEFAULT_FIELDS is used.
+
+Records are generated and written in chunks, so files of 100M rows need little memory.
+"""
+import os
+import struct
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+
+DEFAULT_FIELDS = ["int:1000", "float:10000", "string:100000", "date:3650", "timestamp:100000", "string:50:0.1"]
+
+GENERATE_CHUNK_SIZE = 1000000
+
+
+@dataclass
+class SyntheticField:
+    FieldName: str
+    FieldType: str
+    Cardinality: int
+    NullRatio: float = 0.0
+    BitWidth: int = 0
+    BitOffset: int = 0
+    Bias: int = 0
+
+
+def ParseFieldSpec(fieldSpec, fieldIndex):
+    parts = fieldSpec.split(":")
+    fieldType = parts[0]
+    if fieldType not in ("int", "float", "string", "date", "timestamp"):
+        raise ValueError("Unknown field type in " + fieldSpec)
+
+    syntheticField = SyntheticField(FieldName="%s_%d" % (fieldType, fieldIndex), FieldType=fieldType, Cardinality=max(int(parts[1]), 1))
+    syntheticField.NullRatio = float(parts[2]) if len(parts) > 2 else 0.0
+    syntheticField.Bias = -2 if syntheticField.NullRatio > 0 else 0
+
+    #with Bias -2 the stored values 0 and 1 are NULL and symbols start at 2
+    neededBitWidth = (syntheticField.Cardinality - 1 - syntheticField.Bias).bit_length()
+    syntheticField.BitWidth = max(int(parts[3]) if len(parts) > 3 else 0, neededBitWidth)
+    if syntheticField.Cardinality == 1 and syntheticField.Bias == 0:
+        syntheticField.BitWidth = 0
+
+    return syntheticField
+
+
+#This is to build the symbol section of a field, symbols are distinct by construction.
+def GetSymbolBytes(syntheticField, random):
+    cardinality = syntheticField.Cardinality
+    fieldType = syntheticField.FieldType
+
+    if fieldType == "int":
+        symbols = np.empty(cardinality, dtype=[('type', 'u1'), ('value', '<i4')])
+        symbols['type'] = 1
+        symbols['value'] = np.arange(cardinality) - cardinality // 2
+        return symbols.tobytes()
+
+    if fieldType == "float":
+        symbols = np.empty(cardinality, dtype=[('type', 'u1'), ('value', '<f8')])
+        symbols['type'] = 2
+        symbols['value'] = np.arange(cardinality) + random.random(cardinality) * 0.999
+        return symbols.tobytes()
+
+    if fieldType == "string":
+        return b"".join(b"\x04" + ("S%d_%s" % (j, "x" * (j % 17))).encode('utf-8') + b"\x00" for j in range(cardinality))
+
+    if fieldType == "date":
+        #days since 1899-12-30, starting at 2000-01-01
+        return b"".join(b"\x05" + struct.pack('<i', 36526 + j) + ("D%07d" % j).encode('utf-8') + b"\x00" for j in range(cardinality))
+
+    return b"".join(b"\x06" + struct.pack('<d', 36526 + j / 1440) + ("T%09d" % j).encode('utf-8') + b"\x00" for j in range(cardinality))
+
+
+#This is to pack the stored field values of a chunk of records into record bytes.
+def GetRecordBytes(syntheticFields, recordByteSize, noOfRecords, random):
+    recordBytes = np.zeros((noOfRecords, recordByteSize), dtype=np.uint8)
+
+    for syntheticField in syntheticFields:
+        if syntheticField.BitWidth == 0:
+            continue
+
+        values = random.integers(0, syntheticField.Cardinality, noOfRecords, dtype=np.uint64) + np.uint64(-syntheticField.Bias)
+        if syntheticField.NullRatio > 0:
+            values[random.random(noOfRecords) < syntheticField.NullRatio] = 0
+
+        firstByte = syntheticField.BitOffset // 8
+        lastByte = (syntheticField.BitOffset + syntheticField.BitWidth - 1) // 8
+        for k in range(firstByte, lastByte + 1):
+            shift = syntheticField.BitOffset - 8 * k
+            shifted = values << np.uint64(shift) if shift >= 0 else values >> np.uint64(-shift)
+            recordBytes[:, k] |= (shifted & np.uint64(0xFF)).astype(np.uint8)
+
+    return recordBytes.tobytes()
+
+
+def GetHeaderXML(syntheticFields, symbolBytes, recordByteSize, noOfRecords):
+    numberFormats = {"int": ("INTEGER", ["$numeric", "$integer"]), "float": ("REAL", ["$numeric"]), "string": ("ASCII", ["$ascii", "$text"]),
+                     "date": ("DATE", ["$numeric", "$integer", "$date"]), "timestamp": ("TIMESTAMP", ["$numeric", "$timestamp"])}
+
+    xml = ['<?xml version="1.0" encoding="UTF-8" standalone="yes"?>', '<QvdTableHeader>',
+           '<QvBuildNo>50668</QvBuildNo>', '<CreatorDoc>generate_qvd.py</CreatorDoc>', '<CreateUtcTime>2024-01-01 00:00:00</CreateUtcTime>',
+           '<SourceCreateUtcTime></SourceCreateUtcTime>', '<SourceFileUtcTime></SourceFileUtcTime>', '<SourceFileSize>-1</SourceFileSize>',
+           '<StaleUtcTime></StaleUtcTime>', '<TableName>SYNTHETIC</TableName>', '<Fields>']
+
+    offset = 0
+    for syntheticField, fieldSymbolBytes in zip(syntheticFields, symbolBytes):
+        numberFormatType, tags = numberFormats[syntheticField.FieldType]
+        xml.append('<QvdFieldHeader><FieldName>%s</FieldName><BitOffset>%d</BitOffset><BitWidth>%d</BitWidth><Bias>%d</Bias>'
+                   '<NumberFormat><Type>%s</Type><nDec>0</nDec><UseThou>0</UseThou><Fmt></Fmt><Dec></Dec><Thou></Thou></NumberFormat>'
+                   '<NoOfSymbols>%d</NoOfSymbols><Offset>%d</Offset><Length>%d</Length><Comment></Comment><Tags>%s</Tags></QvdFieldHeader>'
+                   % (syntheticField.FieldName, syntheticField.BitOffset, syntheticField.BitWidth, syntheticField.Bias, numberFormatType,
+                      syntheticField.Cardinality, offset, len(fieldSymbolBytes), "".join("<String>%s</String>" % tag for tag in tags)))
+        offset += len(fieldSymbolBytes)
+
+    xml += ['</Fields>', '<Compression></Compression>', '<RecordByteSize>%d</RecordByteSize>' % recordByteSize,
+            '<NoOfRecords>%d</NoOfRecords>' % noOfRecords, '<Offset>%d</Offset>' % offset,
+            '<Length>%d</Length>' % (recordByteSize * noOfRecords),
+            '<Lineage><LineageInfo><Discriminator>generate_qvd.py</Discriminator><Statement></Statement></LineageInfo></Lineage>',
+            '<Comment></Comment>', '</QvdTableHeader>']
+
+    return "\r\n".join(xml).encode('utf-8') + b"\r\n\x00"
+
+
+#This is to write a synthetic QVD file and return its field descriptions.
+def WriteSyntheticQVD(fileName, noOfRecords, fieldSpecs=None, seed=0):
+    random = np.random.default_rng(seed)
+    syntheticFields = [ParseFieldSpec(fieldSpec, j) for j, fieldSpec in enumerate(fieldSpecs or DEFAULT_FIELDS)]
+
+    bitOffset = 0
+    for syntheticField in syntheticFields:
+        syntheticField.BitOffset = bitOffset if syntheticField.BitWidth > 0 else 0
+        bitOffset += syntheticField.BitWidth
+    recordByteSize = (bitOffset + 7) // 8
+
+    symbolBytes = [GetSymbolBytes(syntheticField, random) for syntheticField in syntheticFields]
+
+    with open(fileName, 'wb') as file:
+        file.write(GetHeaderXML(syntheticFields, symbolBytes, recordByteSize, noOfRecords))
+        for fieldSymbolBytes in symbolBytes:
+            file.write(fieldSymbolBytes)
+
+        for chunkStart in range(0, noOfRecords, GENERATE_CHUNK_SIZE):
+            file.write(GetRecordBytes(syntheticFields, recordByteSize, min(GENERATE_CHUNK_SIZE, noOfRecords - chunkStart), random))
+
+    return syntheticFields
+
+
+def main():
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith("--seed")]
+    seed = int(next((argument.split("=")[1] for argument in sys.argv[1:] if argument.startswith("--seed=")), 0))
+
+    if len(arguments) < 2:
+        print(__doc__)
+        return 1
+
+    syntheticFields = WriteSyntheticQVD(arguments[0], int(arguments[1]), arguments[2:], seed)
+    print("Wrote %s: %s records, %d fields, %d bytes" % (arguments[0], arguments[1], len(syntheticFields), os.path.getsize(arguments[0])))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+"""
+qvdtool - read, write and convert QVD files outside Alteryx.
+
+Usage:
+    python qvdtool.py inspect FILE [--workers N]
+    python qvdtool.py convert SOURCE [SOURCE ...] --to {parquet,arrow,csv,qvd} [--output-dir DIR]
+                      [--jobs N] [--memory-mb MB] [--fields FIELD,...] [--filter EXPRESSION]
+    python qvdtool.py bench FILE [--repeat N] [--workers N] [--chunk-size N]
+
+A SOURCE is a file, a directory (all QVD, Parquet, Arrow and CSV files in it) or a glob
+pattern. convert runs one file per worker process, with up to --jobs processes. Reading
+QVD files is bounded by --memory-mb per worker: the file is memory-mapped and records are
+decoded and written in chunks sized to fit the budget. Writing QVD files needs the whole
+table in memory, as the QVD Output Tool does.
+
+The readers and writers are the QVDConverter classes of the QVD Input and Output Tools.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from ayx_plugins.q_v_d_input_tool import QVDConverter, QVDXMLParser
+from ayx_plugins.q_v_d_output_tool import QVDConverter as QVDWriter
+
+
+fileExtensions = {'qvd': '.qvd', 'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}
+
+
+#This is to give QVDConverter the io object it reports progress to, as the Alteryx provider does.
+class ConsoleIO:
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+
+    def info(self, message):
+        if self.verbose:
+            print(message, file=sys.stderr)
+
+    def warn(self, message):
+        print("Warning: " + message, file=sys.stderr)
+
+    def error(self, message):
+        print("Error: " + message, file=sys.stderr)
+
+
+#This is to expand files, directories and glob patterns into a sorted list of input files.
+def GetSourceFiles(sources):
+    fileNames = []
+    for source in sources:
+        if os.path.isdir(source):
+            fileNames.extend(sorted(os.path.join(source, fileName) for fileName in os.listdir(source)
+                                    if os.path.splitext(fileName)[1].lower() in fileExtensions.values()))
+        elif glob.has_magic(source):
+            fileNames.extend(sorted(glob.glob(source)))
+        else:
+            fileNames.append(source)
+
+    return list(dict.fromkeys(fileNames))
+
+
+def GetFileFormat(fileName):
+    extension = os.path.splitext(fileName)[1].lower()
+    for fileFormat, formatExtension in fileExtensions.items():
+        if extension == formatExtension or (fileFormat == 'arrow' and extension in ('.feather', '.ipc')):
+            return fileFormat
+
+    raise ValueError("Unknown file format: " + fileName)
+
+
+#This is to size record chunks so the decoded indexes and values of one chunk fit in the budget.
+#Every field costs an 8 byte index and its value, strings their average symbol length.
+def GetChunkSize(qvdConverter, memoryBudget):
+    #decoded indexes, the output batch and the writer's buffer are alive at the same time
+    return max(1000, memoryBudget // (3 * max(qvdConverter.EstimateRowBytes(), 1)))
+
+
+#This is to read a Parquet, Arrow IPC or CSV file into a pyarrow table.
+def ReadTable(fileName, fileFormat):
+    import pyarrow as pa
+
+    if fileFormat == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(fileName)
+    if fileFormat == 'arrow':
+        with pa.memory_map(fileName, 'r') as source:
+            try:
+                return pa.ipc.open_file(source).read_all()
+            except pa.ArrowInvalid:
+                source.seek(0)
+                return pa.ipc.open_stream(source).read_all()
+    if fileFormat == 'csv':
+        import pyarrow.csv as csv
+        return csv.read_csv(fileName)
+
+    raise ValueError("Cannot read " + fileFormat + " files: " + fileName)
+
+
+#This is to open a writer for a stream of record batches in the target format.
+def OpenBatchWriter(fileName, fileFormat, schema):
+    import pyarrow as pa
+
+    if fileFormat == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(fileName, schema)
+    if fileFormat == 'arrow':
+        return pa.ipc.new_file(fileName, schema)
+    if fileFormat == 'csv':
+        import pyarrow.csv as csv
+        return csv.CSVWriter(fileName, schema)
+
+    raise ValueError("Cannot write " + fileFormat + " files: " + fileName)
+
+
+#This is to convert one file. It runs in a worker process and returns (records, seconds).
+def ConvertFile(sourceFile, targetFile, targetFormat, memoryBudget, fieldNames=None, filterExpression=None, verbose=False):
+    io = ConsoleIO(verbose)
+    startTime = time.perf_counter()
+    sourceFormat = GetFileFormat(sourceFile)
+    noOfRecords = 0
+
+    if sourceFormat == 'qvd' and targetFormat != 'qvd':
+        qvdConverter = QVDConverter(sourceFile, True, fieldNames, filterExpression)
+        writer = None
+        try:
+            for batch in qvdConverter.ReadRecordBatches(io, GetChunkSize(qvdConverter, memoryBudget)):
+                if writer is None:
+                    writer = OpenBatchWriter(targetFile, targetFormat, batch.schema)
+                writer.write_batch(batch)
+                noOfRecords += batch.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+            qvdConverter.Close()
+
+    elif targetFormat == 'qvd':
+        if sourceFormat == 'qvd':
+            import pyarrow as pa
+
+            qvdConverter = QVDConverter(sourceFile, True, fieldNames, filterExpression)
+            table = pa.Table.from_batches(list(qvdConverter.ReadRecordBatches(io, GetChunkSize(qvdConverter, memoryBudget))))
+            qvdConverter.Close()
+        else:
+            table = ReadTable(sourceFile, sourceFormat)
+            if fieldNames:
+                table = table.select(fieldNames)
+
+        qvdWriter = QVDWriter(targetFile)
+        qvdWriter.WriteRecords(table, io)
+        qvdWriter.WriteQVD()
+        noOfRecords = table.num_rows
+
+    else:
+        raise ValueError("Either the source or the target must be a QVD file: " + sourceFile)
+
+    return noOfRecords, time.perf_counter() - startTime
+
+
+def Inspect(arguments):
+    with open(arguments.file, 'rb') as file:
+        qvdTableHeader, xmlEndPosition = QVDXMLParser().ReadQvdTableHeader(file)
+
+    print("Table:           " + str(qvdTableHeader.TableName))
+    print("Records:         " + str(qvdTableHeader.NoOfRecords))
+    print("Record size:     " + str(qvdTableHeader.RecordByteSize) + " bytes")
+    print("Symbol section:  " + str(qvdTableHeader.Offset) + " bytes")
+    print("Record section:  " + str(qvdTableHeader.Length) + " bytes")
+    print("Created:         " + str(qvdTableHeader.CreateUtcTime) + " by " + str(qvdTableHeader.CreatorDoc))
+    print()
+
+    qvdConverter = QVDConverter(arguments.file, workers=arguments.workers)
+    print("%-32s %-12s %-24s %10s %6s %6s %6s" % ("Field", "Number type", "Arrow type", "Symbols", "Bits", "Offset", "Bias"))
+    for j, qvdFieldHeader in enumerate(qvdConverter.qvdTableHeader.Fields.QvdFieldHeader):
+        numberFormatType = qvdFieldHeader.NumberFormat.Type if qvdFieldHeader.NumberFormat is not None else ""
+        print("%-32s %-12s %-24s %10d %6d %6d %6d" % (qvdFieldHeader.FieldName, getattr(numberFormatType, 'value', numberFormatType),
+                                                      qvdConverter.pyarrowDatatypes[j].type, qvdFieldHeader.NoOfSymbols,
+                                                      qvdFieldHeader.BitWidth, qvdFieldHeader.BitOffset, qvdFieldHeader.Bias))
+    qvdConverter.Close()
+    return 0
+
+
+def Convert(arguments):
+    sourceFiles = GetSourceFiles(arguments.sources)
+    if not sourceFiles:
+        print("No input files found", file=sys.stderr)
+        return 1
+
+    outputDirectory = arguments.output_dir
+    os.makedirs(outputDirectory, exist_ok=True)
+
+    fieldNames = [fieldName.strip() for fieldName in arguments.fields.split(",") if fieldName.strip()] if arguments.fields else None
+    memoryBudget = arguments.memory_mb * 1024 * 1024
+    noOfFailures = 0
+    startTime = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=arguments.jobs) as pool:
+        futures = {}
+        for sourceFile in sourceFiles:
+            targetFile = os.path.join(outputDirectory, os.path.splitext(os.path.basename(sourceFile))[0] + fileExtensions[arguments.to])
+            if os.path.abspath(targetFile) == os.path.abspath(sourceFile):
+                print("Skipping " + sourceFile + ": it would be overwritten", file=sys.stderr)
+                continue
+
+            futures[pool.submit(ConvertFile, sourceFile, targetFile, arguments.to, memoryBudget, fieldNames, arguments.filter,
+                                arguments.verbose)] = (sourceFile, targetFile)
+
+        for future in as_completed(futures):
+            sourceFile, targetFile = futures[future]
+            try:
+                noOfRecords, seconds = future.result()
+                print("%s -> %s: %d records in %.2f s" % (sourceFile, targetFile, noOfRecords, seconds))
+            except Exception as e:
+                noOfFailures += 1
+                print("%s: %s" % (sourceFile, e), file=sys.stderr)
+
+    print("Converted %d of %d files in %.2f s" % (len(futures) - noOfFailures, len(sourceFiles), time.perf_counter() - startTime))
+    return 1 if noOfFailures else 0
+
+
+def Bench(arguments):
+    import tempfile
+    import pyarrow as pa
+
+    io = ConsoleIO(arguments.verbose)
+    fileSize = os.path.getsize(arguments.file)
+
+    for repeat in range(arguments.repeat):
+        startTime = time.perf_counter()
+        qvdConverter = QVDConverter(arguments.file, workers=arguments.workers)
+        symbolTime = time.perf_counter() - startTime
+
+        startTime = time.perf_counter()
+        batches = list(qvdConverter.ReadRecordBatches(io, arguments.chunk_size))
+        recordTime = time.perf_counter() - startTime
+        qvdConverter.Close()
+
+        table = pa.Table.from_batches(batches)
+        batches = None
+
+        with tempfile.TemporaryDirectory() as temporaryDirectory:
+            startTime = time.perf_counter()
+            qvdWriter = QVDWriter(os.path.join(temporaryDirectory, "bench.qvd"))
+            qvdWriter.WriteRecords(table, io)
+            qvdWriter.WriteQVD()
+            writeTime = time.perf_counter() - startTime
+
+        readTime = symbolTime + recordTime
+        print("run %d: header+symbols %.3f s, records %.3f s, read %.0f rows/s %.1f MB/s, write %.3f s %.0f rows/s" %
+              (repeat + 1, symbolTime, recordTime, table.num_rows / max(readTime, 1e-9), fileSize / max(readTime, 1e-9) / 1e6,
+               writeTime, table.num_rows / max(writeTime, 1e-9)))
+
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="qvdtool", description="Read, write and convert QVD files.")
+    parser.add_argument("--verbose", action="store_true", help="print progress messages")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    inspectParser = subparsers.add_parser("inspect", help="print the header and schema of a QVD file")
+    inspectParser.add_argument("file")
+    inspectParser.add_argument("--workers", type=int, default=1, help="threads parsing symbol tables")
+    inspectParser.set_defaults(run=Inspect)
+
+    convertParser = subparsers.add_parser("convert", help="convert between QVD and Parquet, Arrow IPC or CSV")
+    convertParser.add_argument("sources", nargs="+", help="files, directories or glob patterns")
+    convertParser.add_argument("--to", required=True, choices=sorted(fileExtensions))
+    convertParser.add_argument("--output-dir", default=".")
+    convertParser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes, one file each")
+    convertParser.add_argument("--memory-mb", type=int, default=1024, help="memory budget per worker when reading QVD files")
+    convertParser.add_argument("--fields", help="comma separated fields to convert")
+    convertParser.add_argument("--filter", help="record filter, e.g. \"[Region] = 'EMEA'\"")
+    convertParser.set_defaults(run=Convert)
+
+    benchParser = subparsers.add_parser("bench", help="time reading and writing a QVD file")
+    benchParser.add_argument("file")
+    benchParser.add_argument("--repeat", type=int, default=3)
+    benchParser.add_argument("--workers", type=int, default=1, help="threads parsing symbol tables and decoding records")
+    benchParser.add_argument("--chunk-size", type=int, default=QVDConverter.recordChunkSize)
+    benchParser.set_defaults(run=Bench)
+
+    arguments = parser.parse_args(argv)
+    return arguments.run(arguments)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,6 @@
 import React, { useContext, useEffect} from 'react';
 import ReactDOM from 'react-dom';
-import { AyxAppWrapper, Box, Grid, Typography, makeStyles, Theme, TextField} from '@alteryx/ui';
+import { AyxAppWrapper, Box, Checkbox, FormControlLabel, Grid, Typography, makeStyles, Theme, TextField} from '@alteryx/ui';
 import { Context as UiSdkContext, DesignerApi } from '@alteryx/react-comms';
 
 
@@ -14,6 +14,12 @@ const App = () => {
     newModel.Configuration[event.target.id] = event.target.value;
     handleUpdateModel(newModel);
   };
+
+  const onHandleCheckboxChange = event => {
+    const newModel = { ...model };
+    newModel.Configuration[event.target.id] = event.target.checked;
+    handleUpdateModel(newModel);
+  };
   
 
   return (
@@ -29,11 +35,328 @@ const App = () => {
 			  fullWidth
 			  id="QVDFile"
 			  label="QVD File"
-			  placeholder="[QVD File Path...]"
+			  placeholder="[QVD File Path, a pattern like C:\Data\Sales_*.qvd, or several separated by ;...]"
 			  onChange={onHandleTextChange}
 			  value={model.Configuration.QVDFile}
 			/>
 		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  id="SourceFileColumn"
+			  label="Source File Column"
+			  placeholder="[Name of a field holding the source QVD file, leave blank for none...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.SourceFileColumn}
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  multiline
+			  rows={4}
+			  id="SelectedFields"
+			  label="Fields to Read"
+			  placeholder="[One field name per line, leave blank for all fields...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.SelectedFields}
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  id="RecordFilter"
+			  label="Record Filter"
+			  placeholder="[Region] = 'EMEA' AND ([Amount] > 1000 OR [Code] IN (1, 2))"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.RecordFilter}
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  multiline
+			  rows={2}
+			  id="GroupByFields"
+			  label="Group By Fields"
+			  placeholder="[One field name per line, aggregates the records in the tool...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.GroupByFields}
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  multiline
+			  rows={3}
+			  id="Aggregates"
+			  label="Aggregates"
+			  placeholder="[One per line: count, count(Field), count_distinct(Field), sum(Field), min(Field) or max(Field)...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.Aggregates}
+			/>
+		</Grid>
+		<Grid item>
+			<FormControlLabel
+			  control={
+				<Checkbox
+				  id="DistinctRows"
+				  checked={model.Configuration.DistinctRows === true || model.Configuration.DistinctRows === 'true'}
+				  onChange={onHandleCheckboxChange}
+				/>
+			  }
+			  label="Only return distinct records of the selected fields"
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  id="DistinctCountField"
+			  label="Distinct Count Field"
+			  placeholder="[Name of a field counting the records of each distinct record, leave blank for none...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.DistinctCountField}
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  id="RecordLimit"
+			  label="Record Limit"
+			  type="number"
+			  placeholder="[Leave blank for all records...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.RecordLimit}
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  id="StartRow"
+			  label="Start Row"
+			  type="number"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.StartRow}
+			/>
+			<TextField
+			  id="EndRow"
+			  label="End Row (exclusive)"
+			  type="number"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.EndRow}
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  id="RowNumbers"
+			  label="Row Numbers"
+			  placeholder="[Comma separated row numbers, starting from 0...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.RowNumbers}
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  id="Workers"
+			  label="Parallel Workers"
+			  type="number"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.Workers}
+			/>
+		</Grid>
+		<Grid item>
+			<FormControlLabel
+			  control={
+				<Checkbox
+				  id="UseProcesses"
+				  checked={model.Configuration.UseProcesses === true || model.Configuration.UseProcesses === 'true'}
+				  onChange={onHandleCheckboxChange}
+				/>
+			  }
+			  label="Use worker processes instead of threads"
+			/>
+		</Grid>
+		<Grid item>
+			<FormControlLabel
+			  control={
+				<Checkbox
+				  id="Pipelined"
+				  checked={model.Configuration.Pipelined === true || model.Configuration.Pipelined === 'true'}
+				  onChange={onHandleCheckboxChange}
+				/>
+			  }
+			  label="Overlap reading, decoding and output"
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  id="SymbolCacheDirectory"
+			  label="Symbol Cache Folder"
+			  placeholder="[Leave blank to disable the symbol cache...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.SymbolCacheDirectory}
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  id="SymbolCacheSizeMB"
+			  label="Symbol Cache Size (MB)"
+			  type="number"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.SymbolCacheSizeMB}
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  id="IncrementalStateDirectory"
+			  label="Incremental State Folder"
+			  placeholder="[Only return records appended since the last run, leave blank to read all records...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.IncrementalStateDirectory}
+			/>
+		</Grid>
+		<Grid item>
+			<FormControlLabel
+			  control={
+				<Checkbox
+				  id="DistinctValues"
+				  checked={model.Configuration.DistinctValues === true || model.Configuration.DistinctValues === 'true'}
+				  onChange={onHandleCheckboxChange}
+				/>
+			  }
+			  label="Write the distinct values of each field to the V anchor"
+			/>
+		</Grid>
+		<Grid item>
+			<FormControlLabel
+			  control={
+				<Checkbox
+				  id="FieldsOnly"
+				  checked={model.Configuration.FieldsOnly === true || model.Configuration.FieldsOnly === 'true'}
+				  onChange={onHandleCheckboxChange}
+				/>
+			  }
+			  label="Only profile the fields, skip reading the records"
+			/>
+		</Grid>
+		<Grid item>
+			<FormControlLabel
+			  control={
+				<Checkbox
+				  id="Profile"
+				  checked={model.Configuration.Profile === true || model.Configuration.Profile === 'true'}
+				  onChange={onHandleCheckboxChange}
+				/>
+			  }
+			  label="Report phase timings"
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  id="ProfileFile"
+			  label="Timing Trace File"
+			  placeholder="[Chrome trace (.json) of the phase timings, leave blank for none...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.ProfileFile}
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  id="MemoryBudgetMB"
+			  label="Memory Budget (MB)"
+			  type="number"
+			  placeholder="[Leave blank for no limit...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.MemoryBudgetMB}
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  id="ChunkSize"
+			  label="Records per Batch"
+			  type="number"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.ChunkSize}
+			/>
+		</Grid>
+		<Grid item>
+			<FormControlLabel
+			  control={
+				<Checkbox
+				  id="DictionaryEncode"
+				  checked={model.Configuration.DictionaryEncode === true || model.Configuration.DictionaryEncode === 'true'}
+				  onChange={onHandleCheckboxChange}
+				/>
+			  }
+			  label="Dictionary-encode fields"
+			/>
+		</Grid>
+		<Grid item>
+			<FormControlLabel
+			  control={
+				<Checkbox
+				  id="CompactTypes"
+				  checked={model.Configuration.CompactTypes === true || model.Configuration.CompactTypes === 'true'}
+				  onChange={onHandleCheckboxChange}
+				/>
+			  }
+			  label="Use the narrowest type that holds each field's values"
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  multiline
+			  rows={3}
+			  id="FieldTypes"
+			  label="Field Types"
+			  placeholder="[One FieldName=type per line: uint8, int16, int32, int64, float32, float64, string or dictionary...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.FieldTypes}
+			/>
+		</Grid>
+		<Grid item>
+			<FormControlLabel
+			  control={
+				<Checkbox
+				  id="TypedDates"
+				  checked={model.Configuration.TypedDates === true || model.Configuration.TypedDates === 'true'}
+				  onChange={onHandleCheckboxChange}
+				/>
+			  }
+			  label="Read date and timestamp fields as dates and date-times"
+			/>
+		</Grid>
+		<Grid item>
+			<FormControlLabel
+			  control={
+				<Checkbox
+				  id="DateText"
+				  checked={model.Configuration.DateText === true || model.Configuration.DateText === 'true'}
+				  onChange={onHandleCheckboxChange}
+				/>
+			  }
+			  label="Also return the text of date and timestamp fields, in a field ending in _Text"
+			/>
+		</Grid>
+		<Grid item>
+			<FormControlLabel
+			  control={
+				<Checkbox
+				  id="MemoryMap"
+				  checked={model.Configuration.MemoryMap === true || model.Configuration.MemoryMap === 'true'}
+				  onChange={onHandleCheckboxChange}
+				/>
+			  }
+			  label="Memory-map QVD file"
+			/>
+		</Grid>
 		
       </Grid>
     </Box>
@@ -42,7 +365,7 @@ const App = () => {
 
 const Tool = () => {
   return (
-    <DesignerApi messages={{}} defaultConfig={{ Configuration: { QVDFile: '' }}}>
+    <DesignerApi messages={{}} defaultConfig={{ Configuration: { QVDFile: '', SourceFileColumn: '', DictionaryEncode: false, CompactTypes: false, FieldTypes: '', TypedDates: true, DateText: false, MemoryMap: true, ChunkSize: 1000000, SelectedFields: '', RecordFilter: '', GroupByFields: '', Aggregates: '', DistinctRows: false, DistinctCountField: '', RecordLimit: '', StartRow: '', EndRow: '', RowNumbers: '', Workers: 1, UseProcesses: false, Pipelined: false, SymbolCacheDirectory: '', SymbolCacheSizeMB: 1024, IncrementalStateDirectory: '', DistinctValues: false, FieldsOnly: false, Profile: false, ProfileFile: '', MemoryBudgetMB: '' }}}>
       <AyxAppWrapper> 
         <App />
       </AyxAppWrapper>
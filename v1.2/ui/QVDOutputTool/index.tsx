@@ -1,6 +1,6 @@
 import React, { useContext, useEffect} from 'react';
 import ReactDOM from 'react-dom';
-import { AyxAppWrapper, Box, Grid, Typography, makeStyles, Theme, TextField} from '@alteryx/ui';
+import { AyxAppWrapper, Box, Checkbox, FormControlLabel, Grid, Typography, makeStyles, Theme, TextField} from '@alteryx/ui';
 import { Context as UiSdkContext, DesignerApi } from '@alteryx/react-comms';
 
 
@@ -14,6 +14,12 @@ const App = () => {
     newModel.Configuration[event.target.id] = event.target.value;
     handleUpdateModel(newModel);
   };
+
+  const onHandleCheckboxChange = event => {
+    const newModel = { ...model };
+    newModel.Configuration[event.target.id] = event.target.checked;
+    handleUpdateModel(newModel);
+  };
   
 
   return (
@@ -34,6 +40,38 @@ const App = () => {
 			  value={model.Configuration.QVDFile}
 			/>
 		</Grid>
+		<Grid item>
+			<FormControlLabel
+			  control={
+				<Checkbox
+				  id="Profile"
+				  checked={model.Configuration.Profile === true || model.Configuration.Profile === 'true'}
+				  onChange={onHandleCheckboxChange}
+				/>
+			  }
+			  label="Report phase timings"
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  fullWidth
+			  id="ProfileFile"
+			  label="Timing Trace File"
+			  placeholder="[Chrome trace (.json) of the phase timings, leave blank for none...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.ProfileFile}
+			/>
+		</Grid>
+		<Grid item>
+			<TextField
+			  id="MemoryBudgetMB"
+			  label="Memory Budget (MB)"
+			  type="number"
+			  placeholder="[Leave blank for no limit...]"
+			  onChange={onHandleTextChange}
+			  value={model.Configuration.MemoryBudgetMB}
+			/>
+		</Grid>
 		
       </Grid>
     </Box>
@@ -42,7 +80,7 @@ const App = () => {
 
 const Tool = () => {
   return (
-    <DesignerApi messages={{}} defaultConfig={{ Configuration: { QVDFile: '' }}}>
+    <DesignerApi messages={{}} defaultConfig={{ Configuration: { QVDFile: '', Profile: false, ProfileFile: '', MemoryBudgetMB: '' }}}>
       <AyxAppWrapper> 
         <App />
       </AyxAppWrapper>